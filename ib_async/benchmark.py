@@ -0,0 +1,333 @@
+"""Performance benchmarks, with a baseline to detect regressions.
+
+Run `python -m ib_async.benchmark --save` to store a baseline for the current machine, and
+`python -m ib_async.benchmark --compare` afterwards to compare against it. The process exits with status 1 when a
+benchmark got slower than the baseline by more than the tolerance, and with status 2 when there is no baseline.
+
+With `--relative`, results are expressed as multiples of the `calibration` benchmark, which doesn't use ib_async. Such
+baselines can be compared across machines, the test suite checks against the one in `tests/benchmark_baseline.json`
+when the `IB_ASYNC_BENCHMARK` environment variable is set. Regenerate it with
+`python -m ib_async.benchmark --relative --save --scale 0.05 --baseline tests/benchmark_baseline.json`.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import platform
+import sys
+import time
+import typing
+
+import ib_async
+from ib_async.event import Event
+from ib_async.fake_tws import FakeTWS
+from ib_async.instrument import Instrument, SecurityType
+from ib_async.messages import Incoming, Outgoing
+from ib_async.order import Order, OrderType, Action
+from ib_async.protocol import OutgoingMessage, ProtocolVersion, RequestId
+from ib_async.replay import DiscardingWriter
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.25
+
+# A benchmark performs the operation it measures `iterations` times, and returns the elapsed time in seconds.
+BenchmarkFunction = typing.Callable[[int], float]
+
+BenchmarkResult = typing.NamedTuple("BenchmarkResult", [
+    ('name', str),
+    ('seconds_per_operation', float),
+])
+
+Regression = typing.NamedTuple("Regression", [
+    ('name', str),
+    ('baseline', float),
+    ('current', float),
+])
+
+_benchmarks = collections.OrderedDict()  # type: typing.Dict[str, typing.Tuple[BenchmarkFunction, int]]
+
+
+def benchmark(name: str, iterations: int):
+    """Registers a benchmark, along with the number of iterations of a full run."""
+    def decorator(fn: BenchmarkFunction) -> BenchmarkFunction:
+        _benchmarks[name] = fn, iterations
+        return fn
+    return decorator
+
+
+def _make_client() -> "ib_async.IBClient":
+    client = ib_async.IBClient()
+    client.writer = typing.cast(asyncio.StreamWriter, DiscardingWriter())
+    client.version = ProtocolVersion(110)
+    return client
+
+
+def _make_instrument(client, contract_id=265598) -> Instrument:
+    instrument = Instrument.get_instance(client, contract_id)
+    instrument.symbol = 'AAPL'
+    instrument.security_type = SecurityType.Stock
+    instrument.exchange = 'SMART'
+    instrument.primary_exchange = 'NASDAQ'
+    instrument.currency = 'USD'
+    instrument.local_symbol = 'AAPL'
+    instrument.trading_class = 'NMS'
+    return instrument
+
+
+# Representative messages, using the request ids of the subscriptions made by `_make_subscribed_client`.
+_decode_samples = [
+    (Incoming.TICK_PRICE, ['1', '6', '43', '1', '186.25', '300', '0']),
+    (Incoming.TICK_SIZE, ['2', '6', '43', '5', '300']),
+    (Incoming.TICK_GENERIC, ['45', '6', '43', '37', '186.27']),
+    (Incoming.TICK_STRING, ['46', '6', '43', '45', '1525700000']),
+    (Incoming.MARKET_DEPTH, ['12', '1', '44', '0', '1', '1', '186.24', '500']),
+    (Incoming.MARKET_DEPTH_L2, ['13', '1', '44', '0', 'NSDQ', '1', '0', '186.26', '400']),
+    (Incoming.TICK_BY_TICK, ['99', '45', '1', '1525700000', '186.25', '100', '0', 'ISLAND', '']),
+    (Incoming.SYMBOL_SAMPLES, ['79', '46', '1', '76792991', 'TSLA', 'STK', 'NASDAQ', 'USD', '']),
+    (Incoming.CONTRACT_DATA, [
+        '10', '1', '47', 'AAPL', 'STK', '', '0', '', 'NYSE', 'USD', 'AAPL', 'NMS', 'NMS', '265598', '0.01', '100', '',
+        'ACTIVETIM,ADJUST,ALERT,ALLOC,AVGCOST,BASKET,COND,CONDORDER,DAY,DEACT,DEACTDIS,DEACTEOD,GAT',
+        'SMART,AMEX,NYSE,CBOE,ISE,CHX,ARCA,ISLAND,VWAP,DRCTEDGE,NSX,BEX,BATS,EDGEA,CSFBALGO,IEX,PSX',
+        '1', '0', 'APPLE INC', 'NASDAQ', '', 'Technology', 'Computers', 'Computers', 'EST5EDT',
+        '20180507:0700-20180507:1600;20180508:0700-20180508:1600', '20180507:0700-20180507:1600', '', '', '', '1',
+        '', '', '26,26,26', '']),
+]
+
+
+def _make_subscribed_client() -> "ib_async.IBClient":
+    client = _make_client()
+    client.next_request_id = RequestId(43)
+    instrument = _make_instrument(client)
+    client.get_market_data(instrument)  # 43
+    client.subscribe_market_depth(instrument, 5)  # 44
+    client.version = ProtocolVersion.MAX_CLIENT
+    client.subscribe_tick_by_tick(instrument, 'Last')  # 45
+    client.version = ProtocolVersion(110)
+
+    # Fill the first row of the book, so that updates have something to update
+    client.dispatch_message(['12', '1', '44', '0', '0', '1', '186.24', '500'])
+    client.dispatch_message(['12', '1', '44', '0', '0', '0', '186.26', '500'])
+    return client
+
+
+def _register_decode_benchmark(message_type: Incoming, fields: typing.List[str]):
+    @benchmark("decode_%s" % message_type.name.lower(), 20000)
+    def decode(iterations: int) -> float:
+        client = _make_subscribed_client()
+        dispatch = client.dispatch_message
+
+        # Messages are parsed in place, each dispatch gets a fresh copy like the message loop would provide.
+        start = time.perf_counter()
+        for _ in range(iterations):
+            dispatch(list(fields))
+        return time.perf_counter() - start
+
+
+for _message_type, _fields in _decode_samples:
+    _register_decode_benchmark(_message_type, _fields)
+
+
+@benchmark("calibration", 50000)
+def _calibration(iterations: int) -> float:
+    # Plain interpreter work, similar to splitting a message, to measure the speed of the machine
+    data = b"1\x006\x0043\x001\x00186.25\x00300\x000\x00"
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        [field.decode() for field in data[:-1].split(b"\0")]
+    return time.perf_counter() - start
+
+
+@benchmark("serialize_instrument", 20000)
+def _serialize_instrument(iterations: int) -> float:
+    client = _make_client()
+    instrument = _make_instrument(client)
+
+    start = time.perf_counter()
+    for request_id in range(iterations):
+        message = OutgoingMessage(Outgoing.REQ_MKT_DATA, 11, request_id, instrument, protocol_version=client.version)
+        message.serialize()
+    return time.perf_counter() - start
+
+
+@benchmark("serialize_order", 5000)
+def _serialize_order(iterations: int) -> float:
+    client = _make_client()
+    order = Order(client)
+    order.instrument = _make_instrument(client)
+    order.order_type = OrderType.Limit
+    order.action = Action.Buy
+    order.total_quantity = 100
+    order.limit_price = 186.25
+
+    start = time.perf_counter()
+    for order_id in range(iterations):
+        order.order_id = order_id
+        OutgoingMessage(Outgoing.PLACE_ORDER, 45, order, protocol_version=client.version).serialize()
+    return time.perf_counter() - start
+
+
+class _EventSource:
+    on_event = Event()  # type: Event[int]
+
+
+@benchmark("event_fanout_10", 50000)
+def _event_fanout(iterations: int) -> float:
+    source = _EventSource()
+    received = []
+
+    # Handlers are held weakly, so they are kept alive by this list
+    handlers = [lambda value: received.append(value) for _ in range(10)]
+    for handler in handlers:
+        source.on_event += handler
+
+    event = source.on_event
+    start = time.perf_counter()
+    for value in range(iterations):
+        event(value)
+    return time.perf_counter() - start
+
+
+@benchmark("market_depth_update", 50000)
+def _market_depth_update(iterations: int) -> float:
+    client = _make_client()
+    instrument = _make_instrument(client)
+    for position in range(10):
+        instrument.handle_market_depth(position, "", 0, 0, 100.0 + position, 100)
+        instrument.handle_market_depth(position, "", 0, 1, 99.0 - position, 100)
+
+    update = instrument.handle_market_depth
+    start = time.perf_counter()
+    for i in range(iterations):
+        update(i % 10, "", 1, i % 2, 100.0, i)
+    return time.perf_counter() - start
+
+
+@benchmark("loopback_round_trip", 500)
+def _loopback_round_trip(iterations: int) -> float:
+    async def run():
+        async with FakeTWS(rate=0) as server:
+            client = ib_async.IBClient()
+            await client.connect(server.host, server.port, 1)
+            try:
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    await client.current_time()
+                return time.perf_counter() - start
+            finally:
+                await client.disconnect()
+
+    return asyncio.get_event_loop().run_until_complete(run())
+
+
+def run_benchmarks(names: typing.Iterable[str] = None, scale: float = 1.0,
+                   repeat: int = 3) -> typing.List[BenchmarkResult]:
+    """Runs the selected benchmarks, all by default. Returns the best time per operation out of `repeat` runs.
+
+    `scale` multiplies the number of iterations, use a small value for a quick smoke test."""
+    selected = list(names) if names is not None else list(_benchmarks)
+
+    results = []
+    for name in selected:
+        fn, iterations = _benchmarks[name]
+        iterations = max(1, int(iterations * scale))
+        best = min(fn(iterations) for _ in range(repeat))
+        results.append(BenchmarkResult(name, best / iterations))
+    return results
+
+
+def relative_results(results: typing.Iterable[BenchmarkResult]) -> typing.List[BenchmarkResult]:
+    """Expresses results as multiples of the `calibration` result, which must be included."""
+    results = list(results)
+    reference = next(result.seconds_per_operation for result in results if result.name == "calibration")
+    return [BenchmarkResult(result.name, result.seconds_per_operation / reference)
+            for result in results if result.name != "calibration"]
+
+
+def load_baseline(path: str) -> typing.Dict[str, float]:
+    with open(path) as baseline_file:
+        return json.load(baseline_file)['results']
+
+
+def save_baseline(path: str, results: typing.Iterable[BenchmarkResult]):
+    data = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'results': {result.name: result.seconds_per_operation for result in results},
+    }
+    with open(path, "w") as baseline_file:
+        json.dump(data, baseline_file, indent=2, sort_keys=True)
+
+
+def find_regressions(results: typing.Iterable[BenchmarkResult], baseline: typing.Dict[str, float],
+                     tolerance: float = DEFAULT_TOLERANCE) -> typing.List[Regression]:
+    """Lists the benchmarks that got slower than their baseline by more than `tolerance` (a fraction)."""
+    return [Regression(result.name, baseline[result.name], result.seconds_per_operation)
+            for result in results
+            if result.name in baseline and result.seconds_per_operation > baseline[result.name] * (1 + tolerance)]
+
+
+def main(argv: typing.List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m ib_async.benchmark", description=__doc__)
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all by default")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline file (default: %(default)s)")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="fail when there is no baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown, as a fraction of the baseline (default: %(default)s)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the number of iterations")
+    parser.add_argument("--relative", action="store_true", help="express results as multiples of the calibration")
+    parser.add_argument("--list", action="store_true", help="list the available benchmarks")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        sys.stdout.write("".join(name + "\n" for name in _benchmarks))
+        return 0
+
+    unknown = [name for name in args.names if name not in _benchmarks]
+    if unknown:
+        parser.error("unknown benchmarks: %s" % ", ".join(unknown))
+
+    try:
+        baseline = {} if args.save else load_baseline(args.baseline)
+    except FileNotFoundError:
+        if args.compare:
+            parser.error("no baseline found at %s, use --save to create one" % args.baseline)
+        baseline = {}
+        sys.stdout.write("No baseline found at %s, use --save to create one\n" % args.baseline)
+
+    names = args.names or None
+    if args.relative and names is not None and "calibration" not in names:
+        names.append("calibration")
+
+    results = run_benchmarks(names, scale=args.scale)
+    if args.relative:
+        results = relative_results(results)
+        unit, factor = "x calibration", 1.0
+    else:
+        unit, factor = "us/op", 1e6
+
+    for result in results:
+        line = "%-30s %10.2f %s" % (result.name, result.seconds_per_operation * factor, unit)
+        if result.name in baseline:
+            line += "  %+6.1f%%" % ((result.seconds_per_operation / baseline[result.name] - 1) * 100)
+        sys.stdout.write(line + "\n")
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        sys.stdout.write("Saved baseline to %s\n" % args.baseline)
+        return 0
+
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for regression in regressions:
+        sys.stdout.write("REGRESSION %s: %.2f %s, baseline %.2f %s\n" % (
+            regression.name, regression.current * factor, unit, regression.baseline * factor, unit))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import asyncio
+import datetime
+import enum
+import json
+import logging
+import os
+import time
+import typing
+
+from ib_async.instrument import Instrument, SecurityIdentifierType, SecurityType
+
+LOG = logging.getLogger(__name__)
+
+_date_format = "%Y%m%d %H:%M:%S"
+
+# The instrument fields that are stored, along with their type. These are the fields filled by REQ_CONTRACT_DATA.
+_cached_fields = (
+    ('contract_id', int),
+    ('symbol', str),
+    ('security_type', SecurityType),
+    ('last_trade_date', datetime.datetime),
+    ('strike', float),
+    ('right', str),
+    ('exchange', str),
+    ('currency', str),
+    ('local_symbol', str),
+    ('market_name', str),
+    ('trading_class', str),
+    ('minimum_tick', float),
+    ('market_data_size_multiplier', str),
+    ('multiplier', str),
+    ('order_types', list),
+    ('valid_exchanges', list),
+    ('price_magnifier', int),
+    ('underlying_contract_id', int),
+    ('long_name', str),
+    ('primary_exchange', str),
+    ('contract_month', str),
+    ('industry', str),
+    ('category', str),
+    ('subcategory', str),
+    ('time_zone', str),
+    ('trading_hours', str),
+    ('liquid_hours', str),
+    ('ev_rule', str),
+    ('ev_multiplier', str),
+    ('security_ids', dict),
+    ('aggregated_group', str),
+    ('underlying_symbol', str),
+    ('underlying_security_type', SecurityType),
+    ('market_rule_ids', str),
+    ('real_expiration_date', datetime.datetime),
+)  # type: typing.Sequence[typing.Tuple[str, type]]
+
+
+def contract_id_key(contract_id: int) -> str:
+    return "CONID:%i" % contract_id
+
+
+def security_id_key(security_id_type: typing.Union[SecurityIdentifierType, str], security_id: str) -> str:
+    return "%s:%s" % (getattr(security_id_type, "value", security_id_type), security_id)
+
+
+def local_symbol_key(local_symbol: str, exchange: str, security_type: typing.Union[SecurityType, str],
+                     trading_class: str = "") -> str:
+    return "LOCAL:%s:%s:%s:%s" % (local_symbol, exchange, getattr(security_type, "value", security_type),
+                                  trading_class or "")
+
+
+def _encode(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime.datetime):
+        return value.strftime(_date_format)
+    if isinstance(value, dict):
+        return {_encode(k): _encode(v) for k, v in value.items()}
+    return value
+
+
+def _decode(the_type: type, value):
+    if value is None:
+        return None
+
+    if issubclass(the_type, enum.Enum):
+        try:
+            return the_type(value)
+        except ValueError:
+            return value  # Unknown enum values are kept as text, just like IncomingMessage.read does.
+
+    if the_type is datetime.datetime:
+        return datetime.datetime.strptime(value, _date_format)
+
+    if the_type is dict:
+        result = {}
+        for key, item in value.items():
+            try:
+                key = SecurityIdentifierType(key)
+            except ValueError:
+                pass
+            result[key] = item
+        return result
+
+    return value
+
+
+class ContractCache:
+    """Persists contract details on disk, so that instruments can be resolved without asking TWS.
+
+    Entries can be found by contract id, and by the keys used to look them up (see `security_id_key` and
+    `local_symbol_key`). Entries younger than `ttl` seconds are used as-is. Older entries, up to `max_age` seconds, are
+    still used, but the client will also ask TWS for fresh details in the background. Changes are written to disk
+    `save_delay` seconds after they are made, or when `save` is called."""
+
+    def __init__(self, path: str, ttl: float = 86400.0, max_age: float = 7 * 86400.0, save_delay: float = 1.0) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_age = max_age
+        self.save_delay = save_delay
+
+        self._entries = {}  # type: typing.Dict[int, typing.Tuple[float, typing.Dict[str, typing.Any]]]
+        self._keys = {}  # type: typing.Dict[str, int]
+        self._save_handle = None  # type: asyncio.Handle
+
+        self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        try:
+            with open(self.path) as cache_file:
+                data = json.load(cache_file)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            LOG.warning("Ignoring corrupt contract cache %s", self.path)
+            return
+
+        self._entries = {int(contract_id): (stored, fields)
+                         for contract_id, (stored, fields) in data['contracts'].items()}
+        self._keys = data['keys']
+
+    def save(self):
+        if self._save_handle:
+            self._save_handle.cancel()
+            self._save_handle = None
+
+        data = {
+            'contracts': self._entries,
+            'keys': self._keys,
+        }
+
+        # Write to a temporary file first, so that a crash never leaves a partial cache behind.
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as cache_file:
+            json.dump(data, cache_file, separators=(',', ':'))
+        os.replace(temp_path, self.path)
+
+    def lookup(self, key: str) -> typing.Optional[typing.Tuple[typing.Dict[str, typing.Any], bool]]:
+        """Finds cached details. Returns the cached fields, and whether they are due for revalidation."""
+        contract_id = self._keys.get(key)
+        if contract_id is None:
+            return None
+
+        stored, fields = self._entries[contract_id]
+        age = time.time() - stored
+        if age > self.max_age:
+            return None
+
+        return fields, age > self.ttl
+
+    def get_instrument(self, parent, key: str) -> typing.Tuple[typing.Optional[Instrument], bool]:
+        """Returns an instrument filled from the cache, if any, and whether it is due for revalidation."""
+        found = self.lookup(key)
+        if not found:
+            return None, False
+
+        fields, stale = found
+        instrument = Instrument.get_instance(parent, fields['contract_id'])
+        self.apply(instrument, fields)
+        return instrument, stale
+
+    @staticmethod
+    def apply(instrument: Instrument, fields: typing.Dict[str, typing.Any]):
+        for name, the_type in _cached_fields:
+            setattr(instrument, name, _decode(the_type, fields.get(name)))
+        instrument.reindex()
+
+    def store(self, instrument: Instrument, keys: typing.Iterable[str] = ()):
+        contract_id = instrument.contract_id
+        fields = {name: _encode(getattr(instrument, name)) for name, _ in _cached_fields}
+        self._entries[contract_id] = (time.time(), fields)
+
+        self._keys[contract_id_key(contract_id)] = contract_id
+        for security_id_type, security_id in (instrument.security_ids or {}).items():
+            self._keys[security_id_key(security_id_type, security_id)] = contract_id
+        for key in keys:
+            self._keys[key] = contract_id
+
+        if not self._save_handle:
+            self._save_handle = asyncio.get_event_loop().call_later(self.save_delay, self.save)
@@ -1,3 +1,6 @@
+import asyncio
+
+
 class ApiException(Exception):
     def __init__(self, code: int, message: str) -> None:
         self.error_code = code
@@ -11,6 +14,23 @@ class NotConnectedError(Exception):
         return "Client is not connected"
 
 
+class RequestTimeoutError(asyncio.TimeoutError):
+    def __init__(self, request_id: int, message_type=None, timeout: float = None) -> None:
+        self.request_id = request_id
+        self.message_type = message_type
+        self.timeout = timeout
+
+    def __str__(self):
+        result = "Request #%i" % self.request_id
+        if self.message_type:
+            result += " (%s)" % self.message_type.name
+        if self.timeout is not None:
+            result += " got no response within %gs" % self.timeout
+        else:
+            result += " got no response"
+        return result
+
+
 class OutdatedServerError(Exception):
     error_code = 502
 
@@ -1,53 +1,319 @@
 import asyncio
+import collections
+import enum
+import functools
+import logging
+import time
 import typing
 import weakref
 
+LOG = logging.getLogger(__name__)
+
 T = typing.TypeVar('T')
 
 
+class HandlerStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.count if self.count else 0.0
+
+    def record(self, elapsed: float):
+        self.count += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+
+    def __repr__(self):
+        return "HandlerStats(count=%i, total_time=%.6f, max_time=%.6f)" % (self.count, self.total_time, self.max_time)
+
+
+class EventProfiler:
+    """Records how long event dispatches and individual handlers take.
+
+    Handlers that take longer than `slow_handler_threshold` seconds are logged as a warning, as they stall the message
+    loop."""
+
+    def __init__(self, slow_handler_threshold: float = 0.1) -> None:
+        self.slow_handler_threshold = slow_handler_threshold
+        self.event_stats = {}  # type: typing.Dict[str, HandlerStats]
+        self.handler_stats = {}  # type: typing.Dict[typing.Tuple[str, str], HandlerStats]
+
+    def reset(self):
+        self.event_stats = {}
+        self.handler_stats = {}
+
+    def record_handler(self, event_name: str, handler: typing.Callable, elapsed: float):
+        handler_name = getattr(handler, '__qualname__', None) or repr(handler)
+        key = (event_name, handler_name)
+        try:
+            stats = self.handler_stats[key]
+        except KeyError:
+            stats = self.handler_stats[key] = HandlerStats()
+        stats.record(elapsed)
+
+        if elapsed > self.slow_handler_threshold:
+            LOG.warning("Slow handler %s for %s took %.3fs", handler_name, event_name, elapsed)
+
+    def record_event(self, event_name: str, elapsed: float):
+        try:
+            stats = self.event_stats[event_name]
+        except KeyError:
+            stats = self.event_stats[event_name] = HandlerStats()
+        stats.record(elapsed)
+
+
+_profiler = None  # type: typing.Optional[EventProfiler]
+
+
+def enable_profiling(slow_handler_threshold: float = 0.1) -> EventProfiler:
+    """Starts recording dispatch statistics for all events. Returns the profiler holding the statistics."""
+    global _profiler
+    _profiler = EventProfiler(slow_handler_threshold)
+    return _profiler
+
+
+def disable_profiling():
+    global _profiler
+    _profiler = None
+
+
+def get_profiler() -> typing.Optional[EventProfiler]:
+    return _profiler
+
+
+class OverflowPolicy(enum.Enum):
+    """What an async iterator over an event does when its queue is full."""
+
+    # Async producers wait in `put` until there is room. Events are emitted synchronously and cannot wait, values they
+    # emit into a full queue are discarded with a warning.
+    Block = 'block'
+
+    # Discard the value at the head of the queue to make room.
+    DropOldest = 'drop_oldest'
+
+    # Discard the new value.
+    DropNewest = 'drop_newest'
+
+    # Replace the value at the tail of the queue, so the consumer always sees the latest value.
+    Conflate = 'conflate'
+
+
 class _EventQueue:
-    def __init__(self):
-        self.queue = []
-        self.future = asyncio.Future()
+    def __init__(self, maxsize: int = 0, overflow: OverflowPolicy = OverflowPolicy.DropOldest) -> None:
+        self.maxsize = maxsize
+        self.overflow = OverflowPolicy(overflow)
+        self.queue = collections.deque()  # type: typing.Deque[typing.Any]
+        self.future = asyncio.Future()  # type: asyncio.Future
+        self._space_future = None  # type: asyncio.Future
+
+        # Statistics
+        self.dropped = 0
+        self.high_water_mark = 0
+
+        # Values discarded since the queue last filled up, warned about once per overflow
+        self._overflow_dropped = 0
+
+    @property
+    def full(self) -> bool:
+        return 0 < self.maxsize <= len(self.queue)
 
     def push(self, value):
+        # Called from within event dispatch, raising would skip the remaining handlers of the event
+        if self.full:
+            self.dropped += 1
+            if self.overflow == OverflowPolicy.Block:
+                if not self._overflow_dropped:
+                    LOG.warning("Event queue full, discarding values until the consumer catches up")
+                self._overflow_dropped += 1
+                return
+            elif self.overflow == OverflowPolicy.DropNewest:
+                return
+            elif self.overflow == OverflowPolicy.DropOldest:
+                self.queue.popleft()
+            else:
+                assert self.overflow == OverflowPolicy.Conflate
+                self.queue.pop()
+
+        if self._overflow_dropped:
+            LOG.warning("Event queue no longer full, %d values were discarded", self._overflow_dropped)
+            self._overflow_dropped = 0
+
         self.queue.append(value)
+        if len(self.queue) > self.high_water_mark:
+            self.high_water_mark = len(self.queue)
+
         if not self.future.done():
             self.future.set_result(None)
 
+    async def put(self, value):
+        """Adds a value to the queue, waiting for space if the overflow policy is Block."""
+        while self.full and self.overflow == OverflowPolicy.Block:
+            if not self._space_future or self._space_future.done():
+                self._space_future = asyncio.Future()
+            await self._space_future
+
+        self.push(value)
+
+    def __aiter__(self):
+        return self
+
     async def __anext__(self):
-        if not self.queue:
+        while not self.queue:
             await self.future
             self.future = asyncio.Future()
 
-        head = self.queue[0]
-        self.queue = self.queue[1:]
+        head = self.queue.popleft()
+        if self._space_future and not self._space_future.done():
+            self._space_future.set_result(None)
         return head
 
 
+class _ConflatingEventQueue:
+    """Collects distinct event values, and hands them out as a set on each read.
+
+    However many times the event fires between two reads, the consumer is woken at most once, and receives each value
+    only once. This suits values that identify what changed, such as tick types."""
+
+    def __init__(self) -> None:
+        self.pending = set()  # type: typing.Set[typing.Any]
+        self.future = asyncio.Future()  # type: asyncio.Future
+
+    def push(self, value):
+        self.pending.add(value)
+        if not self.future.done():
+            self.future.set_result(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> typing.Set[typing.Any]:
+        while not self.pending:
+            await self.future
+            self.future = asyncio.Future()
+
+        result, self.pending = self.pending, set()
+        return result
+
+
+class AsyncSubscription:
+    """Runs a coroutine handler for each event value, with bounded concurrency.
+
+    Values that map to the same `order_key` are handled one at a time, in the order they were emitted. Values with
+    distinct keys (or all values, if there is no `order_key`) may be handled concurrently, up to `concurrency` at a
+    time (0 means unbounded). The remaining values wait in a backlog."""
+
+    def __init__(self, handler_ref: weakref.ref, concurrency: int = 1,
+                 order_key: typing.Callable[[typing.Any], typing.Hashable] = None) -> None:
+        self.handler_ref = handler_ref
+        self.concurrency = concurrency
+        self.order_key = order_key
+
+        self._queues = {}  # type: typing.Dict[typing.Hashable, typing.Deque[typing.Any]]
+        self._ready = collections.deque()  # type: typing.Deque[typing.Hashable]
+
+        # Statistics
+        self.running = 0
+        self.backlog = 0
+        self.max_backlog = 0
+        self.completed = 0
+        self.failed = 0
+
+    def ref(self) -> typing.Optional["AsyncSubscription"]:
+        """Behaves like a weak reference, so that the subscription lives as long as the handler does."""
+        return self if self.handler_ref() is not None else None
+
+    def __eq__(self, other):
+        return other is self or (self.handler_ref() is not None and self.handler_ref() == other)
+
+    __hash__ = object.__hash__
+
+    def __call__(self, arg):
+        key = self.order_key(arg) if self.order_key else object()
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = collections.deque()
+            self._ready.append(key)
+        queue.append(arg)
+
+        self.backlog += 1
+        if self.backlog > self.max_backlog:
+            self.max_backlog = self.backlog
+
+        self._start()
+
+    def _start(self):
+        while self._ready and (not self.concurrency or self.running < self.concurrency):
+            key = self._ready.popleft()
+            arg = self._queues[key].popleft()
+            self.backlog -= 1
+
+            handler = self.handler_ref()
+            if handler is None:
+                self._queues.clear()
+                self._ready.clear()
+                self.backlog = 0
+                return
+
+            self.running += 1
+            task = asyncio.ensure_future(handler(arg))
+            task.add_done_callback(functools.partial(self._done, key))
+
+    def _done(self, key: typing.Hashable, task: asyncio.Future):
+        self.running -= 1
+        if task.cancelled():
+            self.failed += 1
+        elif task.exception():
+            self.failed += 1
+            LOG.error("Exception in event handler %r", self.handler_ref(), exc_info=task.exception())
+        else:
+            self.completed += 1
+
+        if self._queues.get(key):
+            self._ready.append(key)
+        else:
+            self._queues.pop(key, None)
+
+        self._start()
+
+
 class EventInstance(typing.Generic[T]):
     def __init__(self, on_subscribe: typing.Callable[[], None],
-                 on_unsubscribe: typing.Callable[[], None]) -> None:
+                 on_unsubscribe: typing.Callable[[], None], name: str = None) -> None:
         self.on_subscribe = on_subscribe
         self.on_unsubscribe = on_unsubscribe
-        self._handlers = []  # type: typing.List[weakref.ref]
+        self.name = name or "event_%x" % abs(id(self))
+
+        # Pairs of handler reference and the values the handler is interested in (None means all values). These lists
+        # are replaced rather than modified, so that a dispatch in progress is unaffected by (un)subscriptions.
+        self._handlers = []  # type: typing.List[typing.Tuple[weakref.ref, typing.Optional[typing.FrozenSet]]]
+
+        # Precomputed handler lists. Values that no handler filters on go to all the unfiltered handlers.
+        self._unfiltered = []  # type: typing.List[weakref.ref]
+        self._dispatch = {}  # type: typing.Dict[typing.Any, typing.List[weakref.ref]]
 
     def _live_handlers(self, remove=None) -> typing.List[typing.Callable[[T], typing.Any]]:
         """Returns a list of event handlers that are not garbage collected."""
 
         had_handlers = len(self._handlers)
 
-        live_handlers = []  # type: typing.List[weakref.ref]
+        live_handlers = []  # type: typing.List[typing.Tuple[weakref.ref, typing.Optional[typing.FrozenSet]]]
         result = []
-        for handler_ref in self._handlers:
+        for handler_ref, keys in self._handlers:
             handler = handler_ref()
             if handler == remove:
                 remove = None  # only allow one removal per round
             elif handler is not None:
-                live_handlers.append(handler_ref)
+                live_handlers.append((handler_ref, keys))
                 result.append(handler)
 
-        self._handlers = live_handlers
+        if len(live_handlers) != had_handlers:
+            self._set_handlers(live_handlers)
 
         if had_handlers and not self._handlers and self.on_unsubscribe:
             self.on_unsubscribe()
@@ -58,33 +324,129 @@ class EventInstance(typing.Generic[T]):
 
         return result
 
+    def _set_handlers(self, handlers: typing.List[typing.Tuple[weakref.ref, typing.Optional[typing.FrozenSet]]]):
+        self._handlers = handlers
+        self._unfiltered = [handler_ref for handler_ref, keys in handlers if keys is None]
+
+        dispatch = {}  # type: typing.Dict[typing.Any, typing.List[weakref.ref]]
+        for key in set().union(*(keys for _, keys in handlers if keys is not None)):
+            dispatch[key] = [handler_ref for handler_ref, keys in handlers if keys is None or key in keys]
+        self._dispatch = dispatch
+
+    def _handler_refs(self, arg: T) -> typing.List[weakref.ref]:
+        if not self._dispatch:
+            return self._unfiltered
+        try:
+            return self._dispatch.get(arg, self._unfiltered)
+        except TypeError:
+            # Unhashable values, like the lists of a batch event, can't be filtered on
+            return self._unfiltered
+
     @property
     def has_subscribers(self):
         return len(self._live_handlers()) > 0
 
+    @property
+    def may_have_subscribers(self) -> bool:
+        """A cheap check for hot paths: False if there are no subscribers, but True may include garbage collected
+        handlers, which are pruned when the event is next fired."""
+        return bool(self._handlers)
+
     def __call__(self, arg: T):
-        for handler in self._live_handlers():
-            handler(arg)
+        if _profiler is not None:
+            self._call_profiled(arg, _profiler)
+            return
+
+        handler_refs = self._handler_refs(arg)
+
+        has_dead_handlers = False
+        for handler_ref in handler_refs:
+            handler = handler_ref()
+            if handler is None:
+                has_dead_handlers = True
+            else:
+                handler(arg)
+
+        if has_dead_handlers:
+            self._live_handlers()
+
+    def _call_profiled(self, arg: T, profiler: EventProfiler):
+        handler_refs = self._handler_refs(arg)
+
+        has_dead_handlers = False
+        event_start = time.perf_counter()
+        for handler_ref in handler_refs:
+            handler = handler_ref()
+            if handler is None:
+                has_dead_handlers = True
+                continue
+
+            start = time.perf_counter()
+            try:
+                handler(arg)
+            finally:
+                profiler.record_handler(self.name, handler, time.perf_counter() - start)
+
+        profiler.record_event(self.name, time.perf_counter() - event_start)
+
+        if has_dead_handlers:
+            self._live_handlers()
 
     def __aiter__(self):
-        queue = _EventQueue()
-        self.__iadd__(queue.push)
+        return self.iterate()
+
+    def iterate(self, maxsize: int = 0, overflow: OverflowPolicy = OverflowPolicy.DropOldest,
+                keys: typing.Iterable[T] = None) -> _EventQueue:
+        """Returns an async iterator over this event, with an optionally bounded queue.
+
+        When more than `maxsize` values are pending, `overflow` determines which values are kept. The iterator counts
+        the values it discarded in `dropped`, and the largest backlog it has seen in `high_water_mark`."""
+        queue = _EventQueue(maxsize, overflow)
+        self.subscribe(queue.push, keys)
         return queue
 
-    def __iadd__(self, other: typing.Callable[[T], typing.Any]):
+    def conflated(self, keys: typing.Iterable[T] = None) -> _ConflatingEventQueue:
+        """Returns an async iterator yielding the set of distinct values emitted since the previous read.
+
+        For example, `async for changed in instrument.on_market_data.conflated()` yields the tick types that were
+        updated, without a backlog of stale notifications."""
+        queue = _ConflatingEventQueue()
+        self.subscribe(queue.push, keys)
+        return queue
+
+    def subscribe(self, handler: typing.Callable[[T], typing.Any], keys: typing.Iterable[T] = None, *,
+                  concurrency: int = 1, order_key: typing.Callable[[T], typing.Hashable] = None
+                  ) -> typing.Optional[AsyncSubscription]:
+        """Adds a handler, which is only called for event values in `keys`, or for all values if `keys` is None.
+
+        For example, `instrument.on_market_data.subscribe(handler, {TickType.Bid, TickType.Ask})` is not called for
+        any other tick types.
+
+        Coroutine functions are scheduled as tasks, see `AsyncSubscription` for the meaning of `concurrency` and
+        `order_key`. For those, the subscription is returned, which exposes backlog statistics."""
         had_handlers = len(self._handlers)
         try:
-            handler_ref = weakref.WeakMethod(other)  # type: ignore
-        except TypeError:  # apparently other isn't a method. Use weakref instead
-            handler_ref = weakref.ref(other)  # type: ignore
+            handler_ref = weakref.WeakMethod(handler)  # type: ignore
+        except TypeError:  # apparently handler isn't a method. Use weakref instead
+            handler_ref = weakref.ref(handler)  # type: ignore
+
+        subscription = None
+        if asyncio.iscoroutinefunction(handler):
+            subscription = AsyncSubscription(handler_ref, concurrency, order_key)
+            handler_ref = subscription.ref  # type: ignore
 
-        self._handlers.append(handler_ref)
+        self._set_handlers(self._handlers + [(handler_ref, None if keys is None else frozenset(keys))])
 
         if not had_handlers and self.on_subscribe:
             self.on_subscribe()
+
+        return subscription
+
+    def __iadd__(self, other: typing.Callable[[T], typing.Any]) -> "EventInstance[T]":
+        self.subscribe(other)
         return self
 
-    def __isub__(self, other: typing.Callable[[T], typing.Any]):
+    def __isub__(self, other: typing.Callable[[T], typing.Any]) -> "EventInstance[T]":
         self._live_handlers(other)
         return self
 
@@ -92,24 +454,45 @@ class EventInstance(typing.Generic[T]):
 class Event(typing.Generic[T]):
     def __init__(self):
         self._attribute = "__evt_%x" % abs(id(self))
+        self._name = None  # type: str
         self._on_subscribe = None
         self._on_unsubscribe = None
 
+    def __set_name__(self, owner, name):
+        # Only called on python >= 3.6. It gives profiling output a readable name.
+        self._name = "%s.%s" % (owner.__name__, name)
+
     def __get__(self, instance, owner) -> EventInstance[T]:
         if not instance:
             return self  # type: ignore  # noqa
 
+        storage = self._storage(instance)
         try:
-            event = getattr(instance, self._attribute)
-        except AttributeError:
-            event = EventInstance(
+            event = storage[self._attribute]
+        except KeyError:
+            event = storage[self._attribute] = EventInstance(
                 (lambda: self._on_subscribe(instance)) if self._on_subscribe else None,
                 (lambda: self._on_unsubscribe(instance)) if self._on_unsubscribe else None,
+                self._name,
             )
-            setattr(instance, self._attribute, event)
 
         return event
 
+    def __set__(self, instance, value: EventInstance[T]) -> None:
+        # Needed to support `instance.event += handler`, and to allow replacing events with mocks.
+        self._storage(instance)[self._attribute] = value
+
+    @staticmethod
+    def _storage(instance) -> typing.Dict[str, typing.Any]:
+        try:
+            return instance.__dict__
+        except AttributeError:
+            # Slotted classes provide an `_event_storage` slot instead, which is populated on first use.
+            storage = instance._event_storage
+            if storage is None:
+                storage = instance._event_storage = {}
+            return storage
+
     def on_subscribe(self, fn: typing.Callable[[typing.Any], None]):
         """Decorator to add a handler for the first data consumer.
 
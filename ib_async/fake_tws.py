@@ -0,0 +1,266 @@
+"""A stand-in for TWS, to test and benchmark the client over a real socket without an IB account."""
+import asyncio
+import logging
+import random
+import re
+import struct
+import time
+import typing
+
+from ib_async.messages import Incoming, Outgoing
+from ib_async.protocol import split_fields
+from ib_async.protocol_versions import ProtocolVersion
+from ib_async.tick_types import TickType
+
+LOG = logging.getLogger(__name__)
+
+Responder = typing.Callable[["FakeTWSSession", typing.List[str]], None]
+
+_tick_by_tick_types = {'last': 1, 'alllast': 2, 'bidask': 3, 'midpoint': 4}
+
+
+def encode_message(*fields) -> bytes:
+    """Encodes a message the way TWS sends it: a length prefix, followed by null-terminated fields."""
+    encoded = []
+    for field in fields:
+        if field is None:
+            field = ""
+        elif isinstance(field, bool):
+            field = int(field)
+        encoded.append(str(getattr(field, "value", field)).encode())
+
+    body = b"\0".join(encoded) + b"\0"
+    return struct.pack("!I", len(body)) + body
+
+
+class _Subscription:
+    """A stream of synthetic data for one request of a client."""
+
+    def __init__(self, kind: str, request_id: int, rng: random.Random, rows=0, tick_type=0) -> None:
+        self.kind = kind
+        self.request_id = request_id
+        self.rows = rows
+        self.tick_type = tick_type
+        self.price = 100.0
+        self.rng = rng
+        self._depth_rows = [0, 0]  # Rows inserted so far, by side
+        self._sequence = 0
+
+    def next_message(self) -> bytes:
+        self._sequence += 1
+        self.price = max(0.01, round(self.price + self.rng.choice((-0.01, 0.0, 0.01)), 2))
+        size = self.rng.randint(1, 10) * 100
+
+        if self.kind == 'market_data':
+            if self._sequence % 2:
+                tick_type = TickType.Bid if self._sequence % 4 == 1 else TickType.Ask
+                return encode_message(Incoming.TICK_PRICE, 6, self.request_id, tick_type, self.price, size, 0)
+            return encode_message(Incoming.TICK_SIZE, 6, self.request_id, TickType.LastSize, size)
+
+        if self.kind == 'depth':
+            side = self._sequence % 2
+            if self._depth_rows[side] < self.rows:
+                position = self._depth_rows[side]
+                self._depth_rows[side] += 1
+                operation = 0  # Insert
+            else:
+                position = self.rng.randrange(self.rows)
+                operation = 1  # Update
+            return encode_message(Incoming.MARKET_DEPTH, 1, self.request_id, position, operation, side,
+                                  self.price, size)
+
+        now = int(time.time())
+        if self.tick_type in (1, 2):
+            return encode_message(Incoming.TICK_BY_TICK, self.request_id, self.tick_type, now,
+                                  self.price, size, 0, "ISLAND", "")
+        if self.tick_type == 3:
+            return encode_message(Incoming.TICK_BY_TICK, self.request_id, 3, now,
+                                  self.price, self.price + 0.01, size, size, 0)
+        return encode_message(Incoming.TICK_BY_TICK, self.request_id, 4, now, self.price)
+
+
+class FakeTWSSession:
+    """The connection of a single client to a `FakeTWS`."""
+
+    def __init__(self, server: "FakeTWS", reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.version = None  # type: ProtocolVersion
+        self.client_id = None  # type: int
+        self.subscriptions = {}  # type: typing.Dict[int, _Subscription]
+        self.received = []  # type: typing.List[typing.List[str]]
+        self.messages_streamed = 0
+
+    def send(self, *fields):
+        self.writer.write(encode_message(*fields))
+
+    def subscribe(self, kind: str, request_id: int, **kwargs):
+        self.subscriptions[request_id] = _Subscription(kind, request_id, self.server.random, **kwargs)
+
+    def unsubscribe(self, request_id: int):
+        self.subscriptions.pop(request_id, None)
+
+    def close(self):
+        self.writer.close()
+
+    async def run(self):
+        stream_task = None
+        try:
+            await self._handshake()
+            stream_task = asyncio.ensure_future(self._stream())
+
+            while True:
+                size = struct.unpack("!I", await self.reader.readexactly(4))[0]
+                fields = split_fields(await self.reader.readexactly(size))
+                self.received.append(fields)
+                self._handle(fields)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if stream_task:
+                stream_task.cancel()
+            self.writer.close()
+            self.server.sessions.remove(self)
+
+    async def _handshake(self):
+        prefix = await self.reader.readexactly(4)
+        if prefix != b"API\0":
+            raise ConnectionError("Unexpected handshake %r" % prefix)
+
+        size = struct.unpack("!I", await self.reader.readexactly(4))[0]
+        versions = (await self.reader.readexactly(size)).decode()
+        match = re.match(r"v(\d+)(?:\.\.(\d+))?", versions)
+        if not match:
+            raise ConnectionError("Unexpected version range %r" % versions)
+
+        client_max = int(match.group(2) or match.group(1))
+        self.version = ProtocolVersion(min(client_max, self.server.version))
+        self.send(self.version, time.strftime("%Y%m%d %H:%M:%S GMT", time.gmtime()))
+
+    def _handle(self, fields: typing.List[str]):
+        try:
+            message_type = Outgoing(int(fields[0]))
+        except ValueError:
+            LOG.warning("Fake TWS received unknown message %r", fields)
+            return
+
+        responder = self.server.responders.get(message_type)
+        if responder:
+            responder(self, fields)
+        else:
+            LOG.debug("Fake TWS ignores %r", fields)
+
+    async def _stream(self):
+        """Sends synthetic data for the active subscriptions, at `server.rate` messages per second in total."""
+        loop = asyncio.get_event_loop()
+        rate = self.server.rate
+        if not rate:
+            return
+
+        start = loop.time()
+        sent = 0
+        while True:
+            await asyncio.sleep(self.server.stream_interval)
+
+            subscriptions = list(self.subscriptions.values())
+            if not subscriptions:
+                start = loop.time()
+                sent = 0
+                continue
+
+            due = int((loop.time() - start) * rate) - sent
+            for i in range(due):
+                self.writer.write(subscriptions[(sent + i) % len(subscriptions)].next_message())
+            sent += due
+            self.messages_streamed += due
+            await self.writer.drain()
+
+
+def _respond_start_api(session: FakeTWSSession, fields: typing.List[str]):
+    session.client_id = int(fields[2]) if fields[2] else None
+    session.send(Incoming.NEXT_VALID_ID, 1, 1)
+    session.send(Incoming.MANAGED_ACCTS, 1, "DU000000")
+
+
+def _respond_current_time(session: FakeTWSSession, fields: typing.List[str]):
+    session.send(Incoming.CURRENT_TIME, 1, int(time.time()))
+
+
+def _respond_matching_symbols(session: FakeTWSSession, fields: typing.List[str]):
+    session.send(Incoming.SYMBOL_SAMPLES, fields[1], 0)
+
+
+def _respond_market_data(session: FakeTWSSession, fields: typing.List[str]):
+    session.subscribe('market_data', int(fields[2]))
+
+
+def _respond_market_depth(session: FakeTWSSession, fields: typing.List[str]):
+    session.subscribe('depth', int(fields[2]), rows=int(fields[14]))
+
+
+def _respond_tick_by_tick(session: FakeTWSSession, fields: typing.List[str]):
+    session.subscribe('tick_by_tick', int(fields[1]), tick_type=_tick_by_tick_types.get(fields[14].lower(), 1))
+
+
+def _respond_cancel(request_id_field: int) -> Responder:
+    def respond(session: FakeTWSSession, fields: typing.List[str]):
+        session.unsubscribe(int(fields[request_id_field]))
+    return respond
+
+
+class FakeTWS:
+    """An asyncio server speaking enough of the TWS protocol to connect a client, and stream data to it.
+
+    Market data, market depth and tick by tick subscriptions receive synthetic data, `rate` messages per second in
+    total for each client. Other requests are answered by the functions in `responders`, which can be replaced or
+    extended to script other responses. Requests without a responder are ignored."""
+
+    def __init__(self, host="127.0.0.1", port=0, version=ProtocolVersion.MAX_CLIENT, rate: float = 1000.0,
+                 seed: int = None) -> None:
+        self.host = host
+        self.port = port
+        self.version = version
+        self.rate = rate
+        self.stream_interval = 0.001
+        self.random = random.Random(seed)
+        self.sessions = []  # type: typing.List[FakeTWSSession]
+
+        self.responders = {
+            Outgoing.START_API: _respond_start_api,
+            Outgoing.REQ_CURRENT_TIME: _respond_current_time,
+            Outgoing.REQ_MATCHING_SYMBOLS: _respond_matching_symbols,
+            Outgoing.REQ_MKT_DATA: _respond_market_data,
+            Outgoing.CANCEL_MKT_DATA: _respond_cancel(2),
+            Outgoing.REQ_MKT_DEPTH: _respond_market_depth,
+            Outgoing.CANCEL_MKT_DEPTH: _respond_cancel(2),
+            Outgoing.REQ_TICK_BY_TICK_DATA: _respond_tick_by_tick,
+            Outgoing.CANCEL_TICK_BY_TICK_DATA: _respond_cancel(1),
+        }  # type: typing.Dict[Outgoing, Responder]
+
+        self._server = None  # type: asyncio.AbstractServer
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._accept, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for session in list(self.sessions):
+            session.close()
+
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session = FakeTWSSession(self, reader, writer)
+        self.sessions.append(session)
+        await session.run()
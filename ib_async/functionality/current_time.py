@@ -2,8 +2,10 @@ import asyncio
 import logging
 import typing
 
+from ib_async.errors import NotConnectedError
 from ib_async.messages import Outgoing
 from ib_async.protocol import ProtocolInterface
+from ib_async.utils import silence_exception
 
 LOG = logging.getLogger(__name__)
 
@@ -21,3 +23,10 @@ class CurrentTimeMixin(ProtocolInterface):
         self._current_time_future = asyncio.Future()
         self.send_message(Outgoing.REQ_CURRENT_TIME, 1)
         return self._current_time_future
+
+    def _disconnected(self):
+        if not self._current_time_future.done():
+            # The initial future is never awaited
+            self._current_time_future.add_done_callback(silence_exception)
+            self._current_time_future.set_exception(NotConnectedError())
+        super()._disconnected()
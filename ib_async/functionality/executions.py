@@ -23,7 +23,7 @@ class ExecutionsMixin(ProtocolInterface):
 
     def get_executions(self, client_id=0, account_code="", time="", symbol="", security_type=SecurityType.Unspecified,
                        exchange="", side="") -> "asyncio.Future[Execution]":
-        request_id, future = self.make_future()
+        request_id, future = self.make_future(Outgoing.REQ_EXECUTIONS)
 
         self.send_message(
             Outgoing.REQ_EXECUTIONS, 3, request_id,
@@ -1,65 +1,230 @@
+import asyncio
+import collections
 import datetime
+import functools
 import logging
 import typing
 
-from ib_async.instrument import Instrument, SecurityType, SecurityIdentifierType
+from ib_async import contract_cache
+from ib_async.instrument import Instrument, InstrumentRegistry, SecurityType, SecurityIdentifierType
 from ib_async.messages import Outgoing
 from ib_async.protocol import RequestId, ProtocolInterface, IncomingMessage
 from ib_async.protocol_versions import ProtocolVersion
+from ib_async.utils import wrap_immediate_future
 
 LOG = logging.getLogger(__name__)
 
+InstrumentSpec = typing.Union[Instrument, typing.Dict[str, typing.Any]]
+
+InstrumentResolution = typing.NamedTuple("InstrumentResolution", [
+    ('spec', InstrumentSpec),
+    ('instrument', typing.Optional[Instrument]),
+    ('error', typing.Optional[BaseException]),
+])
+
+
+def _log_failed_revalidation(cache_key: str, future: asyncio.Future):
+    if not future.cancelled() and future.exception() is not None:
+        LOG.warning("Failed to revalidate cached contract %s: %s", cache_key, future.exception())
+
+
+class _BulkResolver:
+    """Async iterator that resolves specs, keeping at most `window` requests in flight.
+
+    Results are yielded in order of arrival. Failures are yielded as results with an error, rather than raised."""
+
+    def __init__(self, resolve: typing.Callable[[InstrumentSpec], typing.Awaitable[Instrument]],
+                 specs: typing.Iterable[InstrumentSpec], window: int) -> None:
+        self._resolve = resolve
+        self._specs = iter(specs)
+        self._window = window
+        self._in_flight = set()  # type: typing.Set[asyncio.Future]
+        self._results = collections.deque()  # type: typing.Deque[InstrumentResolution]
+        self._wakeup = asyncio.Future()  # type: asyncio.Future
+        self._exhausted = False
+
+    def _fill(self):
+        while not self._exhausted and len(self._in_flight) < self._window:
+            try:
+                spec = next(self._specs)
+            except StopIteration:
+                self._exhausted = True
+                break
+
+            try:
+                future = asyncio.ensure_future(self._resolve(spec))
+            except Exception as ex:
+                self._add_result(InstrumentResolution(spec, None, ex))
+                continue
+
+            self._in_flight.add(future)
+            future.add_done_callback(functools.partial(self._on_done, spec))
+
+    def _on_done(self, spec: InstrumentSpec, future: asyncio.Future):
+        self._in_flight.discard(future)
+        if future.cancelled():
+            self._add_result(InstrumentResolution(spec, None, asyncio.CancelledError()))
+        elif future.exception():
+            self._add_result(InstrumentResolution(spec, None, future.exception()))
+        else:
+            self._add_result(InstrumentResolution(spec, future.result(), None))
+
+        self._fill()
+
+    def _add_result(self, result: InstrumentResolution):
+        self._results.append(result)
+        if not self._wakeup.done():
+            self._wakeup.set_result(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> InstrumentResolution:
+        self._fill()
+        while not self._results:
+            if not self._in_flight:
+                raise StopAsyncIteration()
+            await self._wakeup
+            self._wakeup = asyncio.Future()
+
+        return self._results.popleft()
+
+
+class _InstrumentStream:
+    """Async iterator over the instruments matching a single contract data request."""
+
+    def __init__(self, future: asyncio.Future) -> None:
+        self._instruments = collections.deque()  # type: typing.Deque[Instrument]
+        self._wakeup = asyncio.Future()  # type: asyncio.Future
+        self._future = future
+        future.add_done_callback(self._wake)
+
+    def push(self, instrument: Instrument):
+        self._instruments.append(instrument)
+        self._wake()
+
+    def _wake(self, *args):
+        if not self._wakeup.done():
+            self._wakeup.set_result(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Instrument:
+        while not self._instruments:
+            if self._future.done():
+                if not self._future.cancelled() and self._future.exception():
+                    raise self._future.exception()
+                raise StopAsyncIteration()
+
+            await self._wakeup
+            self._wakeup = asyncio.Future()
+
+        return self._instruments.popleft()
+
 
 class InstrumentDetailsMixin(ProtocolInterface):
     def __init__(self):
         super().__init__()
         self._pending_instrument_updates = {}  # type: typing.Dict[RequestId, Instrument]
+        self._pending_cache_keys = {}  # type: typing.Dict[RequestId, str]
+        self._contract_data_streams = {}  # type: typing.Dict[RequestId, _InstrumentStream]
 
-    def refresh_instrument(self, instrument: Instrument, include_expired=False) -> typing.Awaitable[Instrument]:
-        request_id, future = self.make_future()
+        # Set to a ContractCache to resolve instruments from disk where possible.
+        self.contract_cache = None  # type: contract_cache.ContractCache
+
+    @property
+    def instruments(self) -> InstrumentRegistry:
+        """The registry of all live instruments, which supports lookups by symbol, exchange, underlying etc."""
+        return InstrumentRegistry.for_parent(self)
 
+    def __get_cached_instrument(self, cache_key: str) -> typing.Tuple[typing.Optional[Instrument], bool]:
+        if self.contract_cache is None:
+            return None, False
+
+        return self.contract_cache.get_instrument(self, cache_key)
+
+    def __lookup_contract(self, cache_key: str, *fields) -> typing.Awaitable[Instrument]:
+        """Finds a single instrument in the cache, or requests it. Identical pending requests are shared."""
+        cached, stale = self.__get_cached_instrument(cache_key)
+        if cached and not stale:
+            return wrap_immediate_future(cached)
+
+        future = self.singleflight((Outgoing.REQ_CONTRACT_DATA,) + fields,
+                                   lambda: self.__request_contract_data(cache_key, *fields)[1])
+        if not cached:
+            return future
+
+        # Stale entries are returned right away, the request above revalidates them in the background. Nobody awaits
+        # the revalidation, so its failure is logged here.
+        future.add_done_callback(functools.partial(_log_failed_revalidation, cache_key))
+        return wrap_immediate_future(cached)
+
+    def __request_contract_data(self, cache_key: typing.Optional[str], *fields
+                                ) -> typing.Tuple[RequestId, typing.Awaitable[Instrument]]:
+        request_id, future = self.make_future(Outgoing.REQ_CONTRACT_DATA)
+        self.send_message(Outgoing.REQ_CONTRACT_DATA, 8, request_id, *fields)
+        if cache_key:
+            self._pending_cache_keys[request_id] = cache_key
+        return request_id, future
+
+    def refresh_instrument(self, instrument: Instrument, include_expired=False) -> typing.Awaitable[Instrument]:
         if instrument.security_ids:
             security_id_type, security_id = next(iter(instrument.security_ids.items()))
         else:
             security_id_type = security_id = None
 
-        self.send_message(Outgoing.REQ_CONTRACT_DATA, 8, request_id,
-                          instrument,
-                          include_expired, security_id_type, security_id)
-        self._pending_instrument_updates[request_id] = instrument
+        if instrument.contract_id:
+            cache_key = contract_cache.contract_id_key(instrument.contract_id)
+        elif security_id:
+            cache_key = contract_cache.security_id_key(security_id_type, security_id)
+        else:
+            cache_key = None
 
-        return future
+        if self.contract_cache is not None and cache_key:
+            found = self.contract_cache.lookup(cache_key)
+            if found and (not instrument.contract_id or found[0]['contract_id'] == instrument.contract_id):
+                fields, stale = found
+                self.contract_cache.apply(instrument, fields)
+                if not stale:
+                    return wrap_immediate_future(instrument)
+
+        def request():
+            request_id, future = self.__request_contract_data(cache_key,
+                                                              instrument,
+                                                              include_expired, security_id_type, security_id)
+            self._pending_instrument_updates[request_id] = instrument
+            return future
+
+        return self.singleflight((Outgoing.REQ_CONTRACT_DATA, id(instrument), include_expired), request)
 
     def get_instrument_by_id(self, security_id: str,
                              security_id_type: typing.Union[SecurityIdentifierType, str],
                              include_expired=False) -> typing.Awaitable[Instrument]:
-        request_id, future = self.make_future()
-
-        self.send_message(Outgoing.REQ_CONTRACT_DATA, 8, request_id,
-                          0,  # contract_id
-                          "",  # symbol
-                          None,  # security_type
-                          None,  # last_trade_date or contract.contract_month
-                          None,  # strike
-                          None,  # right
-                          None,  # multiplier
-                          None,  # exchange
-                          None,  # primary_exchange
-                          None,  # currency
-                          None,  # local_symbol
-                          None,  # trading_class
-                          include_expired,
-                          SecurityIdentifierType(security_id_type),
-                          security_id)
-
-        return future
+        cache_key = contract_cache.security_id_key(SecurityIdentifierType(security_id_type), security_id)
+        return self.__lookup_contract(
+            cache_key,
+            0,  # contract_id
+            "",  # symbol
+            None,  # security_type
+            None,  # last_trade_date or contract.contract_month
+            None,  # strike
+            None,  # right
+            None,  # multiplier
+            None,  # exchange
+            None,  # primary_exchange
+            None,  # currency
+            None,  # local_symbol
+            None,  # trading_class
+            include_expired,
+            SecurityIdentifierType(security_id_type),
+            security_id)
 
     def get_instrument_by_local_symbol(self, symbol: str, exchange: str, security_type=SecurityType.Stock,
                                        trading_class="", include_expired=False) -> typing.Awaitable[Instrument]:
-        request_id, future = self.make_future()
-
-        self.send_message(
-            Outgoing.REQ_CONTRACT_DATA, 8, request_id,
+        cache_key = contract_cache.local_symbol_key(symbol, exchange, security_type, trading_class)
+        return self.__lookup_contract(
+            cache_key,
             0,  # contract_id
             "",  # symbol
             security_type,  # security_type
@@ -77,18 +242,69 @@ class InstrumentDetailsMixin(ProtocolInterface):
             None,  # security_id
         )
 
-        return future
+    def find_instruments(self, symbol: str, security_type=SecurityType.Unspecified, exchange="", currency="",
+                         contract_month="", strike: float = None, right="", multiplier="", trading_class="",
+                         include_expired=False) -> typing.AsyncIterator[Instrument]:
+        """Yields every instrument matching the given fields, e.g. all expiries of a future, or a full option chain.
+
+        Unlike the `get_instrument_*` methods, this does not stop at the first match, but continues until TWS reports
+        that all matches have been sent."""
+        request_id, future = self.make_future(Outgoing.REQ_CONTRACT_DATA)
+        stream = self._contract_data_streams[request_id] = _InstrumentStream(future)
+        future.add_done_callback(lambda _: self._contract_data_streams.pop(request_id, None))
+
+        self.send_message(
+            Outgoing.REQ_CONTRACT_DATA, 8, request_id,
+            0,  # contract_id
+            symbol,  # symbol
+            security_type,  # security_type
+            contract_month,  # last_trade_date or contract.contract_month
+            strike,  # strike
+            right,  # right
+            multiplier,  # multiplier
+            exchange,  # exchange
+            None,  # primary_exchange
+            currency,  # currency
+            None,  # local_symbol
+            trading_class,  # trading_class
+            include_expired,
+            None,  # security_id_type,
+            None,  # security_id
+        )
+
+        return stream
+
+    def resolve_instruments(self, specs: typing.Iterable[InstrumentSpec],
+                            window: int = 50) -> typing.AsyncIterator[InstrumentResolution]:
+        """Resolves many instruments, keeping at most `window` requests in flight.
+
+        Each spec is either an `Instrument` to refresh, or a dict of keyword arguments for `get_instrument_by_id` (if it
+        contains `security_id`) or `get_instrument_by_local_symbol`. Yields an `InstrumentResolution` per spec as soon
+        as it is resolved. Errors, such as an `ApiException` for unknown instruments, are reported in its `error`
+        field, and do not affect the other specs."""
+        return _BulkResolver(self.__resolve_spec, specs, window)
+
+    def __resolve_spec(self, spec: InstrumentSpec) -> typing.Awaitable[Instrument]:
+        if isinstance(spec, Instrument):
+            return self.refresh_instrument(spec)
+        elif 'security_id' in spec:
+            return self.get_instrument_by_id(**spec)
+        else:
+            return self.get_instrument_by_local_symbol(**spec)
 
     def _handle_contract_data(self, request_id: RequestId, message: IncomingMessage):
         # fast forward to instrument id position, so that we avoid making new contracts when existing ones can be
         # reused. This is required for proper event routing elsewhere
 
+        # Large results, such as option chains, keep streaming well past the timeout of the request
+        self.extend_deadline(request_id)
+
         instrument = self._pending_instrument_updates.get(request_id)
 
         if not instrument:
+            # A request can match many contracts, so each message gets an instrument of its own.
             message.idx += 10
             instrument = Instrument.get_instance_from(message)
-            self._pending_instrument_updates[request_id] = instrument
             message.idx -= 10
 
         instrument.symbol = message.read(str)
@@ -131,9 +347,21 @@ class InstrumentDetailsMixin(ProtocolInterface):
 
         instrument.market_rule_ids = message.read(str, min_version=ProtocolVersion.MARKET_RULES)
         instrument.real_expiration_date = message.read(datetime.datetime, min_version=ProtocolVersion.REAL_EXPIRATION_DATE)
+        instrument.reindex()
+
+        if self.contract_cache is not None:
+            cache_key = self._pending_cache_keys.get(request_id)
+            self.contract_cache.store(instrument, [cache_key] if cache_key else [])
 
-        self.resolve_future(request_id, instrument)
+        stream = self._contract_data_streams.get(request_id)
+        if stream:
+            stream.push(instrument)
+        else:
+            self.resolve_future(request_id, instrument)
 
     def _handle_contract_data_end(self, request_id: RequestId):
+        self._pending_cache_keys.pop(request_id, None)
+        self._pending_instrument_updates.pop(request_id, None)
+
         # If the future has not already been resolved, nothing has been found.
         self.resolve_future(request_id, None)
@@ -3,6 +3,7 @@ import logging
 import typing
 
 from ib_async.errors import UnsupportedFeature
+from ib_async.event import Event
 from ib_async.instrument import Instrument
 from ib_async.messages import Outgoing
 from ib_async.protocol import RequestId, ProtocolInterface, OutgoingMessage
@@ -11,11 +12,48 @@ from ib_async.tick_types import TickTypeGroup, MarketDataTimeliness, TickType, T
 
 LOG = logging.getLogger(__name__)
 
+MarketDataEvent = typing.NamedTuple("MarketDataEvent", [
+    ('instrument', Instrument),
+    ('tick_type', TickType),
+    ('value', typing.Any),
+])
+
 
 class MarketDataMixin(ProtocolInterface):
     def __init__(self):
         super().__init__()
         self.__instruments = {}
+        self.__market_data_batch = []  # type: typing.List[MarketDataEvent]
+
+        # The parameters of streaming subscriptions, needed to restore them after a reconnect.
+        self.__subscriptions = {}  # type: typing.Dict[RequestId, typing.Tuple[tuple, typing.Dict[str, str]]]
+
+    # Market data for all subscribed instruments, as they arrive.
+    on_market_data = Event()  # type: Event[MarketDataEvent]
+
+    # Market data for all subscribed instruments, delivered once per event loop iteration.
+    on_market_data_batch = Event()  # type: Event[typing.List[MarketDataEvent]]
+
+    def __dispatch_market_data(self, instrument: Instrument, tick_type: TickType, value: typing.Any,
+                               size: float = None, attributes: typing.List[TickAttributes] = None):
+        size_tick_type = instrument.handle_market_data(tick_type, value, size, attributes)
+
+        if self.on_market_data.may_have_subscribers:
+            self.on_market_data(MarketDataEvent(instrument, tick_type, value))
+            if size_tick_type:
+                self.on_market_data(MarketDataEvent(instrument, size_tick_type, size))
+
+        if self.on_market_data_batch.may_have_subscribers:
+            if not self.__market_data_batch:
+                asyncio.get_event_loop().call_soon(self.__flush_market_data_batch)
+            self.__market_data_batch.append(MarketDataEvent(instrument, tick_type, value))
+            if size_tick_type:
+                self.__market_data_batch.append(MarketDataEvent(instrument, size_tick_type, size))
+
+    def __flush_market_data_batch(self):
+        batch, self.__market_data_batch = self.__market_data_batch, []
+        if batch:
+            self.on_market_data_batch(batch)
 
     def change_market_data_timeliness(self, timeliness: MarketDataTimeliness):
         """Switches market data timeliness.
@@ -33,17 +71,37 @@ class MarketDataMixin(ProtocolInterface):
     def get_market_data(self, instrument: Instrument,
                         tick_types: typing.Iterable[TickTypeGroup] = (),
                         snapshot=False, regulatory_snapshot=False,
-                        market_data_options: typing.Dict[str, str] = None) -> typing.Awaitable[None]:
+                        market_data_options: typing.Dict[str, str] = None,
+                        request_id: RequestId = None) -> typing.Awaitable[None]:
+        """Requests market data for an instrument, streaming unless `snapshot` is set.
+
+        A new streaming subscription uses `request_id` when given, rather than generating one."""
         if regulatory_snapshot:
             self.check_feature(ProtocolVersion.REQ_SMART_COMPONENTS, "regulatory snapshots")
 
         if snapshot:
-            request_id, future = self.make_future()
+            # Identical snapshots requested while one is in flight share its result.
+            tick_types = tuple(tick_types)
+            key = (Outgoing.REQ_MKT_DATA, id(instrument), tick_types, regulatory_snapshot,
+                   tuple(sorted((market_data_options or {}).items())))
+            return self.singleflight(key, lambda: self.__request_market_data(instrument, tick_types, snapshot,
+                                                                             regulatory_snapshot, market_data_options))
+
+        return self.__request_market_data(instrument, tick_types, snapshot, regulatory_snapshot, market_data_options,
+                                          request_id)
+
+    def __request_market_data(self, instrument: Instrument, tick_types: typing.Iterable[TickTypeGroup],
+                              snapshot: bool, regulatory_snapshot: bool,
+                              market_data_options: typing.Optional[typing.Dict[str, str]],
+                              request_id: RequestId = None) -> typing.Awaitable[None]:
+        tick_types = tuple(tick_types)
+        if snapshot:
+            request_id, future = self.make_future(Outgoing.REQ_MKT_DATA)
         elif instrument._market_data_request_id:
             request_id = instrument._market_data_request_id
             future = asyncio.Future()
         else:
-            request_id, future = self.make_future()
+            request_id, future = self.make_future(Outgoing.REQ_MKT_DATA, request_id=request_id)
 
         message = OutgoingMessage(Outgoing.REQ_MKT_DATA, 11, request_id, protocol_version=self.version)
         message.add(instrument)
@@ -72,6 +130,7 @@ class MarketDataMixin(ProtocolInterface):
 
         if not snapshot:
             instrument._market_data_request_id = request_id
+            self.__subscriptions[request_id] = tick_types, market_data_options
             # subscriptions are complete as soon as the request is sent.
             self.resolve_future(request_id, instrument)
 
@@ -79,26 +138,33 @@ class MarketDataMixin(ProtocolInterface):
 
     def cancel_market_data(self, instrument: Instrument):
         """Cancels a RT Market Data request."""
-        message = OutgoingMessage(Outgoing.CANCEL_MKT_DATA, 2, instrument._market_data_request_id)
-        self.send(message)
+        self.send_cancel_message(Outgoing.CANCEL_MKT_DATA, 2, instrument._market_data_request_id)
+        self.__subscriptions.pop(instrument._market_data_request_id, None)
         instrument._market_data_request_id = None
 
+    def _resubscribe(self):
+        for request_id, (tick_types, market_data_options) in list(self.__subscriptions.items()):
+            instrument = self.__instruments.get(request_id)
+            if instrument and instrument._market_data_request_id == request_id:
+                self.__request_market_data(instrument, tick_types, False, False, market_data_options)
+        super()._resubscribe()
+
     def _handle_tick_price(self, request_id: RequestId, tick_type: TickType, price: float, size: float,
                            attributes: int):
         instrument = self.__instruments[request_id]
-        instrument.handle_market_data(tick_type, price, size, TickAttributes.list_from_int(attributes))
+        self.__dispatch_market_data(instrument, tick_type, price, size, TickAttributes.list_from_int(attributes))
 
     def _handle_tick_generic(self, request_id: RequestId, tick_type: TickType, value: float):
         instrument = self.__instruments[request_id]
-        instrument.handle_market_data(tick_type, value)
+        self.__dispatch_market_data(instrument, tick_type, value)
 
     def _handle_tick_size(self, request_id: RequestId, tick_type: TickType, value: int):
         instrument = self.__instruments[request_id]
-        instrument.handle_market_data(tick_type, value)
+        self.__dispatch_market_data(instrument, tick_type, value)
 
     def _handle_tick_string(self, request_id: RequestId, tick_type: TickType, value: str):
         instrument = self.__instruments[request_id]
-        instrument.handle_market_data(tick_type, value)
+        self.__dispatch_market_data(instrument, tick_type, value)
 
     def _handle_tick_req_params(self, request_id: RequestId, min_tick: float, bbo_exchange: str,
                                 snapshot_permissions: int):
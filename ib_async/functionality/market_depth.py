@@ -1,4 +1,5 @@
 import logging
+import typing  # noqa
 
 from ib_async.instrument import Instrument
 from ib_async.messages import Outgoing
@@ -11,12 +12,16 @@ class MarketDepthMixin(ProtocolInterface):
     def __init__(self):
         super().__init__()
         self.__instruments = {}
+        self.__num_rows = {}  # type: typing.Dict[RequestId, int]
 
-    def subscribe_market_depth(self, instrument: Instrument, num_rows: int):
+    def subscribe_market_depth(self, instrument: Instrument, num_rows: int, request_id: RequestId = None):
+        """Subscribes to the order book of an instrument.
+
+        `request_id` sets the id of a new subscription, such as the id of a recorded request."""
         if instrument._market_depth_request_id:
             request_id = instrument._market_depth_request_id
         else:
-            request_id, future = self.make_future()
+            request_id, future = self.make_future(Outgoing.REQ_MKT_DEPTH, request_id=request_id)
             self.resolve_future(request_id, None)
 
         self.send_message(Outgoing.REQ_MKT_DEPTH, 5, request_id,
@@ -24,14 +29,22 @@ class MarketDepthMixin(ProtocolInterface):
                           {})  # options. Undocumented
 
         self.__instruments[request_id] = instrument
+        self.__num_rows[request_id] = num_rows
         instrument._market_depth_request_id = request_id
 
     def unsubscribe_market_depth(self, instrument: Instrument):
         if instrument._market_depth_request_id:
-            self.send_message(Outgoing.CANCEL_MKT_DEPTH, 0, instrument._market_depth_request_id)
+            self.send_cancel_message(Outgoing.CANCEL_MKT_DEPTH, 0, instrument._market_depth_request_id)
             self.__instruments.pop(instrument._market_depth_request_id, None)
+            self.__num_rows.pop(instrument._market_depth_request_id, None)
             instrument._market_depth_request_id = None
 
+    def _resubscribe(self):
+        for request_id, instrument in list(self.__instruments.items()):
+            if instrument._market_depth_request_id == request_id:
+                self.subscribe_market_depth(instrument, self.__num_rows[request_id])
+        super()._resubscribe()
+
     def _handle_market_depth(self, request_id: RequestId, position: int,
                              operation: int, side: int, price: float, size: int):
         self._handle_market_depth_l2(request_id, position, "", operation, side, price, size)
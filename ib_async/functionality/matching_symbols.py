@@ -21,6 +21,7 @@ class MatchingSymbolsMixin(ProtocolInterface):
             contract.security_type = SecurityType(message.read(str))
             contract.primary_exchange = message.read(str)
             contract.currency = message.read(str)
+            contract.reindex()
 
             message.read(typing.List[str])  # derivative_security_types
 
@@ -31,6 +32,9 @@ class MatchingSymbolsMixin(ProtocolInterface):
     def matching_symbols(self, pattern: str) -> typing.Awaitable[typing.List[Instrument]]:
         self.check_feature(ProtocolVersion.REQ_MATCHING_SYMBOLS, "matching symbols request.")
 
-        request_id, future = self.make_future()
-        self.send_message(Outgoing.REQ_MATCHING_SYMBOLS, request_id, pattern)
-        return future
+        def request():
+            request_id, future = self.make_future(Outgoing.REQ_MATCHING_SYMBOLS)
+            self.send_message(Outgoing.REQ_MATCHING_SYMBOLS, request_id, pattern)
+            return future
+
+        return self.singleflight((Outgoing.REQ_MATCHING_SYMBOLS, pattern), request)
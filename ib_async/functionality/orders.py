@@ -3,7 +3,7 @@ import datetime
 import logging
 import typing
 
-from ib_async.errors import UnsupportedFeature, ApiException
+from ib_async.errors import UnsupportedFeature, ApiException, NotConnectedError
 from ib_async.order import Order, Action, OrderType, TimeInForce, OrderOrigin
 from ib_async.instrument import Instrument, UnderlyingComponent
 from ib_async.messages import Outgoing
@@ -115,6 +115,7 @@ class OrdersMixin(ProtocolInterface):
             order.client_id = client_id
             order.why_held = why_held
             order.market_cap_price = market_cap_price
+            order.receive_time = self.receive_time
 
             order.updated(None)
 
@@ -294,6 +295,7 @@ class OrdersMixin(ProtocolInterface):
         if submitted_fut:
             submitted_fut.set_result(order)
 
+        order.receive_time = self.receive_time
         order.updated(None)
 
     def _handle_next_valid_id(self, next_order_id: int):
@@ -307,3 +309,16 @@ class OrdersMixin(ProtocolInterface):
             fut.set_exception(ApiException(error_code, error_message))
         else:
             super()._handle_err_msg(request_id, error_code, error_message)  # type: ignore  # noqa
+
+    def _disconnected(self):
+        futures = list(self.__submitted_future.values())
+        if self.__open_orders_future:
+            futures.append(self.__open_orders_future)
+        self.__submitted_future = {}
+        self.__open_orders_future = None
+
+        for fut in futures:
+            if not fut.done():
+                fut.set_exception(NotConnectedError())
+
+        super()._disconnected()
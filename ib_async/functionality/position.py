@@ -3,10 +3,12 @@ import datetime
 import logging
 import typing
 
+from ib_async.errors import NotConnectedError
 from ib_async.event import Event
 from ib_async.instrument import Instrument
 from ib_async.messages import Outgoing
 from ib_async.protocol import ProtocolInterface, IncomingMessage
+from ib_async.utils import silence_exception
 
 LOG = logging.getLogger(__name__)
 
@@ -42,6 +44,9 @@ class PositionMixin(ProtocolInterface):
 
     @on_position.on_subscribe
     def __on_position__subscribe(self):
+        return self.__request_positions()
+
+    def __request_positions(self):
         if not self.__position_future.done():
             self.__position_future.cancel()
         self.__position_future = asyncio.Future()
@@ -49,7 +54,7 @@ class PositionMixin(ProtocolInterface):
 
     @on_position.on_unsubscribe
     def __on_position__unsubscribe(self):
-        return self.send_message(Outgoing.CANCEL_POSITIONS, 1)
+        return self.send_cancel_message(Outgoing.CANCEL_POSITIONS, 1)
 
     def get_positions(self) -> typing.Awaitable[None]:
         if self.on_position.has_subscribers:
@@ -80,6 +85,7 @@ class PositionMixin(ProtocolInterface):
         instrument.local_symbol = message.read(str)
         if message.message_version >= 2:
             instrument.trading_class = message.read(str)
+        instrument.reindex()
 
         try:
             account = self.accounts[account_id]
@@ -94,6 +100,18 @@ class PositionMixin(ProtocolInterface):
 
         self.on_position(PositionEvent(account, instrument, size, average_cost))
 
+    def _disconnected(self):
+        if not self.__position_future.done():
+            # Nobody may be waiting for it
+            self.__position_future.add_done_callback(silence_exception)
+            self.__position_future.set_exception(NotConnectedError())
+        super()._disconnected()
+
+    def _resubscribe(self):
+        if self.on_position.has_subscribers:
+            self.__request_positions()
+        super()._resubscribe()
+
     def _handle_position_end(self):
         if not self.__position_future.done():
             self.__position_future.set_result(None)
@@ -7,7 +7,7 @@ from ib_async.errors import UnsupportedFeature
 from ib_async.instrument import Instrument
 from ib_async.messages import Outgoing
 from ib_async.protocol import RequestId, ProtocolInterface, OutgoingMessage, ProtocolVersion
-from ib_async.utils import to_ib_date, to_ib_duration
+from ib_async.utils import silence_exception, to_ib_date, to_ib_duration
 
 LOG = logging.getLogger(__name__)
 
@@ -31,6 +31,7 @@ class RealtimeBarsMixin(ProtocolInterface):
     def __init__(self):
         super().__init__()
         self._realtime_bar_instruments = {}  # type: typing.Dict[RequestId, Instrument]
+        self.__realtime_bar_options = {}  # type: typing.Dict[RequestId, typing.Tuple[BarType, bool]]
 
     def subscribe_realtime_bars(self, instrument: Instrument, what_to_show=BarType.Midpoint,
                                 regular_trading_hours=True) -> typing.Awaitable[None]:
@@ -41,7 +42,7 @@ class RealtimeBarsMixin(ProtocolInterface):
         in the calculation of the number of Level 1 market data subscriptions allowed in an account.
         """
 
-        request_id, future = self.make_future()
+        request_id, future = self.make_future(Outgoing.REQ_REAL_TIME_BARS)
         message = OutgoingMessage(Outgoing.REQ_REAL_TIME_BARS, 3, request_id)
 
         message.add(instrument,
@@ -51,18 +52,32 @@ class RealtimeBarsMixin(ProtocolInterface):
 
         self.send(message)
         self._realtime_bar_instruments[request_id] = instrument
+        self.__realtime_bar_options[request_id] = what_to_show, regular_trading_hours
         instrument._realtime_bars_request_id = request_id
+
+        # Subscriptions made by event handlers and by resubscribing are never awaited, don't log a lost connection
+        # as an unretrieved exception
+        future.add_done_callback(silence_exception)
         return future
 
     def unsubscribe_realtime_bars(self, instrument):
         """Cancels Real Time Bars subscription."""
         if instrument._realtime_bars_request_id:
             self._realtime_bar_instruments.pop(instrument._realtime_bars_request_id, None)
+            self.__realtime_bar_options.pop(instrument._realtime_bars_request_id, None)
             self.resolve_future(instrument._realtime_bars_request_id, None)
-            message = OutgoingMessage(Outgoing.CANCEL_REAL_TIME_BARS, 3, instrument._realtime_bars_request_id)
-            self.send(message)
+            self.send_cancel_message(Outgoing.CANCEL_REAL_TIME_BARS, 3, instrument._realtime_bars_request_id)
             instrument._realtime_bars_request_id = None
 
+    def _resubscribe(self):
+        # Subscribing again assigns a new request id, so the old entries are dropped first.
+        for request_id, instrument in list(self._realtime_bar_instruments.items()):
+            del self._realtime_bar_instruments[request_id]
+            options = self.__realtime_bar_options.pop(request_id, None)
+            if options and instrument._realtime_bars_request_id == request_id:
+                self.subscribe_realtime_bars(instrument, *options)
+        super()._resubscribe()
+
     def get_historical_bars(self, instrument: Instrument,
                             end_date, duration, bar_size, what_to_show=BarType.Midpoint,
                             include_expired=True, regular_trading_hours=True
@@ -78,7 +93,7 @@ class RealtimeBarsMixin(ProtocolInterface):
         duration = to_ib_duration(duration)
         bar_size = _bar_sizes.get(bar_size, bar_size)
 
-        request_id, future = self.make_future()
+        request_id, future = self.make_future(Outgoing.REQ_HISTORICAL_DATA)
         message = OutgoingMessage(Outgoing.REQ_HISTORICAL_DATA, protocol_version=self.version)
         message.add(6, max_version=ProtocolVersion.SYNT_REALTIME_BARS)
         message.add(request_id)
@@ -102,7 +117,7 @@ class RealtimeBarsMixin(ProtocolInterface):
 
         def _cancel_if_cancelled(fut: asyncio.Future):
             if fut.cancelled():
-                self.send_message(Outgoing.CANCEL_HISTORICAL_DATA, 1, request_id)
+                self.send_cancel_message(Outgoing.CANCEL_HISTORICAL_DATA, 1, request_id)
 
         future.add_done_callback(_cancel_if_cancelled)
         return future
@@ -13,6 +13,7 @@ class TickByTickMixin(ProtocolInterface):
     def __init__(self):
         super().__init__()
         self.__instruments = {}  # type: typing.Dict[RequestId, typing.Tuple[str, Instrument]]
+        self.__tick_types = {}  # type: typing.Dict[RequestId, str]  # As sent, to request them again on reconnect
 
     def __get_request_id(self, instrument: Instrument, tick_type: str):
         entry = tick_type.lower(), instrument
@@ -20,11 +21,15 @@ class TickByTickMixin(ProtocolInterface):
             if l_entry == entry:
                 return l_request_id
 
-    def subscribe_tick_by_tick(self, instrument: Instrument, tick_type: str) -> None:
+    def subscribe_tick_by_tick(self, instrument: Instrument, tick_type: str, request_id: RequestId = None) -> None:
+        """Subscribes to tick by tick data of an instrument.
+
+        `request_id` overrides the generated id of a new subscription."""
         self.check_feature(ProtocolVersion.TICK_BY_TICK, 'tick by tick data')
 
-        request_id = self.__get_request_id(instrument, tick_type) or self.make_request_id()
+        request_id = self.__get_request_id(instrument, tick_type) or self.make_request_id(request_id)
         self.__instruments[request_id] = tick_type.lower(), instrument
+        self.__tick_types[request_id] = tick_type
         self.send_message(Outgoing.REQ_TICK_BY_TICK_DATA, request_id, instrument, tick_type)
 
     def unsubscribe_tick_by_tick(self, instrument: Instrument, tick_type: str) -> None:
@@ -32,7 +37,13 @@ class TickByTickMixin(ProtocolInterface):
 
         if request_id:
             del self.__instruments[request_id]
-            self.send_message(Outgoing.CANCEL_TICK_BY_TICK_DATA, request_id)
+            self.__tick_types.pop(request_id, None)
+            self.send_cancel_message(Outgoing.CANCEL_TICK_BY_TICK_DATA, request_id)
+
+    def _resubscribe(self):
+        for request_id, (_, instrument) in list(self.__instruments.items()):
+            self.send_message(Outgoing.REQ_TICK_BY_TICK_DATA, request_id, instrument, self.__tick_types[request_id])
+        super()._resubscribe()
 
     def _handle_tick_by_tick(self, request_id: RequestId, tick_type: int, time: int, message: IncomingMessage):
         entry = self.__instruments.get(request_id)
@@ -40,6 +51,7 @@ class TickByTickMixin(ProtocolInterface):
             return
 
         instrument = entry[1]
+        instrument.receive_time = self.receive_time
 
         if tick_type in (1, 2):
             price = message.read(float)
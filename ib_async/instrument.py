@@ -64,19 +64,156 @@ class UnderlyingComponent(protocol.Serializable):
         self.price = message.read(float)
 
 
+def _index_value(value):
+    # Enums with a str mixin compare equal to their value, but don't hash like it.
+    return getattr(value, 'value', value)
+
+
+class InstrumentRegistry:
+    """Keeps track of the live instruments of a client, by contract id and by a number of secondary indexes.
+
+    The registry only holds weak references, instruments disappear from it when they are garbage collected. Secondary
+    indexes are refreshed by `Instrument.reindex`, which is called whenever contract details are received."""
+
+    indexes = ('symbol', 'local_symbol', 'security_type', 'exchange', 'primary_exchange', 'currency',
+               'trading_class', 'underlying_contract_id', 'underlying_symbol')
+
+    def __init__(self) -> None:
+        self._refs = {}  # type: typing.Dict[int, weakref.KeyedRef]
+        # Bind once, as each reference holds on to its callback
+        self._collected_callback = self._on_collected  # type: typing.Callable[[weakref.KeyedRef], None]
+        self._indexes = {name: {} for name in self.indexes + ('security_id',)
+                         }  # type: typing.Dict[str, typing.Dict[typing.Any, typing.Set[int]]]
+        self._index_keys = {}  # type: typing.Dict[int, typing.List[typing.Tuple[str, typing.Any]]]
+
+    @classmethod
+    def for_parent(cls, parent: protocol.ProtocolInterface) -> "InstrumentRegistry":
+        try:
+            return parent.__instrument_registry  # type: ignore
+        except AttributeError:
+            registry = parent.__instrument_registry = cls()  # type: ignore
+            return registry
+
+    def __len__(self):
+        return len(self._refs)
+
+    def get(self, contract_id: int) -> typing.Optional["Instrument"]:
+        ref = self._refs.get(contract_id)
+        return ref() if ref else None
+
+    def add(self, instrument: "Instrument"):
+        contract_id = instrument.contract_id
+        assert not self.get(contract_id)
+        self._refs[contract_id] = weakref.KeyedRef(instrument, self._collected_callback, contract_id)
+        self.reindex(instrument)
+
+    def remove(self, contract_id: int):
+        self._refs.pop(contract_id, None)
+        self._unindex(contract_id, self._index_keys.pop(contract_id, ()))
+
+    def _unindex(self, contract_id: int, keys: typing.Iterable[typing.Tuple[str, typing.Any]]):
+        for index_name, value in keys:
+            contract_ids = self._indexes[index_name][value]
+            contract_ids.discard(contract_id)
+            if not contract_ids:
+                del self._indexes[index_name][value]
+
+    def _on_collected(self, ref: weakref.KeyedRef):
+        if self._refs.get(ref.key) is ref:
+            self.remove(ref.key)
+
+    def reindex(self, instrument: "Instrument"):
+        """Updates the secondary indexes after fields of the instrument have changed."""
+        contract_id = instrument.contract_id
+        if self.get(contract_id) is not instrument:
+            return
+
+        keys = [(index_name, _index_value(getattr(instrument, index_name))) for index_name in self.indexes]
+        keys.extend(('security_id', (_index_value(id_type), security_id))
+                    for id_type, security_id in (instrument.security_ids or {}).items())
+        keys = [(index_name, value) for index_name, value in keys if value]
+
+        old_keys = self._index_keys.get(contract_id, [])
+        if keys == old_keys:
+            return
+
+        self._unindex(contract_id, old_keys)
+        for index_name, value in keys:
+            self._indexes[index_name].setdefault(value, set()).add(contract_id)
+        self._index_keys[contract_id] = keys
+
+    def find(self, **criteria) -> typing.List["Instrument"]:
+        """Returns the instruments matching all criteria, ordered by contract id.
+
+        Criteria are field names from `indexes`, e.g. `find(underlying_symbol='AAPL', security_type='OPT')`."""
+        candidates = []
+        for index_name, value in criteria.items():
+            if index_name not in self.indexes:
+                raise ValueError("%s is not indexed" % index_name)
+
+            contract_ids = self._indexes[index_name].get(_index_value(value))
+            if not contract_ids:
+                return []
+            candidates.append(contract_ids)
+
+        if not candidates:
+            contract_ids = set(self._refs)
+        else:
+            candidates.sort(key=len)
+            contract_ids = candidates[0].intersection(*candidates[1:])
+
+        return [instrument for instrument in (self.get(contract_id) for contract_id in sorted(contract_ids))
+                if instrument is not None]
+
+    def find_by_security_id(self, security_id_type: typing.Union["SecurityIdentifierType", str],
+                            security_id: str) -> typing.Optional["Instrument"]:
+        contract_ids = self._indexes['security_id'].get((_index_value(security_id_type), security_id))
+        for contract_id in sorted(contract_ids or ()):
+            instrument = self.get(contract_id)
+            if instrument is not None:
+                return instrument
+        return None
+
+
 class Instrument(protocol.Serializable):
+    # Instruments are slotted, as option chains can easily contain tens of thousands of them. Market data and market
+    # depth state is only allocated once data arrives, and events live in `_event_storage` (see `Event`).
+    __slots__ = (
+        '__weakref__', '_event_storage',
+        '_parent', '_market_data_request_id', '_realtime_bars_request_id', '_historical_data_request_id',
+        '_market_depth_request_id', 'market_data_timeliness', '_market_data_tick_types', '_market_depth_rows',
+        '_tick_data', '_tick_attributes', '_market_depth_ask', '_market_depth_bid', 'receive_time',
+        'bbo_exchange', 'snapshot_permissions',
+        'symbol', 'security_type', 'last_trade_date', 'strike', 'right', 'exchange', 'currency', 'local_symbol',
+        'market_name', 'trading_class', '_contract_id', 'minimum_tick', 'market_data_size_multiplier', 'multiplier',
+        'order_types', 'valid_exchanges', 'price_magnifier', 'underlying_contract_id', 'long_name',
+        'primary_exchange', 'contract_month', 'industry', 'category', 'subcategory', 'time_zone', 'trading_hours',
+        'liquid_hours', 'ev_rule', 'ev_multiplier', 'security_ids', 'aggregated_group', 'underlying_symbol',
+        'underlying_security_type', 'market_rule_ids', 'real_expiration_date', 'underlying_component',
+    )
+
     def __init__(self, parent: protocol.ProtocolInterface) -> None:
+        self._event_storage = None  # type: typing.Dict[str, typing.Any]
         self._parent = parent
         self._market_data_request_id = None  # type: protocol.RequestId
         self._realtime_bars_request_id = None  # type: protocol.RequestId
         self._historical_data_request_id = None  # type: protocol.RequestId
         self._market_depth_request_id = None  # type: protocol.RequestId
         self.market_data_timeliness = tick_types.MarketDataTimeliness.RealTime
-        self._tick_data = {}  # type: typing.Dict[tick_types.TickType, typing.Any]
-        self._tick_attributes = {}  # type: typing.Dict[tick_types.TickType, tick_types.TickAttributes]
+        self._market_data_tick_types = ()  # type: typing.Sequence[tick_types.TickTypeGroup]
+        self._market_depth_rows = 50
+        self._tick_data = None  # type: typing.Dict[tick_types.TickType, typing.Any]
+        self._tick_attributes = None  # type: typing.Dict[tick_types.TickType, typing.List[tick_types.TickAttributes]]
 
-        self.market_depth_ask = []  # type: typing.List[MarketDepthEntry]
-        self.market_depth_bid = []  # type: typing.List[MarketDepthEntry]
+        self._market_depth_ask = None  # type: typing.List[MarketDepthEntry]
+        self._market_depth_bid = None  # type: typing.List[MarketDepthEntry]
+
+        # When the latest market data, bar, market depth or tick by tick update was received (`time.monotonic_ns()`).
+        # Asynchronous subscribers run later, when a newer update may have replaced it.
+        self.receive_time = None  # type: int
+
+        self.bbo_exchange = ""
+        self.snapshot_permissions = 0
 
         self.symbol = ""
         self.security_type = SecurityType.Unspecified
@@ -122,31 +259,27 @@ class Instrument(protocol.Serializable):
     @contract_id.setter
     def contract_id(self, value):
         if value != self._contract_id:
-            try:
-                registry = self._parent.__instruments  # type: ignore
-            except AttributeError:
-                registry = self._parent.__instruments = weakref.WeakValueDictionary()  # type: ignore
-
-            assert not registry.get(value)
-            registry.pop(self._contract_id, None)
-            registry[value] = self
+            registry = InstrumentRegistry.for_parent(self._parent)
+            if registry.get(self._contract_id) is self:
+                registry.remove(self._contract_id)
             self._contract_id = value
+            registry.add(self)
+
+    def reindex(self):
+        """Updates the secondary indexes of the instrument registry. Call this after changing identifying fields."""
+        InstrumentRegistry.for_parent(self._parent).reindex(self)
 
     @classmethod
     def get_instance_from(cls, msg: protocol.IncomingMessage):
-        try:
-            registry = msg.source.__instruments  # type: ignore
-        except AttributeError:
-            registry = msg.source.__instruments = weakref.WeakValueDictionary()  # type: ignore
+        return cls.get_instance(msg.source, msg.peek(int))
 
-        contract_id = msg.peek(int)
-        try:
-            return registry[contract_id]
-        except KeyError:
-            pass
-
-        result = cls(parent=msg.source)
-        result.contract_id = contract_id
+    @classmethod
+    def get_instance(cls, parent: protocol.ProtocolInterface, contract_id: int) -> "Instrument":
+        """Returns the known instrument with the given contract id, or creates a new one."""
+        result = InstrumentRegistry.for_parent(parent).get(contract_id)
+        if result is None:
+            result = cls(parent=parent)
+            result.contract_id = contract_id
         return result
 
     def serialize(self, message: protocol.OutgoingMessage):
@@ -197,7 +330,6 @@ class Instrument(protocol.Serializable):
     # ------ Market data ------
 
     on_market_data = Event()  # type: Event[tick_types.TickType]
-    _market_data_tick_types = ()  # type: typing.Sequence[tick_types.TickTypeGroup]
 
     @property
     def market_data_tick_types(self) -> typing.Sequence[tick_types.TickTypeGroup]:
@@ -224,7 +356,15 @@ class Instrument(protocol.Serializable):
         parent.cancel_market_data(self)
 
     def handle_market_data(self, tick_type: tick_types.TickType, value: typing.Any, size: float = None,
-                           attributes: tick_types.TickAttributes = None):
+                           attributes: typing.List[tick_types.TickAttributes] = None
+                           ) -> typing.Optional[tick_types.TickType]:
+        """Stores a market data tick, and notifies subscribers.
+
+        Returns the tick type under which `size` was stored, if any."""
+
+        tick_data = self._tick_data
+        if tick_data is None:
+            tick_data = self._tick_data = {}
 
         size_tick_type = None
         if size is not None:
@@ -234,16 +374,21 @@ class Instrument(protocol.Serializable):
                 if size:
                     LOG.warning('received tick %s with size, but have no way to store it')
             else:
-                self._tick_data[size_tick_type] = size
+                tick_data[size_tick_type] = size
 
-        self._tick_data[tick_type] = value
+        tick_data[tick_type] = value
+        self.receive_time = self._parent.receive_time
         if attributes is not None:
+            if self._tick_attributes is None:
+                self._tick_attributes = {}
             self._tick_attributes[tick_type] = attributes
 
         self.on_market_data(tick_type)
         if size_tick_type:
             self.on_market_data(size_tick_type)
 
+        return size_tick_type
+
     def fetch_market_data(self, tick_types: typing.Iterable[tick_types.TickTypeGroup] = ()
                           ) -> typing.Awaitable[None]:
         """Retrieve a single snapshot of market data for this instrument."""
@@ -268,6 +413,7 @@ class Instrument(protocol.Serializable):
         parent.unsubscribe_realtime_bars(self)
 
     def handle_realtime_bar(self, bar: Bar):
+        self.receive_time = self._parent.receive_time
         self.on_bar(bar)
 
     def get_historic_bars(self, end_date, duration, bar_size,
@@ -279,7 +425,14 @@ class Instrument(protocol.Serializable):
     # ------ Market depth ------
 
     on_market_depth = Event()  # type: Event[None]
-    _market_depth_rows = 50
+
+    @property
+    def market_depth_ask(self) -> typing.List[MarketDepthEntry]:
+        return self._market_depth_ask or []
+
+    @property
+    def market_depth_bid(self) -> typing.List[MarketDepthEntry]:
+        return self._market_depth_bid or []
 
     @property
     def market_depth_rows(self) -> int:
@@ -305,7 +458,14 @@ class Instrument(protocol.Serializable):
 
     def handle_market_depth(self, position: int, market_maker: str, operation: int, side: int, price: float,
                             size: int):
-        depth_list = self.market_depth_bid if side else self.market_depth_ask
+        if side:
+            if self._market_depth_bid is None:
+                self._market_depth_bid = []
+            depth_list = self._market_depth_bid
+        else:
+            if self._market_depth_ask is None:
+                self._market_depth_ask = []
+            depth_list = self._market_depth_ask
 
         if operation == 0:  # Insert
             depth_list.insert(position, MarketDepthEntry(price=price, size=size, market_maker=market_maker))
@@ -315,6 +475,7 @@ class Instrument(protocol.Serializable):
             assert operation == 2
             del depth_list[position]
 
+        self.receive_time = self._parent.receive_time
         self.on_market_depth(None)
 
     # ------ Tick by Tick ------
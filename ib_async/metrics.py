@@ -0,0 +1,241 @@
+"""Counters of the messages exchanged with TWS, by message type.
+
+Set `Protocol.metrics` to a `MessageMetrics` instance to start collecting. Incoming messages are counted along with
+their size, the time spent decoding their fields and the time spent in their handler. Fields read by a handler itself,
+such as the nested structures of contract details or orders, count as handler time. Outgoing messages are counted
+along with their size when they are sent.
+
+Set `Protocol.latency` to a `LatencyHistograms` instance to collect the time from receiving each message until its
+handler completed, which includes the time the message waited in the message loop.
+"""
+import abc
+import asyncio
+import bisect
+import collections
+import logging
+import os
+import typing
+
+from ib_async.messages import Incoming, Outgoing
+
+LOG = logging.getLogger(__name__)
+
+IncomingStats = typing.NamedTuple("IncomingStats", [
+    ('count', int),
+    ('bytes', int),
+    ('decode_seconds', float),
+    ('handler_seconds', float),
+])
+
+OutgoingStats = typing.NamedTuple("OutgoingStats", [
+    ('count', int),
+    ('bytes', int),
+])
+
+LatencyStats = typing.NamedTuple("LatencyStats", [
+    ('count', int),
+    ('sum_seconds', float),
+    # Pairs of upper bound in seconds and the number of samples up to that bound, ending with infinity
+    ('buckets', typing.List[typing.Tuple[float, int]]),
+])
+
+MetricsSnapshot = typing.NamedTuple("MetricsSnapshot", [
+    ('incoming', typing.Dict[Incoming, IncomingStats]),
+    ('outgoing', typing.Dict[Outgoing, OutgoingStats]),
+    # Superseded market data dropped without being decoded, see `Protocol.load_shedding_threshold`
+    ('dropped', typing.Dict[Incoming, int]),
+])
+
+_incoming_metrics = [
+    ('messages_total', 'count', "Messages received from TWS."),
+    ('bytes_total', 'bytes', "Bytes received from TWS, without the length prefix."),
+    ('decode_seconds_total', 'decode_seconds', "Time spent decoding the fields of received messages."),
+    ('handler_seconds_total', 'handler_seconds', "Time spent in the handlers of received messages."),
+]
+
+_outgoing_metrics = [
+    ('messages_total', 'count', "Messages sent to TWS."),
+    ('bytes_total', 'bytes', "Bytes sent to TWS, including the length prefix."),
+]
+
+
+class _PrometheusExporter(abc.ABC):
+    """Exports the text returned by `to_prometheus`."""
+
+    @abc.abstractmethod
+    def to_prometheus(self) -> str:
+        """Formats the collected data in the Prometheus text exposition format."""
+
+    def write_prometheus(self, path: str):
+        """Writes the Prometheus dump to a file, for example for the textfile collector of the node exporter.
+
+        The file is replaced atomically, so that a collector never reads a partial dump."""
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as metrics_file:
+            metrics_file.write(self.to_prometheus())
+        os.replace(temp_path, path)
+
+    async def serve_prometheus(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        """Starts a server answering every connection with the Prometheus dump, as an HTTP response.
+
+        The server can be scraped by Prometheus directly, or read with a plain socket. Close the returned server to
+        stop it."""
+
+        async def respond(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                # Skip the request, if any, every path returns the metrics
+                await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 1.0)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                pass
+
+            body = self.to_prometheus().encode()
+            writer.write(b"HTTP/1.0 200 OK\r\n"
+                         b"Content-Type: text/plain; version=0.0.4\r\n"
+                         b"Content-Length: %i\r\n\r\n" % len(body) + body)
+            try:
+                await writer.drain()
+            except ConnectionError:
+                LOG.debug("Metrics client disconnected early")
+            writer.close()
+
+        return await asyncio.start_server(respond, host, port)
+
+
+class MessageMetrics(_PrometheusExporter):
+    """Accumulates counters per message type, see the module documentation."""
+
+    def __init__(self, prefix: str = "ib_async") -> None:
+        self.prefix = prefix
+        # Mutable [count, bytes, decode seconds, handler seconds] and [count, bytes] lists, updated in place
+        self._incoming = {}  # type: typing.Dict[Incoming, typing.List[float]]
+        self._outgoing = {}  # type: typing.Dict[Outgoing, typing.List[int]]
+        self._dropped = collections.Counter()  # type: typing.Counter[Incoming]
+
+    def record_incoming(self, message_type: Incoming, size: int, decode_seconds: float, handler_seconds: float):
+        counters = self._incoming.get(message_type)
+        if counters is None:
+            counters = self._incoming[message_type] = [0, 0, 0.0, 0.0]
+
+        counters[0] += 1
+        counters[1] += size
+        counters[2] += decode_seconds
+        counters[3] += handler_seconds
+
+    def record_outgoing(self, message_type: Outgoing, size: int):
+        counters = self._outgoing.get(message_type)
+        if counters is None:
+            counters = self._outgoing[message_type] = [0, 0]
+
+        counters[0] += 1
+        counters[1] += size
+
+    def record_dropped(self, message_type: Incoming):
+        self._dropped[message_type] += 1
+
+    def reset(self):
+        self._incoming.clear()
+        self._outgoing.clear()
+        self._dropped.clear()
+
+    def snapshot(self) -> MetricsSnapshot:
+        """Returns a copy of the counters collected so far."""
+        return MetricsSnapshot(
+            {message_type: IncomingStats(int(counters[0]), int(counters[1]), counters[2], counters[3])
+             for message_type, counters in self._incoming.items()},
+            {message_type: OutgoingStats(*counters) for message_type, counters in self._outgoing.items()},
+            dict(self._dropped))
+
+    def to_prometheus(self) -> str:
+        """Formats the counters in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []  # type: typing.List[str]
+
+        for direction, stats, metrics in (('incoming', snapshot.incoming, _incoming_metrics),
+                                          ('outgoing', snapshot.outgoing, _outgoing_metrics)):
+            for suffix, attribute, help_text in metrics:
+                name = "%s_%s_%s" % (self.prefix, direction, suffix)
+                lines.append("# HELP %s %s" % (name, help_text))
+                lines.append("# TYPE %s counter" % name)
+                for message_type, message_stats in sorted(stats.items(), key=lambda item: item[0].name):
+                    lines.append('%s{type="%s"} %r' % (name, message_type.name.lower(),
+                                                       getattr(message_stats, attribute)))
+
+        name = "%s_incoming_dropped_total" % self.prefix
+        lines.append("# HELP %s Superseded market data dropped without being decoded." % name)
+        lines.append("# TYPE %s counter" % name)
+        for message_type in sorted(snapshot.dropped, key=lambda message_type: message_type.name):
+            lines.append('%s{type="%s"} %i' % (name, message_type.name.lower(), snapshot.dropped[message_type]))
+
+        return "\n".join(lines) + "\n"
+
+
+# Upper bounds of the latency buckets, in seconds
+DEFAULT_LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                           1.0, 2.5)
+
+
+class LatencyHistograms(_PrometheusExporter):
+    """Histograms of the latency from receiving a message until its handler completed, by message type."""
+
+    def __init__(self, buckets: typing.Sequence[float] = DEFAULT_LATENCY_BUCKETS, prefix: str = "ib_async") -> None:
+        self.prefix = prefix
+        self.buckets = tuple(sorted(buckets))
+        self._bounds = [int(bound * 1e9) for bound in self.buckets]
+        # Per message type, the sample count of each bucket (the last one is unbounded) and the sum in nanoseconds
+        self._counts = {}  # type: typing.Dict[Incoming, typing.List[int]]
+        self._sums = {}  # type: typing.Dict[Incoming, int]
+
+    def record(self, message_type: Incoming, nanoseconds: int):
+        counts = self._counts.get(message_type)
+        if counts is None:
+            counts = self._counts[message_type] = [0] * (len(self._bounds) + 1)
+            self._sums[message_type] = 0
+
+        counts[bisect.bisect_left(self._bounds, nanoseconds)] += 1
+        self._sums[message_type] += nanoseconds
+
+    def reset(self):
+        self._counts.clear()
+        self._sums.clear()
+
+    def snapshot(self) -> typing.Dict[Incoming, LatencyStats]:
+        """Returns the cumulative histograms collected so far."""
+        result = {}
+        for message_type, counts in self._counts.items():
+            cumulative = []
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                total += count
+                cumulative.append((bound, total))
+            result[message_type] = LatencyStats(total, self._sums[message_type] / 1e9, cumulative)
+        return result
+
+    def quantile(self, message_type: Incoming, q: float) -> typing.Optional[float]:
+        """Estimates a latency quantile, as the upper bound of the bucket holding it. None without samples."""
+        stats = self.snapshot().get(message_type)
+        if not stats:
+            return None
+
+        rank = q * stats.count
+        for bound, count in stats.buckets:
+            if count >= rank:
+                return bound
+        return float("inf")
+
+    def to_prometheus(self) -> str:
+        """Formats the histograms in the Prometheus text exposition format."""
+        name = "%s_incoming_latency_seconds" % self.prefix
+        lines = ["# HELP %s Time from receiving a message until its handler completed." % name,
+                 "# TYPE %s histogram" % name]
+
+        snapshot = self.snapshot()
+        for message_type in sorted(snapshot, key=lambda message_type: message_type.name):
+            stats = snapshot[message_type]
+            label = message_type.name.lower()
+            for bound, count in stats.buckets:
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append('%s_bucket{type="%s",le="%s"} %i' % (name, label, le, count))
+            lines.append('%s_sum{type="%s"} %r' % (name, label, stats.sum_seconds))
+            lines.append('%s_count{type="%s"} %i' % (name, label, stats.count))
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,88 @@
+"""Detects when the message loop falls behind the data sent by TWS."""
+import asyncio
+import logging
+import typing
+
+from ib_async.event import Event
+from ib_async.protocol import Protocol
+
+LOG = logging.getLogger(__name__)
+
+MonitorSample = typing.NamedTuple("MonitorSample", [
+    # Seconds the monitor's timer fired late, a measure of how long other code blocked the event loop
+    ('loop_lag', float),
+    # Bytes received from TWS that were not decoded yet
+    ('buffered_bytes', int),
+    # Upper bound of the seconds the oldest undispatched message has been waiting
+    ('undispatched_age', float),
+])
+
+
+class MessageLoopMonitor:
+    """Samples the event loop lag and the receive backlog of a client every `interval` seconds.
+
+    When a sample exceeds any of the thresholds, the feed is considered stale and `on_stale` fires with the sample.
+    Once a sample is within all thresholds again, `on_recovered` fires. Strategies can use these to stop trading on
+    outdated prices. A threshold of None disables that check."""
+
+    on_stale = Event()  # type: Event[MonitorSample]
+    on_recovered = Event()  # type: Event[MonitorSample]
+
+    def __init__(self, client: Protocol, interval: float = 0.1, max_loop_lag: typing.Optional[float] = 0.1,
+                 max_buffered_bytes: typing.Optional[int] = 1 << 20,
+                 max_undispatched_age: typing.Optional[float] = 0.5) -> None:
+        self.client = client
+        self.interval = interval
+        self.max_loop_lag = max_loop_lag
+        self.max_buffered_bytes = max_buffered_bytes
+        self.max_undispatched_age = max_undispatched_age
+
+        self.is_stale = False
+        self.last_sample = None  # type: MonitorSample
+        self.peak_loop_lag = 0.0
+
+        self._handle = None  # type: asyncio.TimerHandle
+        self._expected = None  # type: float
+
+    @property
+    def is_running(self) -> bool:
+        return self._handle is not None
+
+    def start(self):
+        if self._handle is None:
+            self._schedule()
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self):
+        loop = asyncio.get_event_loop()
+        self._expected = loop.time() + self.interval
+        self._handle = loop.call_at(self._expected, self._tick)
+
+    def _tick(self):
+        loop_lag = max(0.0, asyncio.get_event_loop().time() - self._expected)
+        self._schedule()
+        self.check(MonitorSample(loop_lag, self.client.buffered_bytes, self.client.undispatched_age))
+
+    def check(self, sample: MonitorSample):
+        """Records a sample, and fires the events if it changed whether the feed is stale."""
+        self.last_sample = sample
+        if sample.loop_lag > self.peak_loop_lag:
+            self.peak_loop_lag = sample.loop_lag
+
+        lagging = self.max_loop_lag is not None and sample.loop_lag > self.max_loop_lag
+        backlogged = self.max_buffered_bytes is not None and sample.buffered_bytes > self.max_buffered_bytes
+        delayed = self.max_undispatched_age is not None and sample.undispatched_age > self.max_undispatched_age
+        stale = lagging or backlogged or delayed
+
+        if stale and not self.is_stale:
+            self.is_stale = True
+            LOG.warning("Message loop is falling behind: %r", sample)
+            self.on_stale(sample)
+        elif not stale and self.is_stale:
+            self.is_stale = False
+            LOG.info("Message loop caught up: %r", sample)
+            self.on_recovered(sample)
@@ -110,6 +110,10 @@ class Order(Serializable):
         self.why_held = None  # type: str
         self.market_cap_price = None  # type: float
 
+        # When the latest status or open order message for this order was received (`time.monotonic_ns()`).
+        # Asynchronous subscribers run later, when a newer message may have replaced it.
+        self.receive_time = None  # type: int
+
         self.order_ref = None  # type: str
         self.combo_legs_description = None  # type: str
         self.inital_margin = None  # type: str
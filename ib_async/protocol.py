@@ -1,15 +1,23 @@
 import abc
 import asyncio
+import collections
+import concurrent.futures  # noqa: F401  # Used in type comments
 import datetime
 import enum
+import functools
 import inspect
 import logging
 import struct
+import time
 import typing
 
-from ib_async.errors import OutdatedServerError, NotConnectedError, ApiException, warning_codes
+from ib_async.event import Event
+from ib_async.errors import OutdatedServerError, NotConnectedError, ApiException, RequestTimeoutError, warning_codes
 from ib_async.messages import Outgoing, Incoming, messages_with_version
+from ib_async.metrics import LatencyHistograms, MessageMetrics  # noqa: F401  # Used in type comments
 from ib_async.protocol_versions import ProtocolVersion
+from ib_async.recorder import FrameDirection, Recorder  # noqa: F401  # Recorder is used in type comments
+from ib_async.utils import RateLimiter, TimerWheel, monotonic_ns
 
 LOG = logging.getLogger(__name__)
 LOG_MESSAGES = LOG.getChild('messages')
@@ -25,6 +33,116 @@ T = typing.TypeVar('T')
 TK = typing.TypeVar('TK')
 TV = typing.TypeVar('TV')
 
+PendingRequest = typing.NamedTuple("PendingRequest", [
+    ('request_id', RequestId),
+    ('message_type', typing.Optional[Outgoing]),
+    ('age', float),
+])
+
+
+def split_fields(message: bytes) -> typing.List[str]:
+    """Splits the body of a message, as sent over the wire, into its fields."""
+    return [field.decode() for field in message[:-1].split(b'\0')]
+
+
+def buffered_data(reader: typing.Optional[asyncio.StreamReader]) -> typing.Union[bytes, bytearray]:
+    """The data received by a stream reader but not read yet.
+
+    StreamReader has no public accessor for its buffer. Readers without the private `_buffer` appear empty."""
+    buffer = getattr(reader, '_buffer', None)
+    return buffer if isinstance(buffer, (bytes, bytearray)) else b""
+
+
+def _holds_frame(buffer: typing.Union[bytes, bytearray]) -> bool:
+    """Whether a receive buffer holds a complete length prefixed message."""
+    return len(buffer) >= 4 and len(buffer) >= 4 + struct.unpack_from("!I", buffer)[0]
+
+
+class FrameReader(asyncio.StreamReader):
+    """A stream reader which notes when a complete message arrives while none was buffered.
+
+    `Protocol.undispatched_age` is measured from that time, so that neither idle periods nor partially received
+    messages count as waiting."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # As a `time.monotonic_ns()` timestamp, reset by the message loop once no complete message is left
+        self.frame_buffered_time = None  # type: typing.Optional[int]
+
+    def feed_data(self, data):
+        super().feed_data(data)
+        if self.frame_buffered_time is None and _holds_frame(buffered_data(self)):
+            self.frame_buffered_time = monotonic_ns()
+
+
+# Message ids of top of book updates, which overwrite the previous value of the same request and tick type
+_top_of_book_ids = frozenset(str(int(message_type))
+                             for message_type in (Incoming.TICK_PRICE, Incoming.TICK_SIZE, Incoming.TICK_GENERIC))
+
+# Message ids of market depth updates, with the index of their operation field. The side follows the operation.
+_depth_operation_index = {str(int(Incoming.MARKET_DEPTH)): 4, str(int(Incoming.MARKET_DEPTH_L2)): 5}
+
+
+def shed_superseded(batch: typing.List[typing.Tuple[typing.List[str], int]]
+                    ) -> typing.Tuple[typing.List[typing.Tuple[typing.List[str], int]], typing.List[str]]:
+    """Drops the market data of a batch that later messages in the same batch overwrite.
+
+    Top of book ticks are superseded by a later tick of the same request and tick type, and market depth row updates
+    by a later update of the same row, unless rows were inserted or deleted on that side in between. Returns the
+    remaining batch, in order, and the message ids of the dropped messages."""
+    kept = []
+    dropped = []
+    seen_ticks = set()  # type: typing.Set[typing.Tuple[str, str, str]]
+    updated_rows = {}  # type: typing.Dict[typing.Tuple[str, str], typing.Set[str]]
+
+    # Walk backwards, so that the latest message of each key is the one seen first
+    for entry in reversed(batch):
+        fields = entry[0]
+        message_id = fields[0]
+        try:
+            if message_id in _top_of_book_ids:
+                key = (message_id, fields[2], fields[3])
+                if key in seen_ticks:
+                    dropped.append(message_id)
+                    continue
+                seen_ticks.add(key)
+            elif message_id in _depth_operation_index:
+                operation_index = _depth_operation_index[message_id]
+                rows = updated_rows.setdefault((fields[2], fields[operation_index + 1]), set())
+                if fields[operation_index] == '1':  # Update
+                    if fields[3] in rows:
+                        dropped.append(message_id)
+                        continue
+                    rows.add(fields[3])
+                else:  # Rows shift, positions before and after don't refer to the same row
+                    rows.clear()
+        except IndexError:
+            pass  # Malformed, let dispatching report it
+
+        kept.append(entry)
+
+    kept.reverse()
+    return kept, dropped
+
+
+class _DecodingSource:
+    """Stands in for the client when decoding a message outside of it, only the protocol version is available."""
+
+    def __init__(self, version: ProtocolVersion) -> None:
+        self.version = version
+
+
+def decode_frame(client_class: type, version: int,
+                 frame: bytes) -> typing.Tuple[Incoming, typing.List[typing.Any]]:
+    """Decodes a message into the arguments of its handler on `client_class`, without access to a client.
+
+    Used to decode messages in an executor, see `Protocol.decode_executor`. Only messages whose decoding does not
+    depend on the state of the client can be decoded this way."""
+    source = _DecodingSource(ProtocolVersion(version))
+    message = IncomingMessage(split_fields(frame), source=typing.cast(ProtocolInterface, source))
+    handler = getattr(client_class, "_handle_%s" % message.message_type.name.lower())
+    return message.message_type, message.read_arguments(handler.__get__(source))
+
 
 class IncomingMessage:
     def __init__(self, fields: typing.Iterable[str], source: "ProtocolInterface") -> None:
@@ -51,6 +169,10 @@ class IncomingMessage:
             self.message_version = int(self.protocol_version)
 
     def invoke_handler(self, handler: typing.Callable) -> typing.Any:
+        return handler(*self.read_arguments(handler))
+
+    def read_arguments(self, handler: typing.Callable) -> typing.List[typing.Any]:
+        """Decode the fields of this message into the arguments of handler, according to its annotations."""
         signature = inspect.signature(handler)
         call_data = []  # type: typing.List[typing.Any]
 
@@ -68,7 +190,7 @@ class IncomingMessage:
             else:
                 call_data.append(self.read(parameter.annotation))
 
-        return handler(*call_data)
+        return call_data
 
     @property
     def is_eof(self):
@@ -267,6 +389,8 @@ class OutgoingMessage:
 
 
 class Serializable(abc.ABC):
+    __slots__ = ()  # Allow subclasses to be slotted
+
     @classmethod
     def get_instance_from(cls, source: IncomingMessage):
         return cls()
@@ -282,14 +406,84 @@ class Serializable(abc.ABC):
         raise NotImplementedError()
 
 
+class _SharedRequest:
+    """A request shared by several callers, each waiting on a future of their own."""
+
+    def __init__(self, future: asyncio.Future) -> None:
+        self.future = future
+        self.waiters = 0
+
+    def add_waiter(self) -> asyncio.Future:
+        waiter = asyncio.Future()  # type: asyncio.Future
+        self.waiters += 1
+
+        def _resolve(future: asyncio.Future):
+            if waiter.done():
+                return
+            if future.cancelled():
+                waiter.cancel()
+            elif future.exception() is not None:
+                waiter.set_exception(future.exception())
+            else:
+                waiter.set_result(future.result())
+
+        def _on_waiter_done(_):
+            if waiter.cancelled():
+                self.waiters -= 1
+                if not self.waiters and not self.future.done():
+                    self.future.cancel()
+
+        self.future.add_done_callback(_resolve)
+        waiter.add_done_callback(_on_waiter_done)
+        return waiter
+
+
 class ProtocolInterface(abc.ABC):
     def __init__(self):
         super().__init__()
         self.version = None  # type: ProtocolVersion
+        self.is_connected = False
+
+        # When the message being handled was received, as a `time.monotonic_ns()` timestamp.
+        self.receive_time = None  # type: int
+        self._singleflight_requests = {}  # type: typing.Dict[typing.Hashable, _SharedRequest]
+
+    def singleflight(self, key: typing.Hashable,
+                     request: typing.Callable[[], typing.Awaitable[T]]) -> "asyncio.Future[T]":
+        """Shares a single outstanding request among all callers making the same request.
+
+        `key` is a canonical signature of the request. If a request with the same key is still pending, it is shared.
+        Otherwise `request` is called to send a new one. Each caller gets its own future, so that a caller giving up,
+        for example by a timeout, doesn't affect the others. The request itself is only cancelled once every caller
+        cancelled its future."""
+        shared = self._singleflight_requests.get(key)
+        if shared is None or shared.future.done():
+            shared = _SharedRequest(asyncio.ensure_future(request()))
+            if not shared.future.done():
+                self._singleflight_requests[key] = shared
+
+                def _forget(_):
+                    if self._singleflight_requests.get(key) is shared:
+                        del self._singleflight_requests[key]
+
+                shared.future.add_done_callback(_forget)
+
+        return shared.add_waiter()
+
+    def _disconnected(self):
+        """Called when the connection to TWS is lost. Mixins fail whatever is still waiting on TWS."""
+
+    def _resubscribe(self):
+        """Called after reconnecting to TWS. Mixins send the requests for their active subscriptions again."""
 
     def send_message(self, message_id: Outgoing, *fields: SerializableField):
         self.send(OutgoingMessage(message_id, *fields, protocol_version=self.version))
 
+    def send_cancel_message(self, message_id: Outgoing, *fields: SerializableField):
+        """Sends a message ending a subscription, unless disconnected: subscriptions end with the connection."""
+        if self.is_connected:
+            self.send_message(message_id, *fields)
+
     @abc.abstractmethod
     def send(self, message: OutgoingMessage):
         """Send a prebuilt message to IB."""
@@ -300,17 +494,30 @@ class ProtocolInterface(abc.ABC):
         """Checks if we're using a minimal protocol level, and raisess an exception otherwise."""
 
     @abc.abstractmethod
-    def make_request_id(self) -> RequestId:
-        """Generates a unique request id and associated future"""
+    def make_request_id(self, request_id: RequestId = None) -> RequestId:
+        """Generates a unique request id.
+
+        A given `request_id`, such as one from a recording, is used as is, and later ids are generated above it."""
 
     @abc.abstractmethod
-    def make_future(self) -> typing.Tuple[RequestId, asyncio.Future]:
-        """Generates a unique request id and associated future"""
+    def make_future(self, message_type: Outgoing = None, timeout: float = None,
+                    request_id: RequestId = None) -> typing.Tuple[RequestId, asyncio.Future]:
+        """Generates a unique request id and associated future.
+
+        The future fails with a `RequestTimeoutError` if it is not resolved within `timeout` seconds, which defaults to
+        the timeout configured for `message_type`. A given `request_id` is used as with `make_request_id`."""
 
     @abc.abstractmethod
     def resolve_future(self, request_id: RequestId, result):
         """Resolves a future identified by a request id"""
 
+    @abc.abstractmethod
+    def extend_deadline(self, request_id: RequestId):
+        """Restarts the timeout of a request which is still receiving its response.
+
+        For responses streamed over many messages, the timeout then limits the silence between messages rather than
+        the whole response."""
+
 
 class Protocol(ProtocolInterface):
     """Encapsulates low-level communication
@@ -318,33 +525,128 @@ class Protocol(ProtocolInterface):
     This includes connecting, protocol negotiation, message and field splitting.
     """
 
+    # Seconds to wait for the response to a request, by request type. Other requests wait indefinitely.
+    default_timeouts = {
+        Outgoing.REQ_CONTRACT_DATA: 60.0,
+        Outgoing.REQ_MATCHING_SYMBOLS: 60.0,
+        Outgoing.REQ_MKT_DATA: 60.0,
+        Outgoing.REQ_EXECUTIONS: 60.0,
+        Outgoing.REQ_HISTORICAL_DATA: 300.0,
+    }  # type: typing.Dict[Outgoing, float]
+
+    # Whether to tell TWS to stop working on requests that timed out, for the requests that can be cancelled.
+    cancel_on_timeout = True
+    timeout_resolution = 1.0
+
+    _cancel_messages = {
+        Outgoing.REQ_MKT_DATA: (Outgoing.CANCEL_MKT_DATA, 2),
+        Outgoing.REQ_HISTORICAL_DATA: (Outgoing.CANCEL_HISTORICAL_DATA, 1),
+    }  # type: typing.Dict[Outgoing, typing.Tuple[Outgoing, int]]
+
+    # Fired when the connection to TWS is lost, with the error that caused it, if any.
+    on_disconnect = Event()  # type: Event[typing.Optional[Exception]]
+
+    # Fired once an automatic reconnect succeeded, after active subscriptions were requested again.
+    on_reconnect = Event()  # type: Event[None]
+
+    # TWS disconnects clients that send more than 50 messages per second. Messages over this rate are delayed.
+    max_messages_per_second = 50.0
+
+    reconnect_delay = 1.0
+    max_reconnect_delay = 60.0
+
+    # Seconds to wait for TWS to complete the version handshake, a connection that stalls before that has failed.
+    handshake_timeout = 10.0
+
+    # The message loop reads all complete messages already received as one batch, of up to this many messages.
+    max_batch_size = 1000
+
+    # Messages in a lower lane are dispatched before those in higher lanes received in the same batch, so that order
+    # updates and fills don't wait behind a flood of market data. Within a lane, messages keep their order. Messages
+    # not listed use `default_lane`.
+    message_lanes = {
+        Incoming.ERR_MSG: 0,
+        Incoming.ORDER_STATUS: 0,
+        Incoming.OPEN_ORDER: 0,
+        Incoming.OPEN_ORDER_END: 0,
+        Incoming.EXECUTION_DATA: 0,
+        Incoming.EXECUTION_DATA_END: 0,
+        Incoming.COMMISSION_REPORT: 0,
+    }  # type: typing.Dict[Incoming, int]
+    default_lane = 1
+
+    # Messages decoded by `decode_executor` when it is set. Their decoding may not depend on the client state, which
+    # rules out messages holding instruments or orders, such as contract data and open orders.
+    offloaded_messages = frozenset({Incoming.HISTORICAL_DATA})  # type: typing.FrozenSet[Incoming]
+
     def __init__(self) -> None:
         super().__init__()
-        self.is_connected = False
         self.optional_capabilities = None  # type: str
 
         self.reader = None  # type: asyncio.StreamReader
         self.writer = None  # type: asyncio.StreamWriter
 
         self.next_request_id = RequestId(1000)
+
+        # When set, all messages exchanged with TWS are recorded.
+        self.recorder = None  # type: Recorder
+        # When set, counts, sizes and processing times are collected per message type.
+        self.metrics = None  # type: MessageMetrics
+        # When set, the time from receiving each message until its handler completed is collected per message type.
+        self.latency = None  # type: LatencyHistograms
         self._pending_responses = {}  # type: typing.Dict[RequestId, asyncio.Future]
+        self._pending_requests = {}  # type: typing.Dict[RequestId, typing.Tuple[Outgoing, float, float]]
+        self._request_deadlines = TimerWheel(self.__expire_request, self.timeout_resolution)
+
+        # When set, batches of at least this many messages are considered an overload, and the market data in them
+        # that is overwritten later in the same batch is dropped without being decoded, see `shed_superseded`.
+        self.load_shedding_threshold = None  # type: typing.Optional[int]
+        self.dropped_messages = collections.Counter()  # type: typing.Counter[Incoming]
+
+        # When set, the `offloaded_messages` are decoded by this executor, keeping the message loop free for the
+        # other messages. A process pool executor requires the client class to be importable.
+        self.decode_executor = None  # type: concurrent.futures.Executor
+        self._offloaded_ids = frozenset(b"%d" % message_type for message_type in self.offloaded_messages)
+
+        self._lanes_by_id = {str(int(message_type)): lane for message_type, lane in self.message_lanes.items()}
+
+        self.__connect_args = None  # type: typing.Tuple[str, int, typing.Optional[int]]
+        self.__connection_generation = 0  # Counts lost connections, to drop decoded messages of an earlier one
+        self.__pacer = RateLimiter(self.max_messages_per_second)
+        self.__send_queue = collections.deque()  # type: typing.Deque[bytes]
+        self.__send_handle = None  # type: asyncio.TimerHandle
+
+    def make_request_id(self, request_id: RequestId = None) -> RequestId:
+        if request_id is not None:
+            self.next_request_id = RequestId(max(self.next_request_id, request_id + 1))
+            return request_id
 
-    def make_request_id(self):
         result = self.next_request_id
-        self.next_request_id += 1
+        self.next_request_id = RequestId(result + 1)
         return result
 
-    async def connect(self, hostname: str, port: int, client_id=None):
-        """Establish a connection to the TWS/IBGW server."""
+    async def connect(self, hostname: str, port: int, client_id=None, auto_reconnect=False):
+        """Establish a connection to the TWS/IBGW server.
+
+        With `auto_reconnect`, the client keeps trying to reconnect when the connection is lost, waiting longer after
+        each failed attempt. Once reconnected, all active subscriptions are requested again."""
+        self.__connect_args = (hostname, port, client_id) if auto_reconnect else None
+        await self.__open_connection(hostname, port, client_id)
 
+    async def __open_connection(self, hostname: str, port: int, client_id=None):
         # We have not negotiated a version yet
         self.version = None
 
-        # Establish the connection
-        self.reader, self.writer = await asyncio.open_connection(hostname, port)
+        # Establish the connection, like `asyncio.open_connection` but with a reader that timestamps arriving messages
+        loop = asyncio.get_event_loop()
+        reader = FrameReader()
+        protocol = asyncio.StreamReaderProtocol(reader)
+        transport, _ = await loop.create_connection(lambda: protocol, hostname, port)
+        self.reader, self.writer = reader, asyncio.StreamWriter(transport, protocol, reader, loop)
 
-        delayed_messages = await self._negotiate_version(client_id)
+        delayed_messages = await asyncio.wait_for(self._negotiate_version(client_id), self.handshake_timeout)
 
+        self.is_connected = True
         for message in delayed_messages:
             self.dispatch_message(message)
         asyncio.ensure_future(self._message_loop())
@@ -381,26 +683,210 @@ class Protocol(ProtocolInterface):
 
     async def disconnect(self):
         writer = self.writer
-        self.writer = None
-        if self.reader:
-            self.reader.feed_eof()
-            self.reader = None
+        reader = self.reader
+        self.__connect_args = None
+        self._connection_lost(None)
+
+        if reader:
+            reader.feed_eof()
 
         if writer:
-            await self.writer.write_eof()
+            writer.close()
 
     async def _message_loop(self):
         while self.reader:
-            self.dispatch_message(await self._read_message())
+            try:
+                batch = await self._read_batch()
+            except (asyncio.IncompleteReadError, OSError) as e:
+                if self.reader:
+                    LOG.warning("Lost connection to TWS: %r", e)
+                    self._connection_lost(e)
+                return
 
-    async def _read_message(self) -> typing.List[str]:
+            self._dispatch_batch(batch)
+
+    async def _read_batch(self) -> typing.List[typing.Tuple[typing.List[str], int]]:
+        """Waits for a message, then reads the complete messages already buffered along with it.
+
+        Returns the messages together with the time they were read."""
+        batch = []
+        while True:
+            frame = await self._read_frame()
+            receive_time = monotonic_ns()
+            if self.decode_executor is not None and frame[:frame.find(b"\0")] in self._offloaded_ids:
+                self.__offload(frame, receive_time)
+            else:
+                batch.append((split_fields(frame), receive_time))
+
+            if not _holds_frame(buffered_data(self.reader)):
+                # Anything left in the buffer is the start of a message still arriving, not a backlog
+                if isinstance(self.reader, FrameReader):
+                    self.reader.frame_buffered_time = None
+                return batch
+            if len(batch) >= self.max_batch_size:
+                return batch
+
+    def _dispatch_batch(self, batch: typing.List[typing.Tuple[typing.List[str], int]]) -> int:
+        """Dispatches the messages of a batch in the order of their lanes. Returns the number of failed messages."""
+        failures = 0
+        if self.load_shedding_threshold is not None and len(batch) >= max(2, self.load_shedding_threshold):
+            batch, dropped = shed_superseded(batch)
+            for message_id in dropped:
+                message_type = Incoming(int(message_id))
+                self.dropped_messages[message_type] += 1
+                if self.metrics is not None:
+                    self.metrics.record_dropped(message_type)
+
+        if len(batch) > 1:
+            lanes = self._lanes_by_id
+            default_lane = self.default_lane
+            if any(lanes.get(fields[0], default_lane) != default_lane for fields, _ in batch):
+                # Stable sort, messages keep their order within a lane
+                batch = sorted(batch, key=lambda entry: lanes.get(entry[0][0], default_lane))
+
+        for fields, receive_time in batch:
+            if not self.reader:
+                break  # Disconnected by a handler
+
+            try:
+                self.dispatch_message(fields, receive_time)
+            except Exception:
+                LOG.exception("Failed to handle message %r", fields)
+                failures += 1
+
+        return failures
+
+    @property
+    def buffered_bytes(self) -> int:
+        """Bytes received from TWS that were not decoded yet."""
+        return len(buffered_data(self.reader))
+
+    @property
+    def undispatched_age(self) -> float:
+        """Seconds the oldest received but undispatched message has been waiting, at most.
+
+        This is the time since a complete message arrived in a receive buffer which held none, which is an upper bound.
+        It is only known for the `FrameReader` used by `connect`, and 0 for other readers."""
+        since = getattr(self.reader, 'frame_buffered_time', None)
+        if since is None or not _holds_frame(buffered_data(self.reader)):
+            return 0.0
+        return (monotonic_ns() - since) / 1e9
+
+    def _connection_lost(self, error: typing.Optional[Exception]):
+        if not self.is_connected and not self.reader:
+            return
+
+        self.is_connected = False
+        self.reader = None
+        self.writer = None
+        self.__connection_generation += 1
+
+        self.__send_queue.clear()
+        if self.__send_handle:
+            self.__send_handle.cancel()
+            self.__send_handle = None
+
+        self._disconnected()
+        self.on_disconnect(error)
+
+        if self.__connect_args:
+            asyncio.ensure_future(self.__reconnect())
+
+    async def __reconnect(self):
+        delay = self.reconnect_delay
+        while self.__connect_args and not self.is_connected:
+            await asyncio.sleep(delay)
+            if not self.__connect_args:
+                return
+
+            try:
+                await self.__open_connection(*self.__connect_args)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.__close_half_open()
+                delay = min(delay * 2, self.max_reconnect_delay)
+                LOG.warning("Reconnecting to TWS failed, retrying in %gs: %r", delay, e,
+                            exc_info=not isinstance(e, (asyncio.IncompleteReadError, asyncio.TimeoutError, OSError)))
+                continue
+
+            LOG.info("Reconnected to TWS, restoring subscriptions")
+            try:
+                self._resubscribe()
+            except Exception:
+                # If the connection dropped again, losing it started another reconnect
+                LOG.exception("Failed to restore subscriptions after reconnecting")
+            self.on_reconnect(None)
+
+    def __close_half_open(self):
+        writer = self.writer
+        self.is_connected = False
+        self.reader = None
+        self.writer = None
+        if writer:
+            writer.close()
+
+    def _disconnected(self):
+        for request_id in list(self._pending_responses):
+            future = self.__forget_request(request_id)
+            if future and not future.done():
+                future.set_exception(NotConnectedError())
+
+        super()._disconnected()
+
+    async def _read_frame(self) -> bytes:
         size_buf = await self.reader.readexactly(4)
         size = struct.unpack("!I", size_buf)[0]
-        message = await self.reader.readexactly(size)
-        return [field.decode() for field in message[:-1].split(b'\0')]
+        frame = await self.reader.readexactly(size)
+        if self.recorder is not None:
+            self.recorder.record(FrameDirection.Incoming, frame)
+        return frame
+
+    async def _read_message(self) -> typing.List[str]:
+        return split_fields(await self._read_frame())
+
+    def __offload(self, frame: bytes, receive_time: int):
+        future = asyncio.get_event_loop().run_in_executor(self.decode_executor, decode_frame, type(self),
+                                                          int(self.version), frame)
+        future.add_done_callback(functools.partial(self.__dispatch_decoded, self.__connection_generation, len(frame),
+                                                   receive_time))
+
+    def __dispatch_decoded(self, generation: int, size: int, receive_time: int, future: asyncio.Future):
+        """Passes a message decoded by the executor to its handler. Messages are handled as their decoding completes,
+        after the messages received along with them. Messages of a connection lost in the meantime are dropped."""
+        if future.cancelled() or generation != self.__connection_generation:
+            return
+
+        try:
+            message_type, arguments = future.result()
+        except Exception:
+            LOG.exception("Failed to decode message")
+            return
+
+        self.receive_time = receive_time
+        start = time.perf_counter()
+        try:
+            getattr(self, "_handle_%s" % message_type.name.lower())(*arguments)
+        except Exception:
+            LOG.exception("Failed to handle message %s", message_type.name)
+        finally:
+            # The decode time was spent in the executor
+            if self.metrics is not None:
+                self.metrics.record_incoming(message_type, size, 0.0, time.perf_counter() - start)
+            if self.latency is not None:
+                self.latency.record(message_type, monotonic_ns() - receive_time)
 
-    def dispatch_message(self, fields: typing.List[str]):
+    def dispatch_message(self, fields: typing.List[str], receive_time: int = None):
+        """Decodes a message, and passes it to its handler.
+
+        `receive_time` is the `time.monotonic_ns()` timestamp at which the message was received, it defaults to now.
+        """
         assert len(fields) >= 1
+        self.receive_time = monotonic_ns() if receive_time is None else receive_time
+        if self.metrics is not None or self.latency is not None:
+            self.__dispatch_measured(fields)
+            return
+
         message = IncomingMessage(fields, source=self)
 
         # Find a general-purpose handler
@@ -414,9 +900,69 @@ class Protocol(ProtocolInterface):
         else:
             LOG.debug('no handler for %r (v%i)', message, message.message_version)
 
+    def __dispatch_measured(self, fields: typing.List[str]):
+        metrics = self.metrics
+        latency = self.latency
+
+        # The wire size, before the fields get replaced by their parsed values
+        size = sum(len(field) for field in fields) + len(fields) if metrics is not None else 0
+
+        start = time.perf_counter()
+        message = IncomingMessage(fields, source=self)
+        handler = getattr(self, "_handle_%s" % message.message_type.name.lower(), None)
+        if not handler:
+            LOG.debug('no handler for %r (v%i)', message, message.message_version)
+            if metrics is not None:
+                metrics.record_incoming(message.message_type, size, time.perf_counter() - start, 0.0)
+            return
+
+        decoded = None
+        try:
+            arguments = message.read_arguments(handler)
+            decoded = time.perf_counter()
+            handler(*arguments)
+        finally:
+            end = time.perf_counter()
+            if decoded is None:  # Decoding failed
+                decoded = end
+            if metrics is not None:
+                metrics.record_incoming(message.message_type, size, decoded - start, end - decoded)
+            if latency is not None:
+                latency.record(message.message_type, monotonic_ns() - self.receive_time)
+            LOG_MESSAGES.debug('received %r', message)
+
     def send(self, message: OutgoingMessage):
+        if not self.writer:
+            raise NotConnectedError()
+
         LOG_MESSAGES.debug('send %r', message)
-        self.writer.write(message.serialize())
+        data = message.serialize()
+        if self.metrics is not None:
+            self.metrics.record_outgoing(message.message_type, len(data))
+
+        # Keep the order of messages: once one is delayed, the following ones wait their turn.
+        if self.__send_queue or not self.__pacer.try_acquire():
+            self.__send_queue.append(data)
+            self.__schedule_send()
+        else:
+            self.__write(data)
+
+    def __write(self, data: bytes):
+        if self.recorder is not None:
+            self.recorder.record(FrameDirection.Outgoing, data[4:])
+        self.writer.write(data)
+
+    def __schedule_send(self):
+        if not self.__send_handle:
+            self.__send_handle = asyncio.get_event_loop().call_later(self.__pacer.delay(), self.__send_queued)
+
+    def __send_queued(self):
+        self.__send_handle = None
+        while self.__send_queue and self.__pacer.try_acquire():
+            self.__write(self.__send_queue.popleft())
+
+        if self.__send_queue:
+            self.__schedule_send()
 
     def check_feature(self, min_version: ProtocolVersion, feature: str = None):
         if not self.version:
@@ -427,24 +973,75 @@ class Protocol(ProtocolInterface):
 
     # ---- Futures handling ----
 
-    def make_future(self) -> typing.Tuple[RequestId, asyncio.Future]:
-        request_id = self.make_request_id()
+    def make_future(self, message_type: Outgoing = None, timeout: float = None,
+                    request_id: RequestId = None) -> typing.Tuple[RequestId, asyncio.Future]:
+        request_id = self.make_request_id(request_id)
         future = asyncio.Future()  # type: asyncio.Future
         self._pending_responses[request_id] = future
+
+        if timeout is None:
+            timeout = self.default_timeouts.get(message_type)
+
+        now = asyncio.get_event_loop().time()
+        self._pending_requests[request_id] = (message_type, now, timeout)
+        if timeout is not None:
+            self._request_deadlines.schedule(request_id, now + timeout)
+
+        # Futures cancelled by the caller will never be resolved, stop tracking them right away.
+        future.add_done_callback(lambda _: future.cancelled() and self.__forget_request(request_id, future))
         return request_id, future
 
     def resolve_future(self, request_id: RequestId, result):
-        future = self._pending_responses.pop(request_id, None)
+        future = self.__forget_request(request_id)
         if future and not future.done():
             future.set_result(result)
 
+    def extend_deadline(self, request_id: RequestId):
+        _, _, timeout = self._pending_requests.get(request_id, (None, None, None))
+        if timeout is not None:
+            self._request_deadlines.schedule(request_id, asyncio.get_event_loop().time() + timeout)
+
+    @property
+    def pending_request_count(self) -> int:
+        return len(self._pending_responses)
+
+    def pending_requests(self) -> typing.List[PendingRequest]:
+        """Lists the requests still waiting for a response, oldest first."""
+        now = asyncio.get_event_loop().time()
+        return [PendingRequest(request_id, message_type, now - started)
+                for request_id, (message_type, started, _) in sorted(self._pending_requests.items(),
+                                                                     key=lambda item: item[1][1])]
+
+    def __forget_request(self, request_id: RequestId, future: asyncio.Future = None) -> typing.Optional[asyncio.Future]:
+        if future is not None and self._pending_responses.get(request_id) is not future:
+            return None
+
+        self._request_deadlines.cancel(request_id)
+        self._pending_requests.pop(request_id, None)
+        return self._pending_responses.pop(request_id, None)
+
+    def __expire_request(self, request_id: RequestId):
+        message_type, _, timeout = self._pending_requests.get(request_id, (None, None, None))
+        future = self.__forget_request(request_id)
+        if future is None or future.done():
+            return
+
+        error = RequestTimeoutError(request_id, message_type, timeout)
+        LOG.warning("%s", error)
+        future.set_exception(error)
+
+        cancel = self._cancel_messages.get(message_type)
+        if cancel and self.cancel_on_timeout:
+            cancel_message, version = cancel
+            self.send_message(cancel_message, version, request_id)
+
     # ---- Generic handlers ----
 
     def _handle_err_msg(self, request_id: RequestId, error_code: int, error_message: str):
         if error_code in warning_codes:
             LOG.info("Received warning#%i from TWS: %s", error_code, error_message)
         else:
-            future = self._pending_responses.pop(request_id, None)
+            future = self.__forget_request(request_id)
             if future:
                 future.set_exception(ApiException(error_code, error_message))
             else:
@@ -0,0 +1,238 @@
+"""Records the raw message stream exchanged with TWS.
+
+A recording consists of a log file and an index file (the log path with `.idx` appended).
+
+The log starts with a header holding the wall clock and monotonic time when recording started. It is followed by
+blocks, each made up of a block header and a payload. The payload is a sequence of frames, optionally compressed with
+zlib as a whole. Every frame is a frame header (monotonic timestamp, direction and length) followed by the message
+fields exactly as they were sent over the wire, without the length prefix.
+
+The index holds the first and last timestamp and file offset of every block. It is only an accelerator: the block
+headers carry the same information, so a lost index can be rebuilt from the log.
+"""
+import bisect
+import concurrent.futures
+import enum
+import logging
+import mmap
+import os
+import struct
+import time
+import typing
+import zlib
+
+LOG = logging.getLogger(__name__)
+
+_magic = b"IBREC\x00\x00\x01"
+_file_header = struct.Struct("!8sdd")  # magic, wall clock time, monotonic time
+_block_header = struct.Struct("!BIIIdd")  # flags, stored size, raw size, frame count, first and last timestamp
+_frame_header = struct.Struct("!dBI")  # monotonic timestamp, direction, size
+_index_entry = struct.Struct("!ddQ")  # first and last timestamp, offset of the block header
+
+_flag_compressed = 0x01
+
+
+class FrameDirection(enum.IntEnum):
+    Incoming = 0
+    Outgoing = 1
+
+
+Frame = typing.NamedTuple("Frame", [
+    ('timestamp', float),
+    ('direction', FrameDirection),
+    ('data', bytes),
+])
+
+BlockInfo = typing.NamedTuple("BlockInfo", [
+    ('first_timestamp', float),
+    ('last_timestamp', float),
+    ('offset', int),
+])
+
+
+class RecordingFormatError(Exception):
+    pass
+
+
+class Recorder:
+    """Appends frames to a recording.
+
+    Frames are collected in memory, and handed over as a block once `block_size` bytes are buffered, or when `flush` is
+    called. Recording a frame only appends it to the buffer. Blocks are compressed and written by a worker thread, so
+    that neither stalls the message loop. `close` waits for the pending blocks to be written."""
+
+    def __init__(self, path: str, compress=True, block_size=256 * 1024, compression_level=1) -> None:
+        self.path = path
+        self.compress = compress
+        self.block_size = block_size
+        self.compression_level = compression_level
+
+        self.start_time = time.time()
+        self.start_monotonic = time.monotonic()
+
+        self._file = open(path, "wb")
+        self._index_file = open(path + ".idx", "wb")
+        self._file.write(_file_header.pack(_magic, self.start_time, self.start_monotonic))
+
+        self._buffer = bytearray()
+        self._frame_count = 0
+        self._first_timestamp = 0.0
+        self._last_timestamp = 0.0
+
+        # A single worker, so that blocks are written in order
+        self._writer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._file is None
+
+    def record(self, direction: FrameDirection, data: bytes):
+        timestamp = time.monotonic()
+        if not self._frame_count:
+            self._first_timestamp = timestamp
+        self._last_timestamp = timestamp
+        self._frame_count += 1
+
+        buffer = self._buffer
+        buffer += _frame_header.pack(timestamp, direction, len(data))
+        buffer += data
+
+        if len(buffer) >= self.block_size:
+            self.flush()
+
+    def flush(self, wait=False):
+        """Hands the buffered frames to the writer thread. With `wait`, returns once everything is written."""
+        if self._file is None:
+            return
+
+        if self._frame_count:
+            self._writer.submit(self._write_block, self._buffer, self._frame_count, self._first_timestamp,
+                                self._last_timestamp)
+            self._buffer = bytearray()
+            self._frame_count = 0
+
+        if wait:
+            self._writer.submit(lambda: None).result()
+
+    def _write_block(self, raw: bytearray, frame_count: int, first_timestamp: float, last_timestamp: float):
+        try:
+            flags = 0
+            payload = bytes(raw)
+            if self.compress:
+                payload = zlib.compress(raw, self.compression_level)
+                flags |= _flag_compressed
+
+            offset = self._file.tell()
+            self._file.write(_block_header.pack(flags, len(payload), len(raw), frame_count,
+                                                first_timestamp, last_timestamp))
+            self._file.write(payload)
+            self._file.flush()
+
+            self._index_file.write(_index_entry.pack(first_timestamp, last_timestamp, offset))
+            self._index_file.flush()
+        except Exception:
+            LOG.exception("Failed to write a block of %i frames to %s", frame_count, self.path)
+
+    def close(self):
+        if self._file is None:
+            return
+
+        self.flush()
+        self._writer.shutdown(wait=True)
+        self._file.close()
+        self._index_file.close()
+        self._file = self._index_file = None
+
+
+class RecordingReader:
+    """Reads the frames of a recording, optionally limited to a range of timestamps."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+        with open(path, "rb") as log_file:
+            header = log_file.read(_file_header.size)
+        if len(header) < _file_header.size:
+            raise RecordingFormatError("%s is not a recording" % path)
+
+        magic, self.start_time, self.start_monotonic = _file_header.unpack(header)
+        if magic != _magic:
+            raise RecordingFormatError("%s is not a recording" % path)
+
+        self.blocks = self._read_index()
+
+    def _read_index(self) -> typing.List[BlockInfo]:
+        try:
+            with open(self.path + ".idx", "rb") as index_file:
+                data = index_file.read()
+        except FileNotFoundError:
+            LOG.info("No index for %s, scanning the recording", self.path)
+            return self._scan_blocks()
+
+        # A partially written last entry is ignored, the block it refers to may be incomplete too.
+        usable = len(data) - len(data) % _index_entry.size
+        return [BlockInfo(*entry) for entry in _index_entry.iter_unpack(data[:usable])]
+
+    def _scan_blocks(self) -> typing.List[BlockInfo]:
+        blocks = []
+        size = os.path.getsize(self.path)
+        with open(self.path, "rb") as log_file:
+            offset = log_file.seek(_file_header.size)
+            while offset + _block_header.size <= size:
+                _, stored_size, _, _, first, last = _block_header.unpack(log_file.read(_block_header.size))
+                if offset + _block_header.size + stored_size > size:
+                    break  # Truncated block
+
+                blocks.append(BlockInfo(first, last, offset))
+                offset = log_file.seek(stored_size, os.SEEK_CUR)
+
+        return blocks
+
+    def to_wall_time(self, timestamp: float) -> float:
+        """Converts a frame timestamp to wall clock time, as returned by `time.time()`."""
+        return self.start_time + (timestamp - self.start_monotonic)
+
+    def frames(self, start: float = None, end: float = None) -> typing.Iterator[Frame]:
+        """Yields the frames with a timestamp between `start` and `end`, which are both optional.
+
+        The recording is read through a memory map, so only the blocks that are needed are read from disk."""
+        blocks = self.blocks
+        first_block = 0
+        if start is not None:
+            # Skip the blocks that end before the start, using the index
+            first_block = bisect.bisect_left([block.last_timestamp for block in blocks], start)
+
+        with open(self.path, "rb") as log_file, mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for block in blocks[first_block:]:
+                if end is not None and block.first_timestamp > end:
+                    return
+
+                for frame in _decode_block(data, block.offset):
+                    if start is not None and frame.timestamp < start:
+                        continue
+                    if end is not None and frame.timestamp > end:
+                        return
+                    yield frame
+
+
+def _decode_block(data: mmap.mmap, offset: int) -> typing.Iterator[Frame]:
+    flags, stored_size, raw_size, count, _, _ = _block_header.unpack_from(data, offset)
+    offset += _block_header.size
+
+    if flags & _flag_compressed:
+        payload = zlib.decompress(data[offset:offset + stored_size])  # type: typing.Union[bytes, mmap.mmap]
+        offset = 0
+    else:
+        payload = data
+
+    for _ in range(count):
+        timestamp, direction, size = _frame_header.unpack_from(payload, offset)
+        offset += _frame_header.size
+        yield Frame(timestamp, FrameDirection(direction), payload[offset:offset + size])
+        offset += size
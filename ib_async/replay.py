@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+import typing
+
+import ib_async
+from ib_async.instrument import Instrument, SecurityType
+from ib_async.messages import Outgoing
+from ib_async.protocol import Protocol, ProtocolVersion, RequestId, split_fields
+from ib_async.recorder import FrameDirection, RecordingReader
+from ib_async.utils import monotonic_ns
+
+LOG = logging.getLogger(__name__)
+
+
+class ReplayStats(typing.NamedTuple("ReplayStats", [
+    ('messages', int),
+    ('errors', int),
+    ('elapsed', float),
+])):
+    @property
+    def messages_per_second(self) -> float:
+        return self.messages / self.elapsed if self.elapsed else 0.0
+
+
+class DiscardingWriter:
+    """Stands in for the connection of a client fed from a recording, the requests it makes go nowhere."""
+
+    def write(self, data: bytes):
+        pass
+
+    def close(self):
+        pass
+
+
+class Replayer:
+    """Feeds a recording into a client, as if it was received from TWS.
+
+    Incoming frames are dispatched in batches like those of the message loop, exercising load shedding, message lanes
+    and the whole decode, instrument and event pipeline. With a `speed` of 1, frames are dispatched with the same
+    timing as they were recorded, higher speeds replay faster, and a speed of `None` dispatches as fast as possible, in
+    batches of up to `max_batch_size` messages.
+
+    The recorded subscription requests are repeated on the client, using the recorded request ids, so that the
+    replayed market data, depth and tick by tick data reach their instruments."""
+
+    def __init__(self, client: "ib_async.IBClient", recording: typing.Union[str, RecordingReader],
+                 speed: typing.Optional[float] = 1.0) -> None:
+        self.client = client
+        self.reader = recording if isinstance(recording, RecordingReader) else RecordingReader(recording)
+        self.speed = speed
+
+        if client.writer is None:
+            client.writer = typing.cast(asyncio.StreamWriter, DiscardingWriter())
+        if client.reader is None:
+            # Nothing is read from it, but batches are only dispatched while the client has a reader
+            client.reader = asyncio.StreamReader()
+
+    async def run(self, start: float = None, end: float = None) -> ReplayStats:
+        """Replays the frames recorded between `start` and `end`, which are timestamps as stored in the recording."""
+        loop = asyncio.get_event_loop()
+        client = self.client
+        messages = errors = 0
+
+        started = time.perf_counter()
+        replay_start = loop.time()
+        first_timestamp = None
+        # Frames that are due, dispatched together once the next frame is not due yet or the batch is full
+        batch = []  # type: typing.List[typing.Tuple[typing.List[str], int]]
+
+        for frame in self.reader.frames(start, end):
+            fields = split_fields(frame.data)
+
+            if frame.direction == FrameDirection.Outgoing:
+                errors += client._dispatch_batch(batch)
+                batch = []
+                self._repeat_request(fields)
+                continue
+
+            if client.version is None and len(fields) == 2:
+                # The response to the version negotiation
+                client.version = ProtocolVersion(int(fields[0]))
+                continue
+
+            if self.speed:
+                if first_timestamp is None:
+                    first_timestamp = frame.timestamp
+                delay = replay_start + (frame.timestamp - first_timestamp) / self.speed - loop.time()
+                if delay > 0.001:
+                    errors += client._dispatch_batch(batch)
+                    batch = []
+                    await asyncio.sleep(delay)
+
+            batch.append((fields, monotonic_ns()))
+            messages += 1
+            if len(batch) >= client.max_batch_size:
+                errors += client._dispatch_batch(batch)
+                batch = []
+                await asyncio.sleep(0)
+
+        errors += client._dispatch_batch(batch)
+        await asyncio.sleep(0)  # Let batched events flush
+        return ReplayStats(messages, errors, time.perf_counter() - started)
+
+    def _repeat_request(self, fields: typing.List[str]):
+        try:
+            message_type = Outgoing(int(fields[0]))
+        except ValueError:
+            return
+
+        client = self.client
+        try:
+            if message_type == Outgoing.REQ_MKT_DATA:
+                client.get_market_data(_request_instrument(client, fields, 3), request_id=RequestId(int(fields[2])))
+            elif message_type == Outgoing.REQ_MKT_DEPTH:
+                client.subscribe_market_depth(_request_instrument(client, fields, 3, depth=True), int(fields[14]),
+                                              request_id=RequestId(int(fields[2])))
+            elif message_type == Outgoing.REQ_TICK_BY_TICK_DATA:
+                client.subscribe_tick_by_tick(_request_instrument(client, fields, 2), fields[14],
+                                              request_id=RequestId(int(fields[1])))
+        except (AttributeError, IndexError, ValueError):
+            LOG.debug("Could not repeat request %r", fields, exc_info=True)
+
+
+def _request_instrument(client: Protocol, fields: typing.List[str], offset: int, depth=False) -> Instrument:
+    """Finds the instrument of a recorded request, the fields are in the order of `Instrument.serialize`."""
+    instrument = Instrument.get_instance(client, int(fields[offset]))
+    if not instrument.symbol:
+        instrument.symbol = fields[offset + 1]
+        try:
+            instrument.security_type = SecurityType(fields[offset + 2])
+        except ValueError:
+            LOG.debug("Unknown security type %r in recorded request", fields[offset + 2])
+        instrument.exchange = fields[offset + 7]
+
+        currency = offset + 8 if depth else offset + 9
+        instrument.currency = fields[currency]
+        instrument.local_symbol = fields[currency + 1]
+        instrument.trading_class = fields[currency + 2]
+        instrument.reindex()
+
+    return instrument
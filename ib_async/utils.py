@@ -1,5 +1,7 @@
 import asyncio
 import datetime
+import math
+import time
 import typing
 
 
@@ -30,6 +32,13 @@ def to_ib_duration(value: typing.Union[str, datetime.timedelta, float, int]) ->
     return value
 
 
+if hasattr(time, 'monotonic_ns'):
+    monotonic_ns = time.monotonic_ns
+else:  # Python < 3.7
+    def monotonic_ns() -> int:
+        return int(time.monotonic() * 1e9)
+
+
 T = typing.TypeVar('T')
 
 
@@ -37,3 +46,106 @@ def wrap_immediate_future(result: T) -> "asyncio.Future[T]":
     future = asyncio.Future()  # type: asyncio.Future[T]
     future.set_result(result)
     return future
+
+
+def silence_exception(future: asyncio.Future):
+    """A done callback for futures that may never be awaited, so that their exception isn't logged as unretrieved."""
+    if not future.cancelled():
+        future.exception()
+
+
+class TimerWheel(typing.Generic[T]):
+    """Tracks a large number of deadlines using a single timer.
+
+    Keys are hashed into `slots` buckets of `resolution` seconds each, and the wheel advances one bucket per tick,
+    expiring the keys whose deadline has passed. Deadlines further away than a full turn stay in their bucket until
+    their turn comes. `callback` is called with each expired key. The timer only runs while deadlines are pending."""
+
+    def __init__(self, callback: typing.Callable[[T], None], resolution: float = 1.0, slots: int = 512) -> None:
+        self._callback = callback
+        self._resolution = resolution
+        self._slots = [{} for _ in range(slots)]  # type: typing.List[typing.Dict[T, float]]
+        self._slot_of = {}  # type: typing.Dict[T, int]
+        self._tick = 0  # The last tick processed
+        self._handle = None  # type: asyncio.TimerHandle
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def __contains__(self, key: T):
+        return key in self._slot_of
+
+    def schedule(self, key: T, deadline: float):
+        """Expires `key` at `deadline`, in event loop time. Replaces any previous deadline of the key."""
+        self.cancel(key)
+
+        loop = asyncio.get_event_loop()
+        if self._handle is None:
+            self._tick = int(loop.time() / self._resolution)
+            self._handle = loop.call_at((self._tick + 1) * self._resolution, self._advance)
+
+        tick = max(int(math.ceil(deadline / self._resolution)), self._tick + 1)
+        index = tick % len(self._slots)
+        self._slots[index][key] = deadline
+        self._slot_of[key] = index
+
+    def cancel(self, key: T):
+        index = self._slot_of.pop(key, None)
+        if index is None:
+            return
+
+        del self._slots[index][key]
+        if not self._slot_of and self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+    def _advance(self):
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        current = int(now / self._resolution)
+
+        # Visit every bucket passed since the last tick, but each at most once when the loop fell far behind.
+        expired = []
+        for tick in range(self._tick + 1, min(current, self._tick + len(self._slots)) + 1):
+            slot = self._slots[tick % len(self._slots)]
+            for key, deadline in list(slot.items()):
+                if deadline <= now:
+                    del slot[key]
+                    del self._slot_of[key]
+                    expired.append(key)
+
+        self._tick = max(current, self._tick)
+        self._handle = None
+        if self._slot_of:
+            self._handle = loop.call_at((self._tick + 1) * self._resolution, self._advance)
+
+        for key in expired:
+            self._callback(key)
+
+
+class RateLimiter:
+    """A token bucket, allowing `rate` actions per second on average, and bursts of up to `burst` actions."""
+
+    def __init__(self, rate: float, burst: float = None) -> None:
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._tokens = self.burst
+        self._updated = None  # type: float
+
+    def _refill(self, now: float):
+        if self._updated is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        """Takes a token if one is available."""
+        self._refill(asyncio.get_event_loop().time())
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def delay(self) -> float:
+        """Seconds until the next token becomes available."""
+        self._refill(asyncio.get_event_loop().time())
+        return max(0.0, (1 - self._tokens) / self.rate)
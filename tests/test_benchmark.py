@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+from ib_async import benchmark
+from ib_async.benchmark import BenchmarkResult, Regression
+
+BASELINE = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+# Short runs on shared machines are noisy, only a large slowdown is a regression
+TOLERANCE = 1.5
+
+
+def test_benchmarks_run():
+    names = list(benchmark._benchmarks)
+    results = benchmark.run_benchmarks(names, scale=0.001, repeat=1)
+
+    assert [result.name for result in results] == names
+    assert all(result.seconds_per_operation > 0 for result in results)
+
+
+def test_regressions(tmpdir):
+    path = str(tmpdir.join("baseline.json"))
+    benchmark.save_baseline(path, [BenchmarkResult('fast', 1.0), BenchmarkResult('slow', 1.0)])
+    baseline = benchmark.load_baseline(path)
+    assert baseline == {'fast': 1.0, 'slow': 1.0}
+
+    results = [BenchmarkResult('fast', 1.1), BenchmarkResult('slow', 1.5), BenchmarkResult('new', 9.0)]
+    assert benchmark.find_regressions(results, baseline, tolerance=0.25) == [Regression('slow', 1.0, 1.5)]
+
+
+def test_relative_results():
+    results = [BenchmarkResult('calibration', 2.0), BenchmarkResult('decode', 5.0)]
+    assert benchmark.relative_results(results) == [BenchmarkResult('decode', 2.5)]
+
+
+@pytest.mark.skipif(not os.environ.get("IB_ASYNC_BENCHMARK"),
+                    reason="timing sensitive, set IB_ASYNC_BENCHMARK=1 to compare against the stored baseline")
+@pytest.mark.skipif(sys.gettrace() is not None or "coverage" in sys.modules,
+                    reason="tracing distorts the timings")
+def test_no_regressions():
+    baseline = benchmark.load_baseline(BASELINE)
+    results = benchmark.run_benchmarks(list(baseline) + ['calibration'], scale=0.05, repeat=5)
+
+    assert benchmark.find_regressions(benchmark.relative_results(results), baseline, TOLERANCE) == []
@@ -1,3 +1,5 @@
+import asyncio
+import gc
 import inspect
 import glob
 import os
@@ -6,8 +8,12 @@ import sys
 import pytest
 
 import ib_async
+import ib_async.errors
 import ib_async.functionality
 import ib_async.protocol
+from ib_async.messages import Outgoing
+from ib_async.protocol_versions import ProtocolVersion
+from .utils import FunctionalityTestHelper, run_event_loop
 
 
 def test_all_functionality_included():
@@ -53,3 +59,129 @@ def test_handlers_valid():
                 pytest.fail("IBClient.%s %s parameter is untyped" % (
                     member, parameter.name
                 ))
+
+
+class ClientFixture(ib_async.IBClient, FunctionalityTestHelper):
+    pass
+
+
+def test_resubscribe():
+    client = ClientFixture()
+    client.version = ProtocolVersion.MAX_CLIENT
+    instrument = client.test_instrument
+
+    def on_position(event):
+        pass
+
+    client.get_market_data(instrument, [ib_async.TickTypeGroup.Volume])
+    client.get_market_data(instrument, snapshot=True)
+    client.subscribe_market_depth(instrument, 5)
+    client.subscribe_realtime_bars(instrument)
+    client.subscribe_tick_by_tick(instrument, 'Last')
+    client.on_position += on_position
+    subscribed = [message.fields for message in client.sent]
+
+    client.sent = []
+    client._resubscribe()
+    replayed = [message.fields for message in client.sent]
+
+    # Everything but the snapshot is requested again
+    del subscribed[1]
+    assert sorted(fields[0] for fields in replayed) == sorted(fields[0] for fields in subscribed)
+
+    # Subscriptions keep their request id and parameters, realtime bars get a new request id
+    for fields in subscribed:
+        if fields[0] != Outgoing.REQ_REAL_TIME_BARS:
+            assert fields in replayed
+
+    # Cancelled subscriptions are not replayed
+    client.cancel_market_data(instrument)
+    client.unsubscribe_market_depth(instrument)
+    client.unsubscribe_realtime_bars(instrument)
+    client.unsubscribe_tick_by_tick(instrument, 'Last')
+    client.on_position -= on_position
+    client.sent = []
+    client._resubscribe()
+    assert client.sent == []
+
+
+def test_unsubscribe_disconnected():
+    client = ClientFixture()
+    client.version = ProtocolVersion.MAX_CLIENT
+    instrument = client.test_instrument
+
+    def on_position(event):
+        pass
+
+    client.get_market_data(instrument)
+    client.subscribe_market_depth(instrument, 5)
+    bars = client.subscribe_realtime_bars(instrument)
+    client.subscribe_tick_by_tick(instrument, 'Last')
+    client.on_position += on_position
+
+    client.is_connected = False
+    client._disconnected()
+    assert isinstance(bars.exception(), ib_async.errors.NotConnectedError)
+
+    # The subscriptions ended along with the connection, there is nothing to cancel
+    client.sent = []
+    client.cancel_market_data(instrument)
+    client.unsubscribe_market_depth(instrument)
+    client.unsubscribe_realtime_bars(instrument)
+    client.unsubscribe_tick_by_tick(instrument, 'Last')
+    client.on_position -= on_position
+    assert client.sent == []
+
+
+def test_realtime_bars_disconnected_not_logged():
+    client = ClientFixture()
+    loop = asyncio.get_event_loop()
+    errors = []
+    loop.set_exception_handler(lambda loop, context: errors.append(context))
+    try:
+        # Nobody awaits the subscription, losing the connection isn't reported as an unretrieved exception
+        client.subscribe_realtime_bars(client.test_instrument)
+        client._disconnected()
+        run_event_loop()
+        client = None
+        gc.collect()
+    finally:
+        loop.set_exception_handler(None)
+
+    assert errors == []
+
+
+def test_disconnected_never_awaited_not_logged():
+    client = ClientFixture()
+    loop = asyncio.get_event_loop()
+    errors = []
+    loop.set_exception_handler(lambda loop, context: errors.append(context))
+    try:
+        # The initial current time and position futures are never awaited
+        client._disconnected()
+        run_event_loop()
+        client = None
+        gc.collect()
+    finally:
+        loop.set_exception_handler(None)
+
+    assert errors == []
+
+
+def test_receive_time():
+    client = ClientFixture()
+    instrument = client.test_instrument
+    client.get_market_data(instrument)
+    request_id = instrument._market_data_request_id
+
+    ticks = []
+
+    def on_market_data(tick_type):
+        ticks.append((tick_type, client.receive_time))
+
+    instrument.on_market_data += on_market_data
+    ib_async.protocol.Protocol.dispatch_message(client, ['1', '6', str(request_id), '1', '13.37', '100', '0'],
+                                                receive_time=1234)
+
+    assert ticks[0] == (ib_async.TickType.Bid, 1234)
+    assert instrument.receive_time == 1234
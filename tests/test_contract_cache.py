@@ -0,0 +1,110 @@
+from ib_async.contract_cache import ContractCache
+from ib_async.functionality.instrument_details import InstrumentDetailsMixin
+from ib_async.instrument import Instrument, SecurityType
+
+from .utils import FunctionalityTestHelper, run_event_loop
+
+
+class MixinFixture(InstrumentDetailsMixin, FunctionalityTestHelper):
+    pass
+
+
+AAPL_CONTRACT_DATA = [
+    "10", "1", "43",  # CONTRACT_DATA
+    'AAPL', 'STK', '', 0.0, '', 'NYSE', 'USD', 'AAPL', 'NMS', 'NMS', 265598, 0.01, '100', '',
+    'ACTIVETIM,ADJUST,ALERT,ALLOC,AVGCOST,BASKET,COND,CONDORDER,DAY,DEACT,DEACTDIS,DEACTEOD,GAT',
+    'SMART,AMEX,NYSE,CBOE,ISE,CHX,ARCA,ISLAND,VWAP,DRCTEDGE,NSX,BEX,BATS,EDGEA,CSFBALGO,IEX,PSX',
+    1, 0, 'APPLE INC', 'NASDAQ', '', 'Technology', 'Computers', 'Computers', 'EST5EDT',
+    '20180507:0700-20180507:1600;20180508:0700-20180508:1600;20180610:CLOSED',
+    '20180507:0700-20180507:1600;20180508:0700-20180508:1600;20180512:CLOSED', '', '', {}, '1', '',
+    '', '26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26', '']
+
+
+def test_cache_roundtrip(tmpdir):
+    path = str(tmpdir.join("contracts.json"))
+
+    t = MixinFixture()
+    t.contract_cache = ContractCache(path)
+
+    fut = t.get_instrument_by_local_symbol("AAPL", "NASDAQ")
+    assert not fut.done()
+    t.sent = []
+
+    t.dispatch_message(AAPL_CONTRACT_DATA)
+    run_event_loop()
+    assert fut.done()
+    assert len(t.contract_cache) == 1
+    t.contract_cache.save()
+
+    # A fresh client can resolve the instrument without asking TWS
+    t = MixinFixture()
+    t.contract_cache = ContractCache(path)
+
+    fut = t.get_instrument_by_local_symbol("AAPL", "NASDAQ")
+    assert fut.done()
+    assert not t.sent
+
+    instrument = fut.result()
+    assert instrument.contract_id == 265598
+    assert instrument.symbol == 'AAPL'
+    assert instrument.security_type == SecurityType.Stock
+    assert instrument.valid_exchanges[:2] == ['SMART', 'AMEX']
+    assert instrument.last_trade_date is None
+
+    # Lookups by contract id are cached too
+    other = Instrument(t)
+    fut = t.refresh_instrument(instrument)
+    assert fut.done()
+    assert not t.sent
+    assert other.symbol == ''
+
+    # Unknown instruments are still requested
+    fut = t.get_instrument_by_local_symbol("MSFT", "NASDAQ")
+    assert not fut.done()
+    assert len(t.sent) == 1
+
+
+def test_cache_revalidate(tmpdir):
+    t = MixinFixture()
+    t.contract_cache = ContractCache(str(tmpdir.join("contracts.json")), ttl=0)
+
+    t.get_instrument_by_local_symbol("AAPL", "NASDAQ")
+    t.dispatch_message(AAPL_CONTRACT_DATA)
+    t.sent = []
+
+    # Stale entries are returned immediately, but also revalidated
+    fut = t.get_instrument_by_local_symbol("AAPL", "NASDAQ")
+    assert fut.done()
+    assert fut.result().symbol == 'AAPL'
+    t.assert_one_message_sent(9, 8, 44, 0, '', 'STK', None, None, None, None, 'NASDAQ', None, None, 'AAPL', '', False,
+                              None, None)
+
+    # With a max_age of zero, entries are ignored altogether
+    t.contract_cache.max_age = 0
+    fut = t.get_instrument_by_local_symbol("AAPL", "NASDAQ")
+    assert not fut.done()
+
+
+def test_cache_revalidate_failed(tmpdir, caplog):
+    t = MixinFixture()
+    t.contract_cache = ContractCache(str(tmpdir.join("contracts.json")), ttl=0)
+
+    t.get_instrument_by_local_symbol("AAPL", "NASDAQ")
+    t.dispatch_message(AAPL_CONTRACT_DATA)
+
+    fut = t.get_instrument_by_local_symbol("AAPL", "NASDAQ")
+    assert fut.result().symbol == 'AAPL'
+
+    # The failed revalidation is logged, rather than left unretrieved
+    t.dispatch_message(["4", "2", "44", "200", "No security definition has been found for the request"])
+    run_event_loop()
+    assert any(record.message.startswith("Failed to revalidate cached contract") for record in caplog.records)
+
+
+def test_cache_corrupt(tmpdir, caplog):
+    path = tmpdir.join("contracts.json")
+    path.write("{")
+
+    cache = ContractCache(str(path))
+    assert len(cache) == 0
+    assert caplog.records[0].message == "Ignoring corrupt contract cache %s" % path
@@ -1,7 +1,9 @@
 import asyncio
+import time
+
 import pytest
 
-from ib_async.event import Event
+from ib_async.event import Event, OverflowPolicy, AsyncSubscription, enable_profiling, disable_profiling
 
 
 def test_simple():
@@ -142,3 +144,250 @@ def test_with_method_handler():
 
     del handler_holder
     assert not instance.on_whatever.has_subscribers
+
+
+def test_queue_overflow():
+    class EventParent:
+        on_whatever = Event()
+
+    instance = EventParent()
+    loop = asyncio.get_event_loop()
+
+    def drain(queue, count):
+        return loop.run_until_complete(asyncio.gather(*[queue.__anext__() for _ in range(count)]))
+
+    newest = instance.on_whatever.iterate(2, OverflowPolicy.DropNewest)
+    oldest = instance.on_whatever.iterate(2, OverflowPolicy.DropOldest)
+    conflate = instance.on_whatever.iterate(2, OverflowPolicy.Conflate)
+    unbounded = instance.on_whatever.iterate()
+
+    for value in range(5):
+        instance.on_whatever(value)
+
+    assert drain(newest, 2) == [0, 1]
+    assert drain(oldest, 2) == [3, 4]
+    assert drain(conflate, 2) == [0, 4]
+    assert drain(unbounded, 5) == [0, 1, 2, 3, 4]
+
+    assert newest.dropped == oldest.dropped == conflate.dropped == 3
+    assert newest.high_water_mark == 2
+    assert unbounded.dropped == 0
+    assert unbounded.high_water_mark == 5
+
+
+def test_queue_block(caplog):
+    class EventParent:
+        on_whatever = Event()
+
+    instance = EventParent()
+    loop = asyncio.get_event_loop()
+
+    queue = instance.on_whatever.iterate(1, OverflowPolicy.Block)
+    instance.on_whatever("first")
+
+    # The emitter can't wait, values are discarded rather than failing the dispatch, with a single warning
+    instance.on_whatever("second")
+    instance.on_whatever("third")
+    assert queue.dropped == 2
+    assert [record.message for record in caplog.records] == [
+        "Event queue full, discarding values until the consumer catches up"]
+
+    put = asyncio.ensure_future(queue.put("fourth"))
+    loop.run_until_complete(asyncio.sleep(0))
+    assert not put.done()
+
+    assert loop.run_until_complete(queue.__anext__()) == "first"
+    loop.run_until_complete(put)
+    assert loop.run_until_complete(queue.__anext__()) == "fourth"
+    assert caplog.records[-1].message == "Event queue no longer full, 2 values were discarded"
+
+
+def test_conflated():
+    class EventParent:
+        on_whatever = Event()
+
+    instance = EventParent()
+    loop = asyncio.get_event_loop()
+
+    changes = instance.on_whatever.conflated()
+    next_change = asyncio.ensure_future(changes.__anext__())
+    loop.run_until_complete(asyncio.sleep(0))
+
+    instance.on_whatever("bid")
+    instance.on_whatever("ask")
+    instance.on_whatever("bid")
+
+    assert loop.run_until_complete(next_change) == {"bid", "ask"}
+
+    instance.on_whatever("last")
+    assert loop.run_until_complete(changes.__anext__()) == {"last"}
+
+
+def test_filtered_handler():
+    class EventParent:
+        on_whatever = Event()
+
+    received = []
+
+    def all_handler(arg):
+        received.append(('all', arg))
+
+    def bid_handler(arg):
+        received.append(('bid', arg))
+
+    def quote_handler(arg):
+        received.append(('quote', arg))
+
+    instance = EventParent()
+    instance.on_whatever += all_handler
+    instance.on_whatever.subscribe(bid_handler, ['bid'])
+    instance.on_whatever.subscribe(quote_handler, {'bid', 'ask'})
+
+    for value in ('bid', 'ask', 'last'):
+        instance.on_whatever(value)
+
+    assert received == [('all', 'bid'), ('bid', 'bid'), ('quote', 'bid'),
+                        ('all', 'ask'), ('quote', 'ask'),
+                        ('all', 'last')]
+
+    received.clear()
+    instance.on_whatever -= all_handler
+    del quote_handler
+    instance.on_whatever('bid')
+    instance.on_whatever('ask')
+    assert received == [('bid', 'bid')]
+
+    # The cheap check only notices collected handlers once the event fired again
+    del bid_handler
+    assert instance.on_whatever.may_have_subscribers
+    instance.on_whatever('bid')
+    assert not instance.on_whatever.may_have_subscribers
+    assert not instance.on_whatever.has_subscribers
+
+
+def test_filtered_handler_unhashable():
+    class EventParent:
+        on_whatever = Event()
+
+    received = []
+
+    def all_handler(arg):
+        received.append(('all', arg))
+
+    def bid_handler(arg):
+        received.append(('bid', arg))
+
+    instance = EventParent()
+    instance.on_whatever += all_handler
+    instance.on_whatever.subscribe(bid_handler, ['bid'])
+
+    # Values that can't be filtered on go to the unfiltered handlers only
+    instance.on_whatever(['bid'])
+    assert received == [('all', ['bid'])]
+
+    received.clear()
+    enable_profiling()
+    try:
+        instance.on_whatever(['bid'])
+    finally:
+        disable_profiling()
+    assert received == [('all', ['bid'])]
+
+
+def test_async_handler():
+    class EventParent:
+        on_whatever = Event()
+
+    instance = EventParent()
+    loop = asyncio.get_event_loop()
+    received = []
+
+    async def handler(arg):
+        await asyncio.sleep(0)
+        received.append(arg)
+
+    instance.on_whatever += handler
+    instance.on_whatever("Test")
+    assert not received
+
+    loop.run_until_complete(asyncio.sleep(0.01))
+    assert received == ["Test"]
+
+    instance.on_whatever -= handler
+    assert not instance.on_whatever.has_subscribers
+
+
+def test_async_handler_ordering():
+    class EventParent:
+        on_whatever = Event()
+
+    instance = EventParent()
+    loop = asyncio.get_event_loop()
+    release = asyncio.Event()
+    running = set()
+    handled = []
+
+    async def handler(arg):
+        running.add(arg)
+        await release.wait()
+        running.remove(arg)
+        handled.append(arg)
+
+    subscription = instance.on_whatever.subscribe(handler, concurrency=2, order_key=lambda arg: arg[0])
+    assert isinstance(subscription, AsyncSubscription)
+
+    for arg in ('a1', 'a2', 'b1', 'c1'):
+        instance.on_whatever(arg)
+
+    loop.run_until_complete(asyncio.sleep(0))
+
+    # a2 has to wait for a1, and c1 is over the concurrency limit
+    assert running == {'a1', 'b1'}
+    assert subscription.running == 2
+    assert subscription.backlog == subscription.max_backlog == 2
+
+    release.set()
+    loop.run_until_complete(asyncio.sleep(0.01))
+
+    assert handled.index('a1') < handled.index('a2')
+    assert sorted(handled) == ['a1', 'a2', 'b1', 'c1']
+    assert subscription.completed == 4
+    assert subscription.backlog == subscription.running == 0
+
+
+def test_profiling(caplog):
+    class EventParent:
+        on_whatever = Event()
+
+    def fast_handler(arg):
+        pass
+
+    def slow_handler(arg):
+        time.sleep(0.02)
+
+    instance = EventParent()
+    instance.on_whatever += fast_handler
+    instance.on_whatever += slow_handler
+
+    profiler = enable_profiling(slow_handler_threshold=0.01)
+    try:
+        instance.on_whatever("Test")
+        instance.on_whatever("Test")
+    finally:
+        disable_profiling()
+
+    instance.on_whatever("Not recorded")
+
+    event_stats = profiler.event_stats['EventParent.on_whatever']
+    assert event_stats.count == 2
+    assert event_stats.max_time >= 0.02
+
+    fast_stats = profiler.handler_stats['EventParent.on_whatever', fast_handler.__qualname__]
+    slow_stats = profiler.handler_stats['EventParent.on_whatever', slow_handler.__qualname__]
+    assert fast_stats.count == slow_stats.count == 2
+    assert slow_stats.total_time >= 0.04
+    assert fast_stats.max_time < slow_stats.max_time
+
+    assert len(caplog.records) == 2
+    assert caplog.records[0].message.startswith("Slow handler %s for EventParent.on_whatever took" %
+                                                slow_handler.__qualname__)
@@ -0,0 +1,162 @@
+import asyncio
+
+import ib_async
+from ib_async.fake_tws import FakeTWS
+from ib_async.instrument import Instrument, SecurityType
+from ib_async.messages import Outgoing
+from ib_async.tick_types import TickType
+
+
+def _make_instrument(client, contract_id=42):
+    instrument = Instrument.get_instance(client, contract_id)
+    instrument.symbol = 'AAPL'
+    instrument.security_type = SecurityType.Stock
+    instrument.exchange = 'SMART'
+    instrument.currency = 'USD'
+    return instrument
+
+
+def test_fake_tws_streams():
+    async def run():
+        async with FakeTWS(rate=2000, seed=1) as server:
+            client = ib_async.IBClient()
+            await client.connect(server.host, server.port, 7)
+            assert client.version == ib_async.protocol.ProtocolVersion.MAX_CLIENT
+
+            assert await client.current_time() > 0
+
+            instrument = _make_instrument(client)
+            await client.get_market_data(instrument)
+            client.subscribe_market_depth(instrument, 5)
+            client.subscribe_tick_by_tick(instrument, 'BidAsk')
+
+            bidasks = []
+
+            def on_bidask(tick):
+                bidasks.append(tick)
+
+            instrument.on_tick_by_tick_bidask += on_bidask
+            await asyncio.sleep(0.1)
+
+            session = server.sessions[0]
+            assert session.client_id == 7
+            assert session.messages_streamed > 50
+            assert instrument._tick_data[TickType.Bid] > 0
+            assert len(instrument.market_depth_bid) == 5
+            assert bidasks
+
+            await client.disconnect()
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_fake_tws_reconnect():
+    async def run():
+        server = FakeTWS(rate=0)
+        await server.start()
+
+        client = ib_async.IBClient()
+        client.reconnect_delay = 0.01
+        reconnects = []
+
+        def on_reconnect(_):
+            reconnects.append(True)
+
+        client.on_reconnect += on_reconnect
+        await client.connect(server.host, server.port, 1, auto_reconnect=True)
+        client.subscribe_market_depth(_make_instrument(client), 5)
+
+        # Restart the server, like TWS does every night
+        await server.stop()
+        await asyncio.sleep(0.05)
+        assert not client.is_connected
+        server = FakeTWS(port=server.port, rate=0)
+        await server.start()
+        await asyncio.sleep(0.2)
+
+        assert client.is_connected
+        assert reconnects == [True]
+        received = [int(fields[0]) for fields in server.sessions[0].received]
+        assert Outgoing.REQ_MKT_DEPTH in received
+
+        await client.disconnect()
+        await server.stop()
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_fake_tws_reconnect_after_failed_negotiation():
+    class FlakyClient(ib_async.IBClient):
+        failures = 0
+
+        async def _negotiate_version(self, client_id):
+            if self.version is None and self.failures == 0 and self.on_reconnect.has_subscribers:
+                self.failures += 1
+                raise AssertionError("unsupported version")
+            return await super()._negotiate_version(client_id)
+
+    async def run():
+        server = FakeTWS(rate=0)
+        await server.start()
+
+        client = FlakyClient()
+        client.reconnect_delay = 0.01
+        reconnects = []
+
+        def on_reconnect(_):
+            reconnects.append(True)
+
+        await client.connect(server.host, server.port, 1, auto_reconnect=True)
+        client.on_reconnect += on_reconnect
+
+        server.sessions[0].close()
+        await asyncio.sleep(0.3)
+
+        # The first attempt failed, the next one succeeded
+        assert client.failures == 1
+        assert client.is_connected
+        assert reconnects == [True]
+
+        await client.disconnect()
+        await server.stop()
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_fake_tws_reconnect_after_stalled_negotiation():
+    class StallingClient(ib_async.IBClient):
+        stalls = 0
+
+        async def _negotiate_version(self, client_id):
+            if self.version is None and self.stalls == 0 and self.on_reconnect.has_subscribers:
+                self.stalls += 1
+                await asyncio.sleep(3600)
+            return await super()._negotiate_version(client_id)
+
+    async def run():
+        server = FakeTWS(rate=0)
+        await server.start()
+
+        client = StallingClient()
+        client.reconnect_delay = 0.01
+        client.handshake_timeout = 0.05
+        reconnects = []
+
+        def on_reconnect(_):
+            reconnects.append(True)
+
+        await client.connect(server.host, server.port, 1, auto_reconnect=True)
+        client.on_reconnect += on_reconnect
+
+        server.sessions[0].close()
+        await asyncio.sleep(0.3)
+
+        # The stalled attempt timed out, the next one succeeded
+        assert client.stalls == 1
+        assert client.is_connected
+        assert reconnects == [True]
+
+        await client.disconnect()
+        await server.stop()
+
+    asyncio.get_event_loop().run_until_complete(run())
@@ -1,7 +1,13 @@
+import asyncio
+
+import pytest
+
+from ib_async.errors import ApiException, RequestTimeoutError
 from ib_async.functionality.instrument_details import InstrumentDetailsMixin
 from ib_async.instrument import SecurityIdentifierType, Instrument
+from ib_async.messages import Outgoing
 
-from .utils import FunctionalityTestHelper
+from .utils import FunctionalityTestHelper, run_event_loop
 
 
 class MixinFixture(InstrumentDetailsMixin, FunctionalityTestHelper):
@@ -25,6 +31,7 @@ def test_by_isin():
                         '20180507:0700-20180507:1600;20180508:0700-20180508:1600;20180610:CLOSED',
                         '20180507:0700-20180507:1600;20180508:0700-20180508:1600;20180512:CLOSED', '', '', {}, '1', '',
                         '', '26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26', ''])
+    run_event_loop()
     assert fut.done()
 
     instrument = fut.result()
@@ -50,10 +57,12 @@ def test_by_local_symbol():
                         '20180507:0700-20180507:1600;20180508:0700-20180508:1600;20180512:CLOSED', '', '', {}, '1', '',
                         '', '26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26', ''])
 
+    run_event_loop()
     assert fut.done()
     instrument = fut.result()
     assert instrument.symbol == 'AAPL'
     assert instrument.exchange == 'NYSE'
+    assert t.instruments.find(symbol='AAPL', exchange='NYSE') == [instrument]
 
 
 def test_update_details():
@@ -77,6 +86,7 @@ def test_update_details():
                         '20180507:0700-20180507:1600;20180508:0700-20180508:1600;20180610:CLOSED',
                         '20180507:0700-20180507:1600;20180508:0700-20180508:1600;20180512:CLOSED', '', '', {}, '1', '',
                         '', '26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26', ''])
+    run_event_loop()
     assert fut.done()
     assert instrument.symbol == 'AAPL'
     assert instrument.exchange == 'NYSE'
@@ -96,5 +106,151 @@ def test_update_details_noresult():
                               'ISIN', 'US0378331005')
 
     t.dispatch_message(["52", "1", "43"]),  # CONTRACT_DATA_END
+    run_event_loop()
     assert fut.done()
     assert fut.result() is None
+
+
+def test_update_details_shared():
+    t = MixinFixture()
+    t.version = 110
+
+    instrument = Instrument(t)
+    instrument.symbol = 'AAPL'
+    instrument.security_ids = {SecurityIdentifierType.ISIN: 'US0378331005'}
+
+    fut = t.refresh_instrument(instrument)
+    other = t.refresh_instrument(instrument)
+    assert other is not fut
+    assert len(t.sent) == 1
+
+    # Cancelling one refresh leaves the other waiting on the same request
+    fut.cancel()
+    t.dispatch_message(["52", "1", "43"]),  # CONTRACT_DATA_END
+    run_event_loop()
+    assert other.done()
+    assert other.result() is None
+
+
+def test_resolve_instruments():
+    t = MixinFixture()
+    t.version = 110
+    loop = asyncio.get_event_loop()
+
+    specs = [
+        {'symbol': 'AAPL', 'exchange': 'NASDAQ'},
+        {'security_id': 'US0000000000', 'security_id_type': SecurityIdentifierType.ISIN},
+        {'symbol': 'MSFT', 'exchange': 'NASDAQ'},
+    ]
+    results = t.resolve_instruments(specs, window=2)
+    next_result = asyncio.ensure_future(results.__anext__())
+    loop.run_until_complete(asyncio.sleep(0))
+
+    # Only two requests are in flight
+    assert len(t.sent) == 2
+    t.sent = []
+
+    t.dispatch_message(["4", "2", "44", "200", "No security definition has been found for the request"])
+    result = loop.run_until_complete(next_result)
+    assert result.spec is specs[1]
+    assert result.instrument is None
+    assert isinstance(result.error, ApiException)
+    assert result.error.error_code == 200
+
+    # The failed request made room for the next one
+    t.assert_one_message_sent(9, 8, 45, 0, '', 'STK', None, None, None, None, 'NASDAQ', None, None, 'MSFT', '', False,
+                              None, None)
+
+    t.dispatch_message(["10", "1", "43",  # CONTRACT_DATA
+                        'AAPL', 'STK', '', 0.0, '', 'NYSE', 'USD', 'AAPL', 'NMS', 'NMS', 265598, 0.01, '100', '',
+                        'ACTIVETIM,ADJUST', 'SMART,AMEX', 1, 0, 'APPLE INC', 'NASDAQ', '', 'Technology', 'Computers',
+                        'Computers', 'EST5EDT', '20180507:0700-20180507:1600', '20180507:0700-20180507:1600', '', '',
+                        {}, '1', '', '', '26,26', ''])
+    t.dispatch_message(["52", "1", "45"])  # CONTRACT_DATA_END, nothing found
+
+    result = loop.run_until_complete(results.__anext__())
+    assert result.spec is specs[0]
+    assert result.instrument.symbol == 'AAPL'
+    assert result.error is None
+
+    result = loop.run_until_complete(results.__anext__())
+    assert result.spec is specs[2]
+    assert result.instrument is None
+    assert result.error is None
+
+    next_result = asyncio.ensure_future(results.__anext__())
+    loop.run_until_complete(asyncio.wait([next_result]))
+    assert isinstance(next_result.exception(), StopAsyncIteration)
+
+
+def _future_contract_data(request_id, contract_id, expiry):
+    return ["10", "1", str(request_id),  # CONTRACT_DATA
+            'ES', 'FUT', expiry + '  00:00:00', 0.0, '', 'GLOBEX', 'USD', 'ES' + expiry, 'ES', 'ES', contract_id, 0.25,
+            '1', '50', 'LMT,MKT', 'GLOBEX', 1, 11004968, 'E-mini S&P 500', '', expiry[:6], '', '', '', 'US/Central',
+            '', '', '', '', {}, '2', 'ES', 'IND', '67', '']
+
+
+def test_find_instruments_slow_stream():
+    class FastFixture(MixinFixture):
+        timeout_resolution = 0.01
+        default_timeouts = {Outgoing.REQ_CONTRACT_DATA: 0.05}
+
+    t = FastFixture()
+    t.version = 110
+    loop = asyncio.get_event_loop()
+
+    # Data that keeps arriving extends the timeout, the stream is only limited by the silence between messages
+    stream = t.find_instruments('ES', 'FUT', 'GLOBEX')
+    for contract_id in range(346233386, 346233392):
+        loop.run_until_complete(asyncio.sleep(0.02))
+        t.dispatch_message(_future_contract_data(43, contract_id, '20181221'))
+    t.dispatch_message(["52", "1", "43"])  # CONTRACT_DATA_END
+
+    async def collect(stream):
+        result = []
+        async for instrument in stream:
+            result.append(instrument.contract_id)
+        return result
+
+    assert loop.run_until_complete(collect(stream)) == list(range(346233386, 346233392))
+    assert not t._contract_data_streams
+
+    # A stream that stops short still times out
+    stream = t.find_instruments('ES', 'FUT', 'GLOBEX')
+    t.dispatch_message(_future_contract_data(44, 346233386, '20181221'))
+    loop.run_until_complete(asyncio.sleep(0.1))
+    assert loop.run_until_complete(stream.__anext__()).contract_id == 346233386
+    with pytest.raises(RequestTimeoutError):
+        loop.run_until_complete(stream.__anext__())
+
+
+def test_find_instruments():
+    t = MixinFixture()
+    t.version = 110
+    loop = asyncio.get_event_loop()
+
+    async def collect(stream):
+        result = []
+        async for instrument in stream:
+            result.append(instrument)
+        return result
+
+    stream = t.find_instruments('ES', 'FUT', 'GLOBEX')
+    t.assert_one_message_sent(9, 8, 43, 0, 'ES', 'FUT', '', None, '', '', 'GLOBEX', None, '', None, '', False,
+                              None, None)
+
+    t.dispatch_message(_future_contract_data(43, 346233386, '20181221'))
+    t.dispatch_message(_future_contract_data(43, 371749798, '20190315'))
+    t.dispatch_message(["52", "1", "43"])  # CONTRACT_DATA_END
+
+    instruments = loop.run_until_complete(collect(stream))
+    assert [instrument.contract_id for instrument in instruments] == [346233386, 371749798]
+    assert instruments[1].contract_month == '201903'
+    assert not t._contract_data_streams
+
+    # Errors are raised from the iterator
+    stream = t.find_instruments('XX', 'FUT', 'GLOBEX')
+    t.dispatch_message(["4", "2", "44", "200", "No security definition has been found for the request"])
+    next_instrument = asyncio.ensure_future(stream.__anext__())
+    loop.run_until_complete(asyncio.wait([next_instrument]))
+    assert isinstance(next_instrument.exception(), ApiException)
@@ -1,12 +1,12 @@
 import pytest
 
 from ib_async.errors import OutdatedServerError
-from ib_async.functionality.market_data import MarketDataMixin
+from ib_async.functionality.market_data import MarketDataMixin, MarketDataEvent
 from ib_async.messages import Incoming, Outgoing
 from ib_async.protocol_versions import ProtocolVersion
 from ib_async.tick_types import MarketDataTimeliness, TickType
 
-from .utils import FunctionalityTestHelper
+from .utils import FunctionalityTestHelper, run_event_loop
 
 
 class MixinFixture(MarketDataMixin, FunctionalityTestHelper):
@@ -91,12 +91,109 @@ def test_fetch():
     client.assert_one_message_sent(Outgoing.REQ_MKT_DATA, 11, 43, 172604153, 'LLOY', 'STK', partial_match=True)
 
     client.fake_incoming(Incoming.TICK_SNAPSHOT_END, 1, 43)
+    run_event_loop()
     assert future.done()
 
 
+def test_fetch_shared():
+    client = MixinFixture()
+    instrument = client.test_instrument
+
+    future = instrument.fetch_market_data()
+    other = instrument.fetch_market_data()
+    assert other is not future
+    client.assert_one_message_sent(Outgoing.REQ_MKT_DATA, 11, 43, 172604153, 'LLOY', 'STK', partial_match=True)
+
+    client.fake_incoming(Incoming.TICK_SNAPSHOT_END, 1, 43)
+    run_event_loop()
+    assert future.done()
+    assert other.done()
+
+    # A snapshot after the previous one completed is requested again
+    instrument.fetch_market_data()
+    client.assert_one_message_sent(Outgoing.REQ_MKT_DATA, 11, 44, 172604153, 'LLOY', 'STK', partial_match=True)
+
+
 def test_regulatory_snapshot():
     client = MixinFixture()
     client.version = ProtocolVersion.MIN_CLIENT
     instrument = client.test_instrument
     with pytest.raises(OutdatedServerError):
         client.get_market_data(instrument, regulatory_snapshot=True)
+
+
+def test_subscribe_filtered():
+    client = MixinFixture()
+    instrument = client.test_instrument
+
+    received = []
+
+    def handler(tick):
+        received.append(tick)
+
+    # Filtered subscriptions trigger the market data request just like unfiltered ones
+    instrument.on_market_data.subscribe(handler, {TickType.Last})
+    client.assert_one_message_sent(Outgoing.REQ_MKT_DATA, '11', '43', instrument, False, '', False, None)
+
+    client.fake_incoming(Incoming.TICK_PRICE, 1, 43, TickType.Bid, 13.37, 13, 0)
+    client.fake_incoming(Incoming.TICK_PRICE, 1, 43, TickType.Last, 13.38, 14, 0)
+
+    # The size twin of the last price is not delivered either
+    assert received == [TickType.Last]
+    assert instrument._tick_data[TickType.Bid] == 13.37
+
+
+def test_market_data_bus():
+    client = MixinFixture()
+    instrument = client.test_instrument
+
+    received = []
+    batches = []
+
+    def handler(event):
+        received.append(event)
+
+    def batch_handler(batch):
+        batches.append(batch)
+
+    def instrument_handler(tick_type):
+        pass
+
+    client.on_market_data += handler
+    client.on_market_data_batch += batch_handler
+
+    # The client-wide event does not subscribe to market data by itself
+    assert not client.sent
+    instrument.on_market_data += instrument_handler
+
+    client.fake_incoming(Incoming.TICK_PRICE, 1, 43, TickType.Bid, 13.37, 13, 0)
+    client.fake_incoming(Incoming.TICK_GENERIC, 1, 43, TickType.MarkPrice, 1.21)
+
+    expected = [MarketDataEvent(instrument, TickType.Bid, 13.37),
+                MarketDataEvent(instrument, TickType.BidSize, 13),
+                MarketDataEvent(instrument, TickType.MarkPrice, 1.21)]
+    assert received == expected
+
+    assert not batches
+    run_event_loop()
+    assert batches == [expected]
+
+
+def test_full_queue_does_not_fail_dispatch():
+    client = MixinFixture()
+    instrument = client.test_instrument
+
+    received = []
+
+    def handler(tick_type):
+        received.append(tick_type)
+
+    queue = instrument.on_market_data.iterate(1)
+    instrument.on_market_data += handler
+
+    # A price tick with a size emits two values, the second one doesn't fit the queue
+    client.fake_incoming(Incoming.TICK_PRICE, 1, 43, TickType.Bid, 13.37, 13, 0)
+
+    assert received == [TickType.Bid, TickType.BidSize]
+    assert list(queue.queue) == [TickType.BidSize]
+    assert queue.dropped == 1
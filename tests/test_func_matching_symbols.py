@@ -2,7 +2,8 @@ import typing
 
 from ib_async.functionality.matching_symbols import MatchingSymbolsMixin
 from ib_async.instrument import Instrument, SecurityType
-from .utils import FunctionalityTestHelper
+from ib_async.messages import Outgoing
+from .utils import FunctionalityTestHelper, run_event_loop
 
 
 class FixtureMatchingSymbolsMixin(MatchingSymbolsMixin, FunctionalityTestHelper):
@@ -16,6 +17,7 @@ def test_single_no_result():
     assert not fut.done()
 
     t.dispatch_message(['79', '43', '0'])
+    run_event_loop()
     assert fut.done()
     assert fut.result() == []
 
@@ -28,6 +30,7 @@ def test_single_one_result():
 
     t.dispatch_message(['79', '43', '1',
                         '42', 'AAPL', 'STK', 'NASDAQ', 'USD', ''])
+    run_event_loop()
     assert fut.done()
     assert len(fut.result()) == 1
 
@@ -37,3 +40,42 @@ def test_single_one_result():
     assert instrument.security_type == SecurityType.Stock
     assert instrument.primary_exchange == 'NASDAQ'
     assert instrument.currency == 'USD'
+
+
+def test_identical_requests_shared():
+    t = FixtureMatchingSymbolsMixin()
+
+    fut = t.matching_symbols('AAPL')
+    same = t.matching_symbols('AAPL')
+    other = t.matching_symbols('MSFT')
+    assert same is not fut
+    assert len(t.sent) == 2
+
+    t.dispatch_message(['79', '43', '0'])
+    run_event_loop()
+    assert fut.done()
+    assert same.done()
+    assert fut.result() == same.result() == []
+    assert not other.done()
+
+    # Once resolved, the next call makes a new request
+    t.matching_symbols('AAPL')
+    assert len(t.sent) == 3
+
+
+def test_shared_request_cancelled_by_last_caller():
+    t = FixtureMatchingSymbolsMixin()
+
+    fut = t.matching_symbols('AAPL')
+    same = t.matching_symbols('AAPL')
+    request = t._singleflight_requests[(Outgoing.REQ_MATCHING_SYMBOLS, 'AAPL')].future
+
+    # One caller giving up doesn't affect the other
+    fut.cancel()
+    run_event_loop()
+    assert not same.done()
+    assert not request.done()
+
+    same.cancel()
+    run_event_loop()
+    assert request.cancelled()
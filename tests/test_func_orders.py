@@ -1,6 +1,6 @@
 import pytest
 
-from ib_async.errors import ApiException
+from ib_async.errors import ApiException, NotConnectedError
 from ib_async.functionality.orders import OrdersMixin, Action
 from ib_async.protocol import Incoming, ProtocolVersion
 from .utils import FunctionalityTestHelper
@@ -109,6 +109,20 @@ def test_mk_error():
     assert e.value.error_code == -10
 
 
+def test_disconnected():
+    client = MixinFixture()
+    client.version = ProtocolVersion.MAX_CLIENT
+
+    order = client.create_market_order(client.test_instrument, 1)
+    orders = client.get_open_orders()
+    client._disconnected()
+
+    with pytest.raises(NotConnectedError):
+        order.result()
+    with pytest.raises(NotConnectedError):
+        orders.result()
+
+
 def test_next_valid_id():
     client = MixinFixture()
     client.version = ProtocolVersion.MAX_CLIENT
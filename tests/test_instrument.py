@@ -1,6 +1,9 @@
+import tracemalloc
 from unittest.mock import MagicMock
 import weakref
 
+import pytest
+
 import ib_async.protocol
 import ib_async.instrument
 from .utils import FunctionalityTestHelper
@@ -49,3 +52,67 @@ def test_serialize_instrument():
     i3_ref = weakref.ref(i3)
     del i3, message
     assert not i3_ref()  # Check that the protocol does not hold a strong reference
+
+
+def test_instrument_memory():
+    proto = FunctionalityTestHelper()
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        instruments = []
+        for contract_id in range(1, 10001):
+            instrument = ib_async.instrument.Instrument(proto)
+            instrument.contract_id = contract_id
+            instruments.append(instrument)
+
+        used = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+
+    assert not hasattr(instruments[0], '__dict__')
+
+    # Memory per 10k instruments, without market data. Was ~22MB before instruments were slotted.
+    assert used < 12 * 1024 * 1024
+
+
+def test_registry_indexes():
+    proto = FunctionalityTestHelper()
+    registry = ib_async.instrument.InstrumentRegistry.for_parent(proto)
+
+    def make(contract_id, symbol, security_type, underlying_symbol=''):
+        instrument = ib_async.instrument.Instrument(proto)
+        instrument.contract_id = contract_id
+        instrument.symbol = symbol
+        instrument.security_type = security_type
+        instrument.underlying_symbol = underlying_symbol
+        instrument.security_ids = {ib_async.instrument.SecurityIdentifierType.ISIN: 'ISIN%i' % contract_id}
+        instrument.reindex()
+        return instrument
+
+    stock = make(1, 'AAPL', ib_async.instrument.SecurityType.Stock)
+    call = make(2, 'AAPL  180615C00190000', 'OPT', 'AAPL')
+    put = make(3, 'AAPL  180615P00190000', 'OPT', 'AAPL')
+    other = make(4, 'MSFT  180615P00090000', 'OPT', 'MSFT')
+
+    assert registry.get(1) is stock
+    assert registry.find(symbol='AAPL') == [stock]
+    assert registry.find(security_type='STK') == [stock]
+    assert registry.find(underlying_symbol='AAPL', security_type='OPT') == [call, put]
+    assert registry.find(underlying_symbol='AAPL', security_type='FUT') == []
+    assert registry.find_by_security_id('ISIN', 'ISIN4') is other
+
+    with pytest.raises(ValueError):
+        registry.find(long_name='Apple')
+
+    # Changing fields is reflected after reindexing
+    other.underlying_symbol = 'AAPL'
+    other.reindex()
+    assert registry.find(underlying_symbol='AAPL', security_type='OPT') == [call, put, other]
+    assert registry.find(underlying_symbol='MSFT') == []
+
+    # Garbage collected instruments are dropped from all indexes
+    del put
+    assert registry.find(underlying_symbol='AAPL', security_type='OPT') == [call, other]
+    assert registry.get(3) is None
+    assert len(registry) == 3
@@ -0,0 +1,100 @@
+import asyncio
+from unittest import mock
+
+from ib_async.messages import Incoming, Outgoing
+from ib_async.metrics import MessageMetrics, IncomingStats, OutgoingStats, LatencyHistograms
+from ib_async.protocol import Protocol
+from ib_async.protocol_versions import ProtocolVersion
+from ib_async.utils import monotonic_ns
+
+
+class MetricsProtocol(Protocol):
+    def _handle_tick_size(self, val: int):
+        pass
+
+
+def _make_protocol():
+    prot = MetricsProtocol()
+    prot.version = ProtocolVersion.MIN_CLIENT
+    prot.writer = mock.MagicMock()
+    prot.metrics = MessageMetrics()
+    return prot
+
+
+def test_metrics_collect():
+    prot = _make_protocol()
+    prot.dispatch_message(["2", "10", "42"])
+    prot.dispatch_message(["2", "10", "43"])
+    prot.dispatch_message(["1", "10", "42"])  # No handler
+    prot.send_message(Outgoing.REQ_CURRENT_TIME, 1)
+
+    snapshot = prot.metrics.snapshot()
+    tick_size = snapshot.incoming[Incoming.TICK_SIZE]
+    assert tick_size.count == 2
+    assert tick_size.bytes == 16
+    assert tick_size.decode_seconds > 0
+    assert tick_size.handler_seconds > 0
+    assert snapshot.incoming[Incoming.TICK_PRICE] == IncomingStats(1, 8, mock.ANY, 0.0)
+    assert snapshot.outgoing == {Outgoing.REQ_CURRENT_TIME: OutgoingStats(1, 9)}
+    assert snapshot.dropped == {}
+
+    prot.metrics.record_dropped(Incoming.TICK_SIZE)
+    assert prot.metrics.snapshot().dropped == {Incoming.TICK_SIZE: 1}
+    assert 'ib_async_incoming_dropped_total{type="tick_size"} 1\n' in prot.metrics.to_prometheus()
+
+    prot.metrics.reset()
+    assert prot.metrics.snapshot().incoming == {}
+
+
+def test_metrics_prometheus(tmpdir):
+    prot = _make_protocol()
+    prot.dispatch_message(["2", "10", "42"])
+    prot.send_message(Outgoing.REQ_CURRENT_TIME, 1)
+
+    text = prot.metrics.to_prometheus()
+    assert '# TYPE ib_async_incoming_messages_total counter\n' in text
+    assert 'ib_async_incoming_messages_total{type="tick_size"} 1\n' in text
+    assert 'ib_async_incoming_bytes_total{type="tick_size"} 8\n' in text
+    assert 'ib_async_outgoing_bytes_total{type="req_current_time"} 9\n' in text
+
+    path = str(tmpdir.join("ib_async.prom"))
+    prot.metrics.write_prometheus(path)
+    with open(path) as metrics_file:
+        assert metrics_file.read() == text
+
+    async def scrape():
+        server = await prot.metrics.serve_prometheus()
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+        writer.write(b"GET /metrics HTTP/1.0\r\n\r\n")
+        response = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response
+
+    response = asyncio.get_event_loop().run_until_complete(scrape())
+    assert response.startswith(b"HTTP/1.0 200 OK\r\n")
+    assert response.endswith(text.encode())
+
+
+def test_latency_histograms():
+    prot = _make_protocol()
+    prot.metrics = None
+    prot.latency = LatencyHistograms(buckets=(0.001, 1.0))
+
+    prot.dispatch_message(["2", "10", "42"])
+    prot.dispatch_message(["2", "10", "42"], receive_time=monotonic_ns() - 10 ** 8)
+    prot.dispatch_message(["2", "10", "42"], receive_time=monotonic_ns() - 10 ** 10)
+
+    stats = prot.latency.snapshot()[Incoming.TICK_SIZE]
+    assert stats.count == 3
+    assert stats.buckets == [(0.001, 1), (1.0, 2), (float("inf"), 3)]
+    assert stats.sum_seconds > 10.1
+    assert prot.latency.quantile(Incoming.TICK_SIZE, 0.5) == 1.0
+    assert prot.latency.quantile(Incoming.TICK_PRICE, 0.5) is None
+
+    text = prot.latency.to_prometheus()
+    assert '# TYPE ib_async_incoming_latency_seconds histogram\n' in text
+    assert 'ib_async_incoming_latency_seconds_bucket{type="tick_size",le="0.001"} 1\n' in text
+    assert 'ib_async_incoming_latency_seconds_bucket{type="tick_size",le="+Inf"} 3\n' in text
+    assert 'ib_async_incoming_latency_seconds_count{type="tick_size"} 3\n' in text
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from ib_async.monitor import MessageLoopMonitor, MonitorSample
+from ib_async.protocol import FrameReader, Protocol
+
+
+def test_monitor_thresholds():
+    monitor = MessageLoopMonitor(Protocol(), max_loop_lag=0.1, max_buffered_bytes=100, max_undispatched_age=None)
+    events = []
+
+    def on_stale(sample):
+        events.append(('stale', sample))
+
+    def on_recovered(sample):
+        events.append(('recovered', sample))
+
+    monitor.on_stale += on_stale
+    monitor.on_recovered += on_recovered
+
+    monitor.check(MonitorSample(0.0, 50, 10.0))
+    monitor.check(MonitorSample(0.0, 150, 0.0))
+    monitor.check(MonitorSample(0.2, 150, 0.0))
+    assert monitor.is_stale
+    monitor.check(MonitorSample(0.0, 0, 0.0))
+
+    assert events == [('stale', MonitorSample(0.0, 150, 0.0)), ('recovered', MonitorSample(0.0, 0, 0.0))]
+    assert monitor.peak_loop_lag == 0.2
+
+
+def test_monitor_loop_lag():
+    monitor = MessageLoopMonitor(Protocol(), interval=0.01, max_loop_lag=0.05)
+    stale = []
+
+    def on_stale(sample):
+        stale.append(sample)
+
+    monitor.on_stale += on_stale
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.02)
+        time.sleep(0.1)  # Block the loop, like a slow strategy would
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+    asyncio.get_event_loop().run_until_complete(run())
+    assert not monitor.is_running
+    assert len(stale) == 1
+    assert stale[0].loop_lag >= 0.05
+    assert not monitor.is_stale
+
+
+def test_protocol_backlog():
+    prot = Protocol()
+    assert prot.buffered_bytes == 0
+    assert prot.undispatched_age == 0.0
+
+    prot.reader = FrameReader()
+    prot.reader.feed_data(b"\0\0\0\x02" + b"1\0")
+    time.sleep(0.01)
+    assert prot.buffered_bytes == 6
+    assert prot.undispatched_age >= 0.01
+
+
+def test_protocol_backlog_partial_message():
+    prot = Protocol()
+    prot.reader = FrameReader()
+    prot.reader.feed_data(b"\0\0\0\x02" + b"1\0" + b"\0\0\0\x02")
+    time.sleep(0.01)
+
+    # Reading the last complete message leaves the start of the next one, which isn't a backlog yet
+    batch = asyncio.get_event_loop().run_until_complete(prot._read_batch())
+    assert [fields for fields, _ in batch] == [['1']]
+    assert prot.buffered_bytes == 4
+    assert prot.undispatched_age < 0.01
+
+
+def test_protocol_backlog_after_idle():
+    prot = Protocol()
+    prot.reader = FrameReader()
+    time.sleep(0.05)
+
+    # Neither the quiet period nor a message still arriving count as waiting
+    prot.reader.feed_data(b"\0\0\0\x02")
+    assert prot.undispatched_age == 0.0
+
+    prot.reader.feed_data(b"1\0")
+    assert prot.undispatched_age < 0.05
+    time.sleep(0.01)
+    assert prot.undispatched_age >= 0.01
@@ -1,7 +1,10 @@
+import asyncio
+import concurrent.futures
 import enum
 import datetime
 from unittest import mock
 import typing
+import struct
 import sys
 
 import pytest
@@ -179,6 +182,67 @@ def test_protocol_futures_error(caplog):
     assert caplog.records[0].message == 'Received error#404 from TWS: Not found'
 
 
+def test_protocol_futures_timeout(caplog):
+    class FastProtocol(Protocol):
+        timeout_resolution = 0.01
+
+    prot = FastProtocol()
+    prot.writer = mock.MagicMock()
+
+    slow_id, slow = prot.make_future(Outgoing.REQ_MKT_DATA, timeout=0.02)
+    quick_id, quick = prot.make_future(Outgoing.REQ_MKT_DATA, timeout=0.02)
+    forever_id, forever = prot.make_future()
+    assert prot.pending_request_count == 3
+    assert [request.request_id for request in prot.pending_requests()] == [slow_id, quick_id, forever_id]
+
+    prot.resolve_future(quick_id, "Test")
+    asyncio.get_event_loop().run_until_complete(asyncio.sleep(0.05))
+
+    assert isinstance(slow.exception(), ib_async.errors.RequestTimeoutError)
+    assert isinstance(slow.exception(), asyncio.TimeoutError)
+    assert quick.result() == "Test"
+    assert not forever.done()
+    assert [request.request_id for request in prot.pending_requests()] == [forever_id]
+    assert len(caplog.records) == 1
+
+    # The timed out market data request is cancelled
+    prot.writer.write.assert_called_once_with(OutgoingMessage(Outgoing.CANCEL_MKT_DATA, 2, slow_id).serialize())
+
+    forever.cancel()
+    asyncio.get_event_loop().run_until_complete(asyncio.sleep(0))
+    assert prot.pending_request_count == 0
+
+
+def test_protocol_connection_lost():
+    prot = Protocol()
+    prot.reader = asyncio.StreamReader()
+    prot.writer = mock.MagicMock()
+    prot.is_connected = True
+
+    disconnects = []
+
+    def on_disconnect(error):
+        disconnects.append(error)
+
+    prot.on_disconnect += on_disconnect
+
+    _, fut = prot.make_future(Outgoing.REQ_CONTRACT_DATA)
+    loop = asyncio.get_event_loop()
+    task = asyncio.ensure_future(prot._message_loop())
+    prot.reader.feed_data(b'\x00\x00')  # Part of a message, followed by EOF
+    prot.reader.feed_eof()
+    loop.run_until_complete(task)
+
+    assert isinstance(fut.exception(), ib_async.errors.NotConnectedError)
+    assert prot.pending_request_count == 0
+    assert not prot.is_connected
+    assert len(disconnects) == 1
+    assert isinstance(disconnects[0], asyncio.IncompleteReadError)
+
+    with pytest.raises(ib_async.errors.NotConnectedError):
+        prot.send_message(Outgoing.REQ_CURRENT_TIME, 1)
+
+
 def test_protocol_send_message():
     prot = Protocol()
     prot.writer = mock.MagicMock()
@@ -192,6 +256,28 @@ def test_protocol_send_message():
                                               b'1\x0042\x00')
 
 
+def test_protocol_send_paced():
+    class SlowProtocol(Protocol):
+        max_messages_per_second = 100.0
+
+    prot = SlowProtocol()
+    prot.writer = mock.MagicMock()
+
+    # Freeze the clock during the burst, so that no token becomes available while sending it
+    loop = asyncio.get_event_loop()
+    with mock.patch.object(loop, "time", return_value=loop.time()):
+        for i in range(105):
+            prot.send_message(Outgoing.REQ_CURRENT_TIME, i)
+    assert prot.writer.write.call_count == 100
+
+    asyncio.get_event_loop().run_until_complete(asyncio.sleep(0.1))
+    assert prot.writer.write.call_count == 105
+
+    # Delayed messages are still sent in order
+    assert prot.writer.write.call_args_list[-1] == mock.call(
+        OutgoingMessage(Outgoing.REQ_CURRENT_TIME, 104).serialize())
+
+
 def test_protocol_check_feature():
     prot = Protocol()
     with pytest.raises(ib_async.errors.NotConnectedError) as e:
@@ -244,3 +330,144 @@ def test_protocol_check_dispatch_nohandler(caplog):
     assert len(caplog.records) == 1
     assert caplog.records[0].message == ("no handler for IncomingMessage(Incoming.TICK_SIZE, 10, "
                                          "'42', protocol_version=ProtocolVersion.MIN_CLIENT) (v10)")
+
+
+def test_protocol_batch_priority():
+    dispatched = []
+
+    class BatchProtocol(Protocol):
+        max_batch_size = 4
+
+        def _handle_tick_size(self, request_id: int, tick_type: int, size: int):
+            dispatched.append(('tick', size))
+
+        def _handle_order_status(self, order_id: int):
+            dispatched.append(('order', order_id))
+
+    prot = BatchProtocol()
+    prot.version = ProtocolVersion.MIN_CLIENT
+    prot.reader = asyncio.StreamReader()
+    prot.is_connected = True
+
+    messages = [["2", "6", "1", "0", "100"], ["2", "6", "1", "0", "200"], ["3", "10", "7"],
+                ["2", "6", "1", "0", "300"], ["3", "10", "8"], ["2", "6", "1", "0", "400"]]
+    for fields in messages:
+        body = b"\0".join(field.encode() for field in fields) + b"\0"
+        prot.reader.feed_data(struct.pack("!I", len(body)) + body)
+    prot.reader.feed_eof()
+
+    asyncio.get_event_loop().run_until_complete(prot._message_loop())
+
+    # Orders go first within each batch of up to 4 messages, other messages keep their order
+    assert dispatched == [('order', 7), ('tick', 100), ('tick', 200), ('tick', 300),
+                          ('order', 8), ('tick', 400)]
+    assert not prot.is_connected
+
+
+def test_shed_superseded():
+    batch = [(fields, i) for i, fields in enumerate([
+        ["1", "6", "1", "1", "10.0", "100", "0"],  # Bid, superseded
+        ["1", "6", "1", "2", "10.2", "100", "0"],  # Ask
+        ["1", "6", "2", "1", "20.0", "100", "0"],  # Bid of another request
+        ["12", "1", "3", "0", "1", "1", "9.9", "100"],  # Bid row 0 update, kept because of the insert
+        ["12", "1", "3", "0", "1", "0", "10.1", "100"],  # Ask row 0 update, superseded
+        ["12", "1", "3", "1", "1", "1", "9.8", "100"],  # Bid row 1 update, kept because of the insert
+        ["12", "1", "3", "0", "0", "1", "9.95", "100"],  # Bid insert, shifting the rows
+        ["1", "6", "1", "1", "10.1", "100", "0"],  # Bid
+        ["12", "1", "3", "0", "1", "1", "9.96", "100"],  # Bid row 0 update
+        ["12", "1", "3", "0", "1", "0", "10.2", "200"],  # Ask row 0 update
+        ["3", "10", "7"],  # Order status
+    ])]
+
+    kept, dropped = ib_async.protocol.shed_superseded(batch)
+    assert [receive_time for _, receive_time in kept] == [1, 2, 3, 5, 6, 7, 8, 9, 10]
+    assert sorted(dropped) == ["1", "12"]
+
+
+def test_protocol_load_shedding():
+    ticks = []
+
+    class SheddingProtocol(Protocol):
+        def _handle_tick_size(self, request_id: int, tick_type: int, size: int):
+            ticks.append(size)
+
+    prot = SheddingProtocol()
+    prot.version = ProtocolVersion.MIN_CLIENT
+    prot.reader = mock.MagicMock()
+
+    def make_batch():
+        return [(["2", "6", "1", "0", str(size)], 0) for size in (100, 200, 300)]
+
+    prot._dispatch_batch(make_batch())
+    assert ticks == [100, 200, 300]
+
+    ticks.clear()
+    prot.load_shedding_threshold = 3
+    prot._dispatch_batch(make_batch())
+    assert ticks == [300]
+    assert prot.dropped_messages == {Incoming.TICK_SIZE: 2}
+
+
+class OffloadProtocol(Protocol):
+    offloaded_messages = frozenset({Incoming.TICK_SIZE})
+
+    def __init__(self):
+        super().__init__()
+        self.handled = []
+
+    def _handle_tick_size(self, request_id: int, tick_type: int, size: int):
+        self.handled.append(('tick', size))
+
+    def _handle_order_status(self, order_id: int):
+        self.handled.append(('order', order_id))
+
+
+@pytest.mark.parametrize("executor_class", [concurrent.futures.ThreadPoolExecutor,
+                                            concurrent.futures.ProcessPoolExecutor])
+def test_protocol_offload_decoding(executor_class):
+    prot = OffloadProtocol()
+    prot.version = ProtocolVersion.MIN_CLIENT
+    prot.reader = asyncio.StreamReader()
+    prot.is_connected = True
+
+    for body in (b"2\x006\x001\x000\x00100\x00", b"3\x0010\x007\x00"):
+        prot.reader.feed_data(struct.pack("!I", len(body)) + body)
+
+    async def run():
+        with executor_class(max_workers=1) as executor:
+            prot.decode_executor = executor
+            message_loop = asyncio.ensure_future(prot._message_loop())
+            for _ in range(100):
+                if len(prot.handled) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            prot.reader.feed_eof()
+            await message_loop
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+    # The offloaded message is handled once decoded, after the other message
+    assert prot.handled == [('order', 7), ('tick', 100)]
+
+
+def test_protocol_offload_after_disconnect():
+    prot = OffloadProtocol()
+    prot.version = ProtocolVersion.MIN_CLIENT
+    prot.reader = asyncio.StreamReader()
+    prot.is_connected = True
+
+    for body in (b"2\x006\x001\x000\x00100\x00", b"3\x0010\x007\x00"):
+        prot.reader.feed_data(struct.pack("!I", len(body)) + body)
+    prot.reader.feed_eof()
+
+    async def run():
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            prot.decode_executor = executor
+            await prot._message_loop()
+        await asyncio.sleep(0.05)
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+    # The connection was lost before the offloaded message was decoded, it belongs to the old connection
+    assert not prot.is_connected
+    assert prot.handled == [('order', 7)]
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import threading
+from unittest import mock
+
+import pytest
+
+from ib_async.messages import Outgoing
+from ib_async.protocol import Protocol, OutgoingMessage
+from ib_async.recorder import Recorder, RecordingReader, FrameDirection, RecordingFormatError
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_recorder_roundtrip(tmpdir, compress):
+    path = str(tmpdir.join("capture.rec"))
+
+    with Recorder(path, compress=compress, block_size=100) as recorder:
+        for i in range(50):
+            recorder.record(FrameDirection.Incoming if i % 2 else FrameDirection.Outgoing, b"%i\x00field\x00" % i)
+
+    reader = RecordingReader(path)
+    assert len(reader.blocks) > 1
+
+    frames = list(reader.frames())
+    assert [frame.data for frame in frames] == [b"%i\x00field\x00" % i for i in range(50)]
+    assert frames[1].direction == FrameDirection.Incoming
+    assert frames[0].timestamp <= frames[-1].timestamp
+    assert abs(reader.to_wall_time(frames[0].timestamp) - reader.start_time) < 1
+
+    # Select a range of frames using the time index
+    start, end = frames[20].timestamp, frames[30].timestamp
+    selected = list(reader.frames(start=start, end=end))
+    assert all(start <= frame.timestamp <= end for frame in selected)
+    assert frames[20] in selected and frames[30] in selected
+
+
+def test_recorder_writes_in_background(tmpdir):
+    path = str(tmpdir.join("capture.rec"))
+    writer_threads = []
+    write_block = Recorder._write_block
+
+    def record_thread(recorder, *args):
+        writer_threads.append(threading.get_ident())
+        write_block(recorder, *args)
+
+    with mock.patch.object(Recorder, '_write_block', record_thread):
+        recorder = Recorder(path, block_size=10)
+        for i in range(10):
+            recorder.record(FrameDirection.Incoming, b"%i\x00" % i)
+
+        # Full blocks are written by a worker thread, flushing with wait makes them readable
+        recorder.flush(wait=True)
+        assert len(RecordingReader(path).blocks) == 10
+        assert writer_threads and threading.get_ident() not in writer_threads
+        recorder.close()
+
+    assert [frame.data for frame in RecordingReader(path).frames()] == [b"%i\x00" % i for i in range(10)]
+
+
+def test_recorder_without_index(tmpdir):
+    path = str(tmpdir.join("capture.rec"))
+
+    with Recorder(path, block_size=10) as recorder:
+        for i in range(10):
+            recorder.record(FrameDirection.Incoming, b"%i\x00" % i)
+
+    expected = list(RecordingReader(path).frames())
+
+    # Lose the index, and truncate the last block, like a crash while writing would
+    os.remove(path + ".idx")
+    with open(path, "r+b") as log_file:
+        log_file.truncate(os.path.getsize(path) - 1)
+
+    assert list(RecordingReader(path).frames()) == expected[:-1]
+
+
+def test_recorder_invalid(tmpdir):
+    path = tmpdir.join("capture.rec")
+    path.write(b"something else entirely")
+
+    with pytest.raises(RecordingFormatError):
+        RecordingReader(str(path))
+
+
+def test_protocol_recording(tmpdir):
+    path = str(tmpdir.join("capture.rec"))
+
+    prot = Protocol()
+    prot.writer = mock.MagicMock()
+    prot.reader = asyncio.StreamReader()
+    prot.recorder = Recorder(path)
+
+    prot.send_message(Outgoing.REQ_CURRENT_TIME, 1)
+    prot.reader.feed_data(b"\x00\x00\x00\x0849\x001\x0042\x00")
+    asyncio.get_event_loop().run_until_complete(prot._read_message())
+    prot.recorder.close()
+
+    frames = list(RecordingReader(path).frames())
+    assert [(frame.direction, frame.data) for frame in frames] == [
+        (FrameDirection.Outgoing, OutgoingMessage(Outgoing.REQ_CURRENT_TIME, 1).serialize()[4:]),
+        (FrameDirection.Incoming, b"49\x001\x0042\x00"),
+    ]
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from unittest import mock
+
+import ib_async
+from ib_async.instrument import Instrument, SecurityType
+from ib_async.recorder import Recorder, FrameDirection
+from ib_async.replay import Replayer
+from ib_async.tick_types import TickType
+
+
+def _make_recording(path, delay=0.0, unknown_request=False):
+    client = ib_async.IBClient()
+    client.writer = mock.MagicMock()
+    client.version = ib_async.protocol.ProtocolVersion.MAX_CLIENT
+    client.recorder = Recorder(path)
+
+    client.recorder.record(FrameDirection.Incoming, b"%i\x0020180501 10:00:00 CET\x00" % client.version)
+
+    instrument = Instrument(client)
+    instrument.contract_id = 42
+    instrument.symbol = 'AAPL'
+    instrument.security_type = SecurityType.Stock
+    instrument.exchange = 'SMART'
+    instrument.currency = 'USD'
+    client.get_market_data(instrument)
+    request_id = instrument._market_data_request_id
+
+    if unknown_request:
+        client.recorder.record(FrameDirection.Incoming, b"1\x006\x00999\x001\x0013.37\x00100\x000\x00")
+
+    for price in (b'13.37', b'13.38'):
+        time.sleep(delay)
+        tick_price = b"1\x006\x00%i\x001\x00%s\x00100\x000\x00" % (request_id, price)
+        client.recorder.record(FrameDirection.Incoming, tick_price)
+
+    client.recorder.close()
+
+
+def test_replay(tmpdir):
+    path = str(tmpdir.join("capture.rec"))
+    _make_recording(path)
+
+    client = ib_async.IBClient()
+    stats = asyncio.get_event_loop().run_until_complete(Replayer(client, path, speed=None).run())
+
+    assert stats.messages == 2
+    assert stats.errors == 0
+    assert stats.messages_per_second > 0
+
+    # The recorded subscription was repeated, so the market data reached the instrument
+    instrument = Instrument.get_instance(client, 42)
+    assert instrument.symbol == 'AAPL'
+    assert instrument._tick_data[TickType.Bid] == 13.38
+    assert client.version == ib_async.protocol.ProtocolVersion.MAX_CLIENT
+
+    # Requests made afterwards don't reuse the recorded request id
+    assert client.make_request_id() > instrument._market_data_request_id
+
+
+def test_replay_errors(tmpdir):
+    path = str(tmpdir.join("capture.rec"))
+    _make_recording(path, unknown_request=True)
+
+    client = ib_async.IBClient()
+    stats = asyncio.get_event_loop().run_until_complete(Replayer(client, path, speed=None).run())
+
+    assert stats.messages == 3
+    assert stats.errors == 1
+    assert Instrument.get_instance(client, 42)._tick_data[TickType.Bid] == 13.38
+
+
+def test_replay_paced(tmpdir):
+    path = str(tmpdir.join("capture.rec"))
+    _make_recording(path, delay=0.05)
+
+    loop = asyncio.get_event_loop()
+    assert loop.run_until_complete(Replayer(ib_async.IBClient(), path, speed=1).run()).elapsed >= 0.04
+    assert loop.run_until_complete(Replayer(ib_async.IBClient(), path, speed=None).run()).elapsed < 0.04
@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 
 from ib_async import utils
@@ -36,3 +37,26 @@ def test_wrap_fut():
     fut = utils.wrap_immediate_future(x)
     assert fut.done()
     assert fut.result() is x
+
+
+def test_timer_wheel():
+    expired = []
+    wheel = utils.TimerWheel(expired.append, resolution=0.01, slots=4)
+    loop = asyncio.get_event_loop()
+    now = loop.time()
+
+    wheel.schedule('a', now + 0.02)
+    wheel.schedule('b', now + 0.1)  # More than a full turn of the wheel away
+    wheel.schedule('c', now)
+    wheel.schedule('d', now + 0.02)
+    wheel.cancel('d')
+    assert len(wheel) == 3
+
+    loop.run_until_complete(asyncio.sleep(0.05))
+    assert sorted(expired) == ['a', 'c']
+    assert 'b' in wheel
+
+    loop.run_until_complete(asyncio.sleep(0.1))
+    assert sorted(expired) == ['a', 'b', 'c']
+    assert len(wheel) == 0
+    assert wheel._handle is None
@@ -15,6 +15,7 @@ class FunctionalityTestHelper(ib_async.protocol.Protocol):
 
         self.next_request_id = ib_async.protocol.RequestId(43)
         self.version = ib_async.protocol.ProtocolVersion(110)
+        self.is_connected = True
         self.futures = {}
         self.sent = []  # type: typing.List[ib_async.protocol.OutgoingMessage]
 
@@ -32,7 +33,8 @@ class FunctionalityTestHelper(ib_async.protocol.Protocol):
 
         self.dispatch_message([f.decode() for f in msg_encoded])
 
-    def dispatch_message(self, fields: typing.List[str]):
+    def dispatch_message(self, fields: typing.List[str], receive_time: int = None):
+        self.receive_time = receive_time
         message = ib_async.protocol.IncomingMessage(fields, source=self)
 
         msg_name = message.message_type.name.lower()